@@ -0,0 +1,116 @@
+"""
+Anuncios de bosses en los canales de eventos.
+- Cola única con ANNOUNCE_CONCURRENCY workers: los envíos salen en paralelo
+- Límite global (token bucket) y separación mínima por canal para no
+  provocar ráfagas de 429
+- El mismo mensaje (un embed ya armado) se reutiliza en todos los canales
+- Canales borrados o sin permisos se quitan solos de event_channels
+"""
+import asyncio
+import os
+import time
+import discord
+from db import remove_event_channels
+
+# Envíos simultáneos como máximo
+ANNOUNCE_CONCURRENCY = int(os.environ.get("ANNOUNCE_CONCURRENCY", 8))
+# Mensajes por segundo entre todos los canales (Discord corta en 50/s global)
+ANNOUNCE_RATE = float(os.environ.get("ANNOUNCE_RATE", 40))
+# Segundos mínimos entre dos mensajes al mismo canal (Discord: 5 cada 5 s)
+ANNOUNCE_CHANNEL_GAP = 1.0
+
+class _RateLimit:
+    """Token bucket: ANNOUNCE_RATE por segundo, ráfaga de hasta un segundo"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.stamp = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.stamp = time.monotonic()
+                self.tokens = 0
+            else:
+                self.tokens -= 1
+
+class Announcer:
+    def __init__(self, concurrency=ANNOUNCE_CONCURRENCY, rate=ANNOUNCE_RATE):
+        self.concurrency = concurrency
+        self._limit = _RateLimit(rate)
+        self._queue = None
+        self._workers = []
+        self._next_ok = {}   # channel_id -> monotonic a partir del cual se puede enviar
+        self._dead = set()   # (guild_id, channel_id) pendientes de borrar
+
+    def announce(self, bot, channels, content=None, embed=None, exclude=()):
+        """Encolar un mensaje para [(guild_id, channel_id)]; no espera al envío"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if len(self._workers) < self.concurrency:
+            self._workers = [w for w in self._workers if not w.done()]
+            while len(self._workers) < self.concurrency:
+                self._workers.append(asyncio.create_task(self._work(bot)))
+        for gid, cid in channels:
+            if cid not in exclude:
+                self._queue.put_nowait((int(gid), int(cid), content, embed))
+
+    async def join(self):
+        """Esperar a que salga todo lo encolado (y se poden los canales muertos)"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _work(self, bot):
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._send(bot, *item)
+            except Exception as e:
+                print(f"Error enviando anuncio: {e}")
+            finally:
+                if self._queue.empty():
+                    await self._drained()
+                self._queue.task_done()
+
+    async def _send(self, bot, guild_id, channel_id, content, embed):
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            # Solo es seguro darlo por borrado si el servidor sí está en caché
+            if bot.get_guild(guild_id) is not None:
+                self._dead.add((guild_id, channel_id))
+            return
+        # Reservar el turno antes de dormir: dos workers no chocan en el canal
+        now = time.monotonic()
+        slot = max(now, self._next_ok.get(channel_id, 0))
+        self._next_ok[channel_id] = slot + ANNOUNCE_CHANNEL_GAP
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        await self._limit.acquire()
+        try:
+            await channel.send(content=content, embed=embed)
+        except (discord.NotFound, discord.Forbidden):
+            self._dead.add((guild_id, channel_id))
+
+    async def _drained(self):
+        """Cola vacía: olvidar turnos ya vencidos y borrar los canales muertos"""
+        now = time.monotonic()
+        self._next_ok = {cid: t for cid, t in self._next_ok.items() if t > now}
+        if not self._dead:
+            return
+        dead, self._dead = list(self._dead), set()
+        try:
+            await remove_event_channels(dead)
+            print(f"📢 {len(dead)} canales de eventos inaccesibles quitados")
+        except Exception as e:
+            print(f"Error quitando canales de eventos: {e}")
+
+announcer = Announcer()
+
+def announce(bot, channels, content=None, embed=None, exclude=()):
+    announcer.announce(bot, channels, content=content, embed=embed, exclude=exclude)
@@ -3,92 +3,191 @@ Sistema automático de spawn de bosses.
 - Mini-bosses: cada 30 minutos (reemplaza al boss actual)
 - Bosses: cada 1 día (reemplaza al boss actual)
 - Especiales: cada semana (solo por comando del owner)
+
+Cola de prioridad (heap) con el próximo spawn de cada servidor y tipo:
+- Al arrancar se cargan todas las horas de spawn en una sola consulta
+- La tarea duerme justo hasta el próximo spawn (o hasta que entra un servidor)
+- Los spawns que vencen a la vez se hacen en una sola transacción
+- Los anuncios salen por announcer (en paralelo, con límites de Discord)
 """
 import asyncio
-from datetime import datetime, timedelta
-from db import get_all_active_bosses, create_boss, deactivate_boss, get_event_channels, set_boss_spawn_time, get_boss_spawn_time
-from bosses import get_random_boss
+import heapq
+import os
+import time
 import discord
+from db import get_all_boss_spawn_times, spawn_bosses, get_event_channels_for
+from bosses import get_random_boss
+from announcer import announce
+
+# boss_type -> (categoría en BOSSES_DB, segundos entre spawns, hp por defecto)
+SPAWN_TYPES = {
+    "mini_boss": ("Mini-Boss", 1800, 50),
+    "boss": ("Boss", 86400, 100),
+}
+# Si vencen los dos a la vez gana el mini-boss; el boss espera este tiempo
+SPAWN_DEFER = 300
+# Tras un error, cuánto esperar antes de reintentar los spawns del lote
+SPAWN_RETRY = 60
+# Spawns por transacción como máximo: lo que sobre sale en la siguiente vuelta
+SPAWN_BATCH = int(os.environ.get("BOSS_SPAWN_BATCH", 500))
+
+ANNOUNCEMENTS = {
+    "mini_boss": ("🚨 ¡¡NUEVO Mini-Boss apareció!!", discord.Color.orange(), "Mini-Boss"),
+    "boss": ("🚨 ¡¡NUEVO Boss ha aparecido!!", discord.Color.red(), "Boss Normal"),
+}
+
+class SpawnSchedule:
+    """Heap de (vence_en, guild_id, boss_type). Reprogramar deja la entrada
+    vieja en el heap; se descarta al sacarla si no coincide con _due."""
+
+    def __init__(self):
+        self._heap = []
+        self._due = {}   # (guild_id, boss_type) -> vence_en vigente
+        self._wake = asyncio.Event()
+
+    def __len__(self):
+        return len(self._due)
+
+    def schedule(self, guild_id, boss_type, due):
+        key = (guild_id, boss_type)
+        if self._due.get(key) == due:
+            return
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, guild_id, boss_type))
+        if self._heap[0][0] == due:
+            self._wake.set()
+
+    def add_guild(self, guild_id, last_spawns=None, now=None):
+        """Programar los spawns de un servidor que todavía no está en la cola"""
+        now = time.time() if now is None else now
+        last_spawns = last_spawns or {}
+        for boss_type, (_, interval, _) in SPAWN_TYPES.items():
+            if (guild_id, boss_type) in self._due:
+                continue
+            last = last_spawns.get((guild_id, boss_type))
+            self.schedule(guild_id, boss_type, now if last is None else last + interval)
+
+    def remove_guild(self, guild_id):
+        for boss_type in SPAWN_TYPES:
+            self._due.pop((guild_id, boss_type), None)
+
+    def next_due(self):
+        """Hora del próximo spawn vigente, o None si la cola está vacía"""
+        while self._heap:
+            due, gid, boss_type = self._heap[0]
+            if self._due.get((gid, boss_type)) == due:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now, limit):
+        """Sacar hasta `limit` entradas vencidas: [(guild_id, boss_type)]"""
+        out = []
+        while len(out) < limit and self.next_due() is not None and self._heap[0][0] <= now:
+            _, gid, boss_type = heapq.heappop(self._heap)
+            del self._due[(gid, boss_type)]
+            out.append((gid, boss_type))
+        return out
+
+    async def wait(self):
+        """Dormir hasta el próximo spawn o hasta que cambie la cola"""
+        self._wake.clear()
+        due = self.next_due()
+        timeout = None if due is None else max(0.0, due - time.time())
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+schedule = SpawnSchedule()
+
+def schedule_guild(guild_id):
+    """El bot entró a un servidor: su primer spawn es inmediato"""
+    schedule.add_guild(int(guild_id))
+
+def unschedule_guild(guild_id):
+    schedule.remove_guild(int(guild_id))
+
+def _pick_spawns(bot, due, now):
+    """Un spawn por servidor; si el mini-boss y el boss vencen juntos, el boss
+    se aplaza SPAWN_DEFER. Los servidores que el bot dejó se descartan."""
+    picked = {}
+    for gid, boss_type in due:
+        if bot.get_guild(gid) is None:
+            schedule.remove_guild(gid)
+            continue
+        if gid in picked:
+            late = "boss" if boss_type == "boss" else picked[gid]
+            picked[gid] = "mini_boss"
+            schedule.schedule(gid, late, now + SPAWN_DEFER)
+        else:
+            picked[gid] = boss_type
+    spawns = []
+    for gid, boss_type in picked.items():
+        category, _, default_hp = SPAWN_TYPES[boss_type]
+        boss = get_random_boss(category)
+        if boss:
+            spawns.append((gid, boss_type, boss, boss.get("max_hp", boss.get("hp", default_hp))))
+        else:
+            schedule.schedule(gid, boss_type, now + SPAWN_RETRY)
+    return spawns
+
+# (boss_type, nombre) -> embed del anuncio: se arma una vez y se reutiliza
+_embeds = {}
+
+def _spawn_embed(boss_type, boss):
+    key = (boss_type, boss["name"])
+    embed = _embeds.get(key)
+    if embed is None:
+        title, color, label = ANNOUNCEMENTS[boss_type]
+        embed = _embeds[key] = discord.Embed(
+            title=title,
+            description=f"**{boss['name']}** ha reemplazado al anterior.\nUsa `/fight` para pelear.",
+            color=color
+        )
+        embed.add_field(name="HP", value=f"{boss['hp']} HP", inline=True)
+        embed.add_field(name="Tipo", value=label, inline=True)
+    return embed
+
+async def _announce(bot, spawns):
+    channels = await get_event_channels_for(gid for gid, _, _, _ in spawns)
+    for gid, boss_type, boss, _ in spawns:
+        targets = [(gid, cid) for cid in channels.get(gid, ())]
+        if targets:
+            announce(bot, targets, embed=_spawn_embed(boss_type, boss))
 
 async def auto_spawn_bosses(bot):
-    """Tarea que checkea cada 5 minutos si debe spawnear un boss"""
+    """Tarea que spawnea los bosses de todos los servidores a su hora"""
     await bot.wait_until_ready()
-    
+
+    try:
+        last_spawns = await get_all_boss_spawn_times()
+    except Exception as e:
+        print(f"Error cargando spawns de bosses: {e}")
+        last_spawns = {}
+    now = time.time()
+    for guild in bot.guilds:
+        schedule.add_guild(guild.id, last_spawns, now)
+
     while not bot.is_closed():
+        await schedule.wait()
+        now = time.time()
+        due = schedule.pop_due(now, SPAWN_BATCH)
+        if not due:
+            continue
+        spawns = _pick_spawns(bot, due, now)
+        if not spawns:
+            continue
         try:
-            current_time = datetime.now()
-            
-            # Iterar sobre todos los servidores donde el bot está
-            for guild in bot.guilds:
-                guild_id = guild.id
-                
-                # Verificar mini-boss (cada 30 minutos)
-                last_mini = await get_boss_spawn_time(guild_id, "mini_boss")
-                if last_mini is None or (current_time - last_mini).total_seconds() >= 1800:
-                    mini_boss = get_random_boss("Mini-Boss")
-                    if mini_boss:
-                        # Desactivar boss actual si existe
-                        active_bosses = await get_all_active_bosses(guild_id)
-                        if active_bosses:
-                            for active_boss in active_bosses:
-                                await deactivate_boss(guild_id, active_boss.get("boss_name"))
-                        
-                        max_hp = mini_boss.get("max_hp", mini_boss.get("hp", 50))
-                        await create_boss(guild_id, mini_boss["name"], max_hp)
-                        await set_boss_spawn_time(guild_id, "mini_boss")
-                        
-                        # Notificar en el canal configurado
-                        channels = await get_event_channels(guild_id)
-                        for ch_id in channels:
-                            try:
-                                channel = bot.get_channel(ch_id)
-                                if channel:
-                                    embed = discord.Embed(
-                                        title=f"🚨 ¡¡NUEVO Mini-Boss apareció!!",
-                                        description=f"**{mini_boss['name']}** ha reemplazado al anterior.\nUsa `/fight` para pelear.",
-                                        color=discord.Color.orange()
-                                    )
-                                    embed.add_field(name="HP", value=f"{mini_boss['hp']} HP", inline=True)
-                                    embed.add_field(name="Tipo", value="Mini-Boss", inline=True)
-                                    await channel.send(embed=embed)
-                            except:
-                                pass
-                    continue
-                
-                # Verificar boss normal (cada 1 día)
-                last_boss = await get_boss_spawn_time(guild_id, "boss")
-                if last_boss is None or (current_time - last_boss).total_seconds() >= 86400:
-                    boss = get_random_boss("Boss")
-                    if boss:
-                        # Desactivar boss actual si existe
-                        active_bosses = await get_all_active_bosses(guild_id)
-                        if active_bosses:
-                            for active_boss in active_bosses:
-                                await deactivate_boss(guild_id, active_boss.get("boss_name"))
-                        
-                        max_hp = boss.get("max_hp", boss.get("hp", 100))
-                        await create_boss(guild_id, boss["name"], max_hp)
-                        await set_boss_spawn_time(guild_id, "boss")
-                        
-                        # Notificar en el canal configurado
-                        channels = await get_event_channels(guild_id)
-                        for ch_id in channels:
-                            try:
-                                channel = bot.get_channel(ch_id)
-                                if channel:
-                                    embed = discord.Embed(
-                                        title=f"🚨 ¡¡NUEVO Boss ha aparecido!!",
-                                        description=f"**{boss['name']}** ha reemplazado al anterior.\nUsa `/fight` para pelear.",
-                                        color=discord.Color.red()
-                                    )
-                                    embed.add_field(name="HP", value=f"{boss['hp']} HP", inline=True)
-                                    embed.add_field(name="Tipo", value="Boss Normal", inline=True)
-                                    await channel.send(embed=embed)
-                            except:
-                                pass
-        
+            spawned_at = await spawn_bosses([(gid, t, boss["name"], hp) for gid, t, boss, hp in spawns])
         except Exception as e:
             print(f"Error en auto_spawn_bosses: {e}")
-        
-        # Checkear cada 5 minutos
-        await asyncio.sleep(300)
+            for gid, boss_type, _, _ in spawns:
+                schedule.schedule(gid, boss_type, now + SPAWN_RETRY)
+            continue
+        for gid, boss_type, _, _ in spawns:
+            schedule.schedule(gid, boss_type, spawned_at + SPAWN_TYPES[boss_type][1])
+        try:
+            await _announce(bot, spawns)
+        except Exception as e:
+            print(f"Error anunciando bosses: {e}")
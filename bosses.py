@@ -1,7 +1,9 @@
 # bosses.py
 import random
+from collections import namedtuple
 from datetime import datetime, timedelta
 from typing import Dict, Optional
+from item_effects import item_effect
 
 # Mapeo de armas únicas por boss
 BOSS_WEAPONS = {
@@ -180,6 +182,125 @@ def resolve_boss_attack(boss: Dict) -> tuple:
     
     return (hit, damage, is_crit)
 
+# ==================== MOTOR DE COMBATE ====================
+
+PLAYER_MAX_HP = 100
+MAX_TURNS = 30
+# Categorías que se gastan al usarlas; armas y herramientas son reutilizables
+CONSUMABLE_TYPES = ("consumible", "consumible_damage", "consumible_buff", "consumible_shield", "salud")
+
+# Resultado de un turno: daño al jefe, id del item gastado (o None) y eventos
+TurnOutcome = namedtuple("TurnOutcome", "dealt consumed events")
+
+class FightEngine:
+    """Pelea de un jugador contra un jefe, sin I/O.
+
+    El cog carga una vez el contexto (arma equipada, mejoras de club,
+    inventario) y va pasando acciones; el motor solo calcula. La vida del
+    jefe se puede pisar desde fuera (raids: otros jugadores también pegan).
+    """
+
+    def __init__(self, boss: Dict, boss_hp: int, weapon: Optional[str] = None,
+                 upgrades=(), inventory=(), rng=random):
+        self.boss = boss
+        self.boss_hp = boss_hp
+        self.weapon = weapon
+        self.player_hp = PLAYER_MAX_HP
+        self.turn = 1
+        self.rng = rng
+        self.log = []
+        self.defend_next = False
+        self.damage_buff = False
+        self.charging = False   # item de dos usos a medio cargar
+        # Bonus por upgrade Armería Mejorada
+        self.damage_mult = 1.15 if "Armería Mejorada" in upgrades else 1.0
+        self.inventory = {item["id"]: item for item in inventory}
+        # Tiradas precalculadas: (probabilidad de golpe, daño base, probabilidad de crítico)
+        self._player_roll = calculate_player_damage(weapon)
+        self._boss_roll = (0.6, boss["ataque"], 0.1)
+
+    @property
+    def finished(self) -> bool:
+        return self.player_hp <= 0 or self.boss_hp <= 0 or self.turn > MAX_TURNS
+
+    def play(self, action: str, item_id: Optional[int] = None) -> TurnOutcome:
+        """Turno completo: acción del jugador y, si sigue vivo, ataque del jefe"""
+        start = len(self.log)
+        dealt, consumed = self.player_turn(action, item_id)
+        if self.boss_hp > 0:
+            self.boss_turn()
+        return TurnOutcome(dealt, consumed, self.log[start:])
+
+    def player_turn(self, action: str, item_id: Optional[int] = None) -> tuple:
+        """Acción del jugador: (daño al jefe, id del item gastado o None)"""
+        dealt, consumed = 0, None
+        if action == "attack":
+            dealt = self._attack()
+        elif action == "defend":
+            self.defend_next = True
+            self.log.append(f"🛡️ ¡Te preparaste para defender!")
+        elif action == "use_item" and item_id is not None:
+            item = self.inventory.get(int(item_id))
+            if item is not None:
+                dealt = self._use_item(item)
+                if item.get("categoria", "consumible") in CONSUMABLE_TYPES:
+                    del self.inventory[item["id"]]
+                    consumed = item["id"]
+        self.boss_hp = max(0, self.boss_hp - dealt)
+        return dealt, consumed
+
+    def boss_turn(self):
+        boss_hit, boss_dmg, boss_crit = self._roll(self._boss_roll)
+        shield_active = self.defend_next
+        if self.defend_next:
+            boss_dmg = int(boss_dmg * 0.5)
+            self.defend_next = False
+        
+        name = self.boss["name"]
+        if boss_hit:
+            self.player_hp -= boss_dmg
+            crit_text = " ¡CRÍTICO!" if boss_crit else ""
+            if shield_active:
+                self.log.append(f"🛡️ ¡Escudo Mágico activado! {name} golpeó por {boss_dmg}{crit_text} (daño reducido 50%)")
+            else:
+                self.log.append(f"💥 {name} golpeó por {boss_dmg}{crit_text}")
+        else:
+            self.log.append(f"🛡️ {name} falló")
+        self.turn += 1
+
+    def _roll(self, stats) -> tuple:
+        """Igual que resolve_player_attack/resolve_boss_attack, con el rng del motor"""
+        hit_chance, base_damage, crit_chance = stats
+        rand = self.rng.random
+        if rand() >= hit_chance:
+            return (False, 0, False)
+        is_crit = rand() < crit_chance
+        damage = int(base_damage * self.rng.uniform(0.8, 1.2))
+        if is_crit:
+            damage = int(damage * 1.5)
+        return (True, max(1, damage), is_crit)
+
+    def heal(self, amount: int):
+        self.player_hp = min(PLAYER_MAX_HP, self.player_hp + amount)
+
+    def _attack(self) -> int:
+        player_hit, player_dmg, player_crit = self._roll(self._player_roll)
+        if not player_hit:
+            self.log.append(f"❌ ¡Fallaste tu ataque!")
+            return 0
+        if self.damage_buff:
+            player_dmg = int(player_dmg * 1.5)
+            self.damage_buff = False
+        if self.damage_mult != 1.0:
+            player_dmg = int(player_dmg * self.damage_mult)
+        crit_text = " ¡CRÍTICO!" if player_crit else ""
+        self.log.append(f"⚔️ Golpeaste por {player_dmg}{crit_text}")
+        return player_dmg
+
+    def _use_item(self, item) -> int:
+        """Efecto de un item del inventario; devuelve el daño al jefe"""
+        return item_effect(item["item"], item.get("categoria", "consumible")).combat.apply(self)
+
 async def get_boss_reward(boss: Dict) -> Dict:
     """Get rewards for defeating a boss"""
     dinero_range = boss["rewards"]["dinero"]
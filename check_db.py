@@ -1,9 +1,25 @@
 import sqlite3
 import sys
+from db import DB, DB_SETTINGS, WAL_CHECKPOINT_SECONDS, HOT_QUERIES
 
 try:
-    db = sqlite3.connect('economy.db')
+    db = sqlite3.connect(DB)
     cursor = db.cursor()
+
+    # PRAGMAs: valor configurado en db.py vs. valor efectivo en esta conexión.
+    # journal_mode se guarda en el archivo; el resto es por conexión, así que
+    # aquí se aplican igual que en el pool antes de leerlos.
+    print("SQLITE SETTINGS:")
+    print("=" * 60)
+    for name, value in DB_SETTINGS.items():
+        if name != "journal_mode":
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.execute(f"PRAGMA {name}")
+        row = cursor.fetchone()
+        actual = row[0] if row else None
+        print(f"   {name}: configurado={value} efectivo={actual}")
+    print(f"   wal_checkpoint cada: {WAL_CHECKPOINT_SECONDS}s")
+    print()
     
     # Get all tables
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
@@ -23,6 +39,19 @@ try:
         has_id = 'id' in col_names
         print(f"   Has 'id': {'✓' if has_id else '✗'}")
         
+    # EXPLAIN QUERY PLAN de las consultas calientes de db.py
+    print("\nQUERY PLANS:")
+    print("=" * 60)
+    for name, (sql, params) in HOT_QUERIES.items():
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        except sqlite3.OperationalError as e:
+            print(f"   ✗ {name}: {e}")
+            continue
+        details = [row[3] for row in cursor.fetchall()]
+        full_scan = any(d.startswith("SCAN") and "INDEX" not in d for d in details)
+        print(f"   {'✗' if full_scan else '✓'} {name}: {' | '.join(details)}")
+
     db.close()
     print("\n" + "=" * 60)
     print("✅ Database check complete")
@@ -1,20 +1,7 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import aiosqlite
-from db import add_money, set_job, get_user, DB, remove_event_channel, get_event_channels, set_event_channel as db_set_event_channel
-
-async def set_event_channel(guild_id, channel_id):
-    """Configurar canal para anuncios de bosses - reemplaza todos los canales viejos"""
-    async with aiosqlite.connect(DB) as db:
-        # Eliminar todos los canales viejos del servidor
-        await db.execute("DELETE FROM event_channels WHERE guild_id = ?", (str(guild_id),))
-        # Agregar el nuevo canal
-        await db.execute(
-            "INSERT INTO event_channels (guild_id, channel_id) VALUES (?, ?)",
-            (str(guild_id), str(channel_id))
-        )
-        await db.commit()
+from db import add_money, set_job, get_user, reset_cooldowns, remove_event_channel, get_event_channels, replace_event_channel
 
 async def get_event_channel(guild_id):
     """Obtener el PRIMER canal configurado para anuncios"""
@@ -34,8 +21,8 @@ class AdminCog(commands.Cog):
     async def addmoney_prefix(self, ctx, member: discord.Member, amount: int):
         """!addmoney @user 500"""
         try:
-            await add_money(str(member.id), amount)
-            user = await get_user(str(member.id))
+            await add_money(member.id, amount)
+            user = await get_user(member.id)
             await ctx.send(f"✅ {member.mention} recibió `{amount}💰`. Balance: **{user['dinero']}💰**.")
         except Exception as e:
             await ctx.send(f"❌ Error: {e}")
@@ -45,7 +32,7 @@ class AdminCog(commands.Cog):
     async def setjob_prefix(self, ctx, member: discord.Member, *, job_name: str):
         """!setjob @user Trabajo"""
         try:
-            await set_job(str(member.id), job_name)
+            await set_job(member.id, job_name)
             await ctx.send(f"✅ Trabajo de {member.mention} cambiado a **{job_name}**.")
         except Exception as e:
             await ctx.send(f"❌ Error: {e}")
@@ -55,18 +42,7 @@ class AdminCog(commands.Cog):
     async def resetcooldown_prefix(self, ctx, member: discord.Member, *, job_name: str = None):
         """!resetcooldown @user [Trabajo]"""
         try:
-            async with aiosqlite.connect(DB) as db:
-                if job_name:
-                    await db.execute(
-                        "DELETE FROM work_cooldowns WHERE user_id = ? AND job_name = ?",
-                        (str(member.id), job_name)
-                    )
-                else:
-                    await db.execute(
-                        "DELETE FROM work_cooldowns WHERE user_id = ?",
-                        (str(member.id),)
-                    )
-                await db.commit()
+            await reset_cooldowns(member.id, "work", job_name)
 
             await ctx.send(
                 f"✅ Cooldown reiniciado para {member.mention} "
@@ -91,8 +67,8 @@ class AdminCog(commands.Cog):
         if not user.guild_permissions.administrator:
             return await interaction.response.send_message("❌ Solo admins.", ephemeral=True)
 
-        await add_money(str(member.id), amount)
-        user_data = await get_user(str(member.id))
+        await add_money(member.id, amount)
+        user_data = await get_user(member.id)
 
         await interaction.response.send_message(
             f"💰 {member.mention} recibió `{amount}`. Nuevo balance: **{user_data['dinero']}💰**."
@@ -104,7 +80,7 @@ class AdminCog(commands.Cog):
         if not user.guild_permissions.administrator:
             return await interaction.response.send_message("❌ Solo admins.", ephemeral=True)
 
-        await set_job(str(member.id), job_name)
+        await set_job(member.id, job_name)
         await interaction.response.send_message(
             f"🛠️ Trabajo de {member.mention} cambiado a **{job_name}**."
         )
@@ -115,18 +91,7 @@ class AdminCog(commands.Cog):
         if not user.guild_permissions.administrator:
             return await interaction.response.send_message("❌ Solo admins.", ephemeral=True)
 
-        async with aiosqlite.connect(DB) as db:
-            if job_name:
-                await db.execute(
-                    "DELETE FROM work_cooldowns WHERE user_id = ? AND job_name = ?",
-                    (str(member.id), job_name)
-                )
-            else:
-                await db.execute(
-                    "DELETE FROM work_cooldowns WHERE user_id = ?",
-                    (str(member.id),)
-                )
-            await db.commit()
+        await reset_cooldowns(member.id, "work", job_name)
 
         await interaction.response.send_message(
             f"🔁 Cooldown reiniciado para {member.mention} "
@@ -137,14 +102,14 @@ class AdminCog(commands.Cog):
     @commands.has_guild_permissions(administrator=True)
     async def setchannel_prefix(self, ctx, channel: discord.TextChannel):
         """!setchannel #canal — Configurar canal para anuncios de bosses"""
-        await set_event_channel(ctx.guild.id, channel.id)
+        await replace_event_channel(ctx.guild.id, channel.id)
         await ctx.send(f"✅ Canal de anuncios configurado a {channel.mention}")
 
     @app_commands.command(name="setchannel", description="Configurar canal para anuncios de bosses")
     @app_commands.checks.has_permissions(administrator=True)
     async def setchannel_slash(self, interaction: discord.Interaction, canal: discord.TextChannel):
         try:
-            await set_event_channel(interaction.guild_id, canal.id)
+            await replace_event_channel(interaction.guild_id, canal.id)
             await interaction.response.send_message(f"✅ Canal de anuncios configurado a {canal.mention}")
         except discord.errors.NotFound:
             pass
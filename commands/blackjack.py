@@ -5,7 +5,8 @@ from discord.ext import commands
 from discord import app_commands
 from typing import Optional
 
-from db import get_user, add_money, get_inventory
+from db import get_user, add_money, get_inventory, get_inventory_view
+from item_effects import payout_multiplier, bonus_multiplier
 
 # ---------- Helpers ----------
 def new_deck():
@@ -124,10 +125,9 @@ class BlackjackCog(commands.Cog):
         player = [deck.pop(), deck.pop()]
         dealer = [deck.pop(), deck.pop()]
 
-        inv = await get_inventory(uid)
-        items_low = [i["item"].lower() for i in inv]
-        mecha_x2 = any(it == "x2 de dinero de mecha" for it in items_low)
-        danza = any(it == "danza de saviteto" for it in items_low)
+        inv = await get_inventory_view(uid)
+        payout_mult = payout_multiplier(inv)
+        bonus_mult = bonus_multiplier(inv)
 
         view = BJView(self, uid, timeout=120)
 
@@ -136,8 +136,8 @@ class BlackjackCog(commands.Cog):
             "player": player,
             "dealer": dealer,
             "bet": bet,
-            "mecha_x2": mecha_x2,
-            "danza": danza,
+            "payout_mult": payout_mult,
+            "bonus_mult": bonus_mult,
             "stage": "playing",
             "message": None,
             "view": view
@@ -256,12 +256,10 @@ class BlackjackCog(commands.Cog):
             # blackjack natural?
             if len(player) == 2 and hand_value(player) == 21:
                 bonus = int(bet * 1.5)  # standard 3:2
-                if state["danza"]:
-                    bonus = int(bonus * 1.15)
+                bonus = int(bonus * state["bonus_mult"])
                 payout += bonus
-            # aplicar mecha_x2 (duplica solo las ganancias)
-            if state["mecha_x2"]:
-                payout *= 2
+            # items de apuestas (multiplican solo las ganancias)
+            payout = int(payout * state["payout_mult"])
             total_payout = payout
             await add_money(uid, total_payout)
             result_text = f"✅ Ganaste {total_payout}💰! ({reason})"
@@ -292,7 +290,7 @@ class BlackjackCog(commands.Cog):
         )
         embed.add_field(name="Tu mano", value=f"{', '.join(player)} — {pv}", inline=False)
         embed.add_field(name="Mano del dealer", value=f"{', '.join(dealer)} — {dv}", inline=False)
-        content = result_text + (("\n\n(Se aplicaron tus items.)") if (state["mecha_x2"] or state["danza"]) else "")
+        content = result_text + (("\n\n(Se aplicaron tus items.)") if (state["payout_mult"] > 1 or state["bonus_mult"] > 1) else "")
 
         try:
             await interaction.response.edit_message(embed=embed, view=view, content=content)
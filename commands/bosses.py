@@ -6,16 +6,22 @@ from datetime import datetime, timedelta
 import random
 from typing import Optional
 from db import (
-    get_active_boss, create_boss, damage_boss, deactivate_boss,
+    get_active_boss, create_boss, hit_boss, peek_boss_hp, get_boss_damage,
     set_event_channel, remove_event_channel, get_event_channels, get_all_active_bosses,
     set_equipped_item, get_equipped_item, set_fight_cooldown, get_fight_cooldown,
     add_money, get_user, add_item_to_user, get_inventory,
-    remove_item, get_shop_item, add_experiencia, club_has_upgrade, get_pet_bonus_multiplier, add_pet_xp
+    get_shop_item, queue_user_delta, transaction, club_has_upgrade, get_pet_bonus_multiplier, add_pet_xp
 )
 from bosses import (
-    get_random_boss, resolve_player_attack, resolve_boss_attack, get_boss_reward,
+    get_random_boss, get_boss_reward, FightEngine,
     get_boss_by_name, get_all_boss_names, get_available_bosses_by_type, get_weapon_benefit
 )
+from announcer import announce
+
+# XP por matar un boss, repartida según el daño
+RAID_XP = 150
+# Jugadores listados en el reparto de la victoria
+RAID_SHOWN = 10
 
 # Pet abilities - imported at module level to avoid issues
 try:
@@ -43,14 +49,13 @@ async def equip_item_autocomplete(interaction: discord.Interaction, current: str
         return []
 
 class FightActionView(ui.View):
-    def __init__(self, user_id, interaction):
+    def __init__(self, user_id, interaction, items=()):
         super().__init__(timeout=60)
         self.user_id = user_id
         self.interaction = interaction
+        self.items = items  # inventario de la pelea (ya sin lo gastado)
         self.action = None
         self.selected_item = None
-        self.damage_buff = False
-        self.omega_charging = False  # Estado de carga de Fragmento Omega
     
     @ui.button(label="⚔️ Atacar", style=discord.ButtonStyle.red)
     async def attack_button(self, interaction: discord.Interaction, button: ui.Button):
@@ -75,16 +80,11 @@ class FightActionView(ui.View):
         if interaction.user.id != self.user_id:
             await interaction.response.defer()
             return
-        try:
-            inventory = await get_inventory(self.user_id)
-            if not inventory:
-                await interaction.response.send_message("❌ Inventario vacío", ephemeral=True)
-                return
-            options = [discord.SelectOption(label=f"{item['item']} (x{item['usos']})", value=str(item['id'])) for item in inventory[:25]]
-            await interaction.response.send_message("Selecciona un item:", view=ItemSelectView(self.user_id, self, options), ephemeral=True)
-        except Exception as e:
-            print(f"Error con inventario: {e}")
-            await interaction.response.send_message("❌ Error al cargar inventario", ephemeral=True)
+        if not self.items:
+            await interaction.response.send_message("❌ Inventario vacío", ephemeral=True)
+            return
+        options = [discord.SelectOption(label=f"{item['item']} (x{item['usos']})", value=str(item['id'])) for item in self.items[:25]]
+        await interaction.response.send_message("Selecciona un item:", view=ItemSelectView(self.user_id, self, options), ephemeral=True)
 
 class ItemSelectView(ui.View):
     def __init__(self, user_id, fight_view, options):
@@ -123,6 +123,40 @@ class BossesCog(commands.Cog):
         self.bot = bot
         self.spawn_tasks = {}
 
+    async def _pay_raid(self, contributions, dinero_total):
+        """Pagar a cada jugador su parte según el daño: {user_id: (dinero, xp, bonus mascota)}"""
+        total = sum(contributions.values()) or 1
+        payouts = {}
+        for uid, dmg in contributions.items():
+            share = dmg / total
+            pet_bonus = await get_pet_bonus_multiplier(uid)
+            dinero = int(dinero_total * share * pet_bonus)
+            
+            # HABILIDAD DE MASCOTA: Bonus en combate
+            if get_pet:
+                try:
+                    pet = await get_pet(uid)
+                    if pet:
+                        pet_name = pet.get("nombre", "").lower()
+                        if pet_name:
+                            abilities = PET_ABILITIES.get(pet_name, {})
+                            if "reward_multiplier" in abilities:
+                                dinero = int(dinero * (1 + abilities.get("reward_multiplier", 0)))
+                except Exception:
+                    pass  # Si hay error con mascota, continuar sin bonus
+            
+            # XP por victoria, también según el daño
+            xp = max(1, int(RAID_XP * share))
+            if await club_has_upgrade(uid, "Sala de Meditación"):
+                xp = int(xp * 1.30)  # +30% XP
+            # Dinero y XP se agrupan con el resto de pagos (write-behind)
+            queue_user_delta(uid, dinero=dinero, experiencia=xp)
+            
+            # Dar XP a mascota
+            await add_pet_xp(uid, 25)
+            payouts[uid] = (dinero, xp, pet_bonus)
+        return payouts
+
     async def _fight_internal(self, user_id, guild_id, interaction):
         """Interactive fight logic - user chooses actions each turn"""
         # Get all active bosses for this server
@@ -130,8 +164,8 @@ class BossesCog(commands.Cog):
         if not active_bosses:
             return await interaction.followup.send("❌ No hay jefe activo en este servidor.", ephemeral=True)
         
-        # Get the first (or only) active boss
-        boss_data = active_bosses[0]
+        # El primer boss activo que siga con vida
+        boss_data = next((b for b in active_bosses if b["current_hp"] > 0), active_bosses[0])
         boss_name = boss_data["boss_name"]
         
         # Get full boss info from bosses.py
@@ -144,224 +178,79 @@ class BossesCog(commands.Cog):
         boss["max_hp"] = boss_data["max_hp"]
         
         cooldown = await get_fight_cooldown(user_id, guild_id)
-        if cooldown and datetime.fromisoformat(cooldown.isoformat()) > datetime.now() - timedelta(minutes=2):
+        if cooldown and cooldown > datetime.now():
             return await interaction.followup.send("⏳ Debes esperar 2 minutos entre peleas.", ephemeral=True)
         
+        # Contexto del jugador: se carga una vez y el motor no toca la base
         equipped = await get_equipped_item(user_id)
         weapon = equipped["item_name"] if equipped else None
-        
-        player_hp = 100
-        boss_hp = boss["current_hp"]
-        turn = 1
-        fight_log = []
-        defend_next = False
-        omega_charging = False
+        upgrades = ("Armería Mejorada",) if await club_has_upgrade(user_id, "Armería Mejorada") else ()
+        engine = FightEngine(boss, boss["current_hp"], weapon, upgrades, await get_inventory(user_id))
+        consumed = []
         
         await interaction.followup.send("⚔️ ¡Iniciando combate!")
         
-        while player_hp > 0 and boss_hp > 0 and turn <= 30:
-            embed = discord.Embed(title=f"⚔️ Turno {turn}: {boss['name']}", color=discord.Color.red())
-            embed.add_field(name="Tu HP", value=f"{player_hp} HP", inline=True)
-            embed.add_field(name="HP Jefe", value=f"{boss_hp}/{boss['max_hp']} HP", inline=True)
+        kill = None
+        while not engine.finished:
+            # Vida compartida: otros jugadores le pegan al mismo boss
+            shared = peek_boss_hp(guild_id, boss_name)
+            if shared is None or shared[0] <= 0:
+                break
+            engine.boss_hp = shared[0]
+            
+            embed = discord.Embed(title=f"⚔️ Turno {engine.turn}: {boss['name']}", color=discord.Color.red())
+            embed.add_field(name="Tu HP", value=f"{engine.player_hp} HP", inline=True)
+            embed.add_field(name="HP Jefe", value=f"{engine.boss_hp}/{boss['max_hp']} HP", inline=True)
             embed.add_field(name="Elige tu acción:", value="⚔️ Atacar | 🛡️ Defender | 📦 Usar Item", inline=False)
-            embed.add_field(name="Último evento", value=fight_log[-1] if fight_log else "...", inline=False)
+            embed.add_field(name="Último evento", value=engine.log[-1] if engine.log else "...", inline=False)
             
-            view = FightActionView(user_id, interaction)
-            view.omega_charging = omega_charging  # Transferir estado de preparación
+            view = FightActionView(user_id, interaction, list(engine.inventory.values()))
             msg = await interaction.followup.send(embed=embed, view=view)
             await view.wait()
-            omega_charging = view.omega_charging  # Actualizar estado para próximo turno
-            
-            if view.action == "attack":
-                player_hit, player_dmg, player_crit = resolve_player_attack(weapon)
-                if player_hit:
-                    if view.damage_buff:
-                        player_dmg = int(player_dmg * 1.5)
-                        view.damage_buff = False
-                    # Bonus por upgrade Armería Mejorada
-                    if await club_has_upgrade(user_id, "Armería Mejorada"):
-                        player_dmg = int(player_dmg * 1.15)
-                    boss_hp -= player_dmg
-                    crit_text = " ¡CRÍTICO!" if player_crit else ""
-                    fight_log.append(f"⚔️ Golpeaste por {player_dmg}{crit_text}")
-                else:
-                    fight_log.append(f"❌ ¡Fallaste tu ataque!")
-            elif view.action == "defend":
-                defend_next = True
-                fight_log.append(f"🛡️ ¡Te preparaste para defender!")
-            elif view.action == "use_item" and view.selected_item:
-                try:
-                    item_id = int(view.selected_item)
-                    inventory = await get_inventory(user_id)
-                    used_item = None
-                    for item in inventory:
-                        if item['id'] == item_id:
-                            used_item = item
-                            break
-                    
-                    if used_item:
-                        item_name = used_item['item'].lower()
-                        item_type = used_item.get('categoria', 'consumible')
-                        
-                        # Efectos especiales por nombre de item (explore)
-                        if "núcleo energético" in item_name:
-                            boss_hp -= 80
-                            fight_log.append(f"⚡ ¡Núcleo Energético explotó! -80 HP al jefe!")
-                        elif "fragmento omega" in item_name:
-                            if not view.omega_charging:
-                                # Primera carga: modo preparación
-                                view.omega_charging = True
-                                fight_log.append(f"✨ ¡PREPARANDO FRAGMENTO OMEGA! Usa de nuevo el próximo turno para SUPER ATAQUE (120 dmg)!")
-                            else:
-                                # Segunda carga: super ataque activado
-                                boss_hp -= 120
-                                view.omega_charging = False
-                                fight_log.append(f"⚡⚡ ¡¡SUPER ATAQUE FRAGMENTO OMEGA!! -120 HP CRÍTICO al jefe!")
-                        elif "pistola vieja" in item_name or "máscara de xfi" in item_name:
-                            boss_hp -= 50
-                            fight_log.append(f"🔫 ¡Ataque crítico! -50 HP al jefe!")
-                        elif "llave maestra" in item_name:
-                            player_hp = min(100, player_hp + 40)
-                            boss_hp -= 30
-                            fight_log.append(f"🔑 ¡Magia de la llave! +40 HP y -30 HP jefe!")
-                        elif "aconsejante fantasma" in item_name:
-                            view.damage_buff = True
-                            fight_log.append(f"👻 ¡El fantasma te fortalece! +50% daño próximo!")
-                        elif "chihuahua" in item_name:
-                            attack_dmg = random.randint(15, 35)
-                            boss_hp -= attack_dmg
-                            fight_log.append(f"🐕 ¡El chihuahua ataca! -{attack_dmg} HP al jefe!")
-                        elif "traje ritual" in item_name:
-                            player_hp = min(100, player_hp + 60)
-                            defend_next = True
-                            fight_log.append(f"🎭 ¡Ritual mágico! +60 HP y defensa!")
-                        elif "botella de sedante" in item_name or "cuchillo oxidado" in item_name:
-                            boss_hp -= 35
-                            fight_log.append(f"💀 ¡Ataque efectivo! -{35} HP al jefe!")
-                        elif "palo golpeador" in item_name or "arma blanca artesanal" in item_name:
-                            boss_hp -= 40
-                            fight_log.append(f"⚒️ ¡Golpe contundente! -{40} HP al jefe!")
-                        elif "mecha enojado" in item_name:
-                            boss_hp -= 70
-                            fight_log.append(f"🤖 ¡Mecha Enojado te ayuda! -{70} HP al jefe!")
-                        elif "papitas" in item_name:
-                            player_hp = min(100, player_hp + 20)
-                            fight_log.append(f"🍟 ¡Papitas consumidas! +20 HP (¡qué delicia!)")
-                        elif item_type == "consumible":
-                            player_hp = min(100, player_hp + 50)
-                            fight_log.append(f"📦 ¡Recuperaste 50 HP!")
-                        elif "poción de furia" in item_name:
-                            boss_hp -= 60
-                            fight_log.append(f"🧪 ¡Poción de Furia lanzada! -{60} HP al jefe!")
-                        elif item_type == "consumible_damage":
-                            boss_hp -= 40
-                            fight_log.append(f"💥 ¡Infligiste 40 de daño directo!")
-                        elif "nektar antiguo" in item_name:
-                            player_hp = min(100, player_hp + 100)
-                            fight_log.append(f"🍹 ¡Nektar Antiguo! +100 HP (recuperación completa)!")
-                        elif "danza de saviteto" in item_name or item_type == "consumible_buff":
-                            view.damage_buff = True
-                            fight_log.append(f"⚡ ¡Tu próximo ataque inflige +50% de daño!")
-                        elif item_type == "consumible_shield":
-                            defend_next = True
-                            fight_log.append(f"🛡️ ¡Te protegerás del próximo ataque!")
-                        elif item_type == "arma":
-                            boss_hp -= 35
-                            fight_log.append(f"⚔️ ¡Arma equipada! -{35} HP al jefe!")
-                        elif item_type == "herramientas":
-                            player_hp = min(100, player_hp + 20)
-                            fight_log.append(f"🔧 ¡Herramienta usada! +20 HP!")
-                        elif item_type == "salud":
-                            player_hp = min(100, player_hp + 40)
-                            fight_log.append(f"⚕️ ¡Recuperaste 40 HP!")
-                        elif item_type == "mascota":
-                            dmg = random.randint(10, 25)
-                            boss_hp -= dmg
-                            fight_log.append(f"🐾 ¡Tu mascota ataca! -{dmg} HP al jefe!")
-                        elif item_type == "engano":
-                            view.damage_buff = True
-                            fight_log.append(f"🎭 ¡Engaño! +50% daño próximo!")
-                        elif item_type == "quimicos":
-                            boss_hp -= 30
-                            fight_log.append(f"🧪 ¡Químico! -{30} HP al jefe!")
-                        elif item_type == "tecnologia":
-                            boss_hp -= 25
-                            fight_log.append(f"⚙️ ¡Tecnología! -{25} HP al jefe!")
-                        else:
-                            player_hp = min(100, player_hp + 25)
-                            fight_log.append(f"📦 ¡Usaste item! +25 HP!")
-                        
-                        # Solo consumibles se gastan (salud, buffs, shields, etc)
-                        # Armas y herramientas son reutilizables
-                        is_consumible = item_type in ["consumible", "consumible_damage", "consumible_buff", "consumible_shield", "salud"]
-                        if is_consumible:
-                            await remove_item(item_id)
-                except Exception as e:
-                    print(f"Error usando item: {e}")
-                    fight_log.append(f"❌ Error al usar item")
             
-            if boss_hp <= 0:
+            dealt, used = engine.player_turn(view.action, view.selected_item)
+            if used is not None:
+                consumed.append(used)
+            if dealt:
+                hit = await hit_boss(guild_id, boss_name, user_id, dealt)
+                if hit is None:
+                    break
+                engine.boss_hp = hit.current_hp
+                if hit.killed:
+                    kill = hit
+            if engine.boss_hp <= 0:
                 break
             
-            boss_hit, boss_dmg, boss_crit = resolve_boss_attack(boss)
-            shield_active = defend_next
-            if defend_next:
-                boss_dmg = int(boss_dmg * 0.5)
-                defend_next = False
-            
-            if boss_hit:
-                player_hp -= boss_dmg
-                crit_text = " ¡CRÍTICO!" if boss_crit else ""
-                if shield_active:
-                    fight_log.append(f"🛡️ ¡Escudo Mágico activado! {boss['name']} golpeó por {boss_dmg}{crit_text} (daño reducido 50%)")
-                else:
-                    fight_log.append(f"💥 {boss['name']} golpeó por {boss_dmg}{crit_text}")
-            else:
-                fight_log.append(f"🛡️ {boss['name']} falló")
-            
-            turn += 1
+            engine.boss_turn()
             try:
                 await msg.delete()
             except:
                 pass
         
-        await damage_boss(guild_id, boss_name, max(0, boss_hp))
+        # Solo consumibles se gastan (salud, buffs, shields, etc): todos de una vez
+        if consumed:
+            try:
+                async with transaction() as tx:
+                    await tx.remove_items(consumed, owner_id=user_id)
+            except Exception as e:
+                print(f"Error gastando items: {e}")
+        fight_log = engine.log
         await set_fight_cooldown(user_id, guild_id)
         
-        if boss_hp <= 0:
+        if kill:
             from bosses import BOSS_WEAPONS
             reward = await get_boss_reward(boss)
             if not reward:
                 reward = {"dinero": 0, "item": None}
             
-            # Aplicar bonificador de mascota
-            dinero_base = reward.get("dinero", 0)
-            pet_bonus = await get_pet_bonus_multiplier(user_id)
-            dinero_final = int(dinero_base * pet_bonus)
-            
-            # HABILIDAD DE MASCOTA: Bonus en combate
-            if get_pet:
-                try:
-                    pet = await get_pet(user_id)
-                    if pet:
-                        pet_name = pet.get("nombre", "").lower()
-                        if pet_name:
-                            abilities = PET_ABILITIES.get(pet_name, {})
-                            if "reward_multiplier" in abilities:
-                                dinero_final = int(dinero_final * (1 + abilities.get("reward_multiplier", 0)))
-                except Exception:
-                    pass  # Si hay error con mascota, continuar sin bonus
-            
-            await add_money(user_id, dinero_final)
-            
-            # Dar XP a mascota
-            await add_pet_xp(user_id, 25)
+            # El botín se reparte según el daño de cada uno
+            contributions = kill.contributions or {user_id: kill.damage}
+            payouts = await self._pay_raid(contributions, reward.get("dinero", 0))
+            dinero_final, xp_reward, pet_bonus = payouts.get(user_id, (0, 0, 1.0))
+            # Arma e item van a quien más daño hizo (el que remata desempata)
+            top_id = max(contributions, key=lambda uid: (contributions[uid], uid == user_id))
+            top_text = "" if top_id == user_id else f" para <@{top_id}>"
             
-            # Agregar XP por victoria
-            xp_reward = 150
-            if await club_has_upgrade(user_id, "Sala de Meditación"):
-                xp_reward = int(xp_reward * 1.30)  # +30% XP
-            await add_experiencia(user_id, xp_reward)
             embed = discord.Embed(title="🏆 ¡VICTORIA!", color=discord.Color.gold())
             boss_name_display = boss.get("name", "Jefe Desconocido")
             embed.add_field(name="⚔️ Enemigo derrotado", value=f"```{boss_name_display}```", inline=False)
@@ -376,6 +265,16 @@ class BossesCog(commands.Cog):
                 value=f"💰 ```{dinero_final:,}``` dinero{bonus_text}\n⭐ ```{xp_reward}``` XP",
                 inline=False
             )
+            if len(contributions) > 1:
+                total = sum(contributions.values())
+                ranking = sorted(contributions.items(), key=lambda kv: -kv[1])
+                lines = [
+                    f"<@{uid}> — {dmg} daño ({dmg * 100 // total}%) → {payouts[uid][0]:,}💰"
+                    for uid, dmg in ranking[:RAID_SHOWN]
+                ]
+                if len(ranking) > RAID_SHOWN:
+                    lines.append(f"... y {len(ranking) - RAID_SHOWN} más")
+                embed.add_field(name=f"🤝 Reparto ({len(contributions)} jugadores)", value="\n".join(lines), inline=False)
             
             # Recompensa: arma única del boss (con probabilidades según tipo)
             boss_weapon = BOSS_WEAPONS.get(boss_name)
@@ -391,8 +290,8 @@ class BossesCog(commands.Cog):
                 weapon_chance = 1.0   # 100% para bosses especiales
             
             if boss_weapon and random.random() < weapon_chance:
-                await add_item_to_user(user_id, boss_weapon, rareza="maestro", usos=1, durabilidad=100, categoria="arma", poder=55)
-                embed.add_field(name="⚔️ ARMA ESPECIAL", value=f"**{boss_weapon}** (maestro - +20% cofres al explorar)", inline=False)
+                await add_item_to_user(top_id, boss_weapon, rareza="maestro", usos=1, durabilidad=100, categoria="arma", poder=55)
+                embed.add_field(name="⚔️ ARMA ESPECIAL", value=f"**{boss_weapon}**{top_text} (maestro - +20% cofres al explorar)", inline=False)
             elif boss_weapon:
                 # No consiguió el arma, pero se lo notificamos
                 embed.add_field(name="⚔️ Arma especial", value=f"Fallaste: {boss_weapon} no se obtuvo (probabilidad de {int(weapon_chance*100)}%)", inline=False)
@@ -401,18 +300,18 @@ class BossesCog(commands.Cog):
             reward_item = reward.get("item")
             if reward_item:
                 boss_rareza = boss.get("rareza", "común")
-                await add_item_to_user(user_id, reward_item, rareza=boss_rareza, usos=1, durabilidad=100, categoria="arma", poder=15)
-                embed.add_field(name="Item", value=f"📦 {reward_item}", inline=False)
+                await add_item_to_user(top_id, reward_item, rareza=boss_rareza, usos=1, durabilidad=100, categoria="arma", poder=15)
+                embed.add_field(name="Item", value=f"📦 {reward_item}{top_text}", inline=False)
             
-            await deactivate_boss(guild_id, boss_name)
             channels = await get_event_channels(guild_id)
-            for ch_id in channels:
-                try:
-                    ch = self.bot.get_channel(ch_id)
-                    if ch:
-                        await ch.send(f"🏆 <@{user_id}> derrotó a **{boss['name']}**!")
-                except:
-                    pass
+            helpers = f" junto a {len(contributions) - 1} jugadores" if len(contributions) > 1 else ""
+            announce(self.bot, [(guild_id, ch_id) for ch_id in channels],
+                     content=f"🏆 <@{user_id}> derrotó a **{boss['name']}**{helpers}!")
+        elif peek_boss_hp(guild_id, boss_name) is None:
+            # Otro jugador lo remató (o fue reemplazado) durante esta pelea
+            embed = discord.Embed(title="⚔️ El jefe ya cayó", color=discord.Color.gold())
+            embed.add_field(name="Jefe", value=f"```{boss['name']}```", inline=False)
+            embed.add_field(name="Tu aporte", value="Si le hiciste daño, tu parte del botín ya se repartió.", inline=False)
         else:
             embed = discord.Embed(title="💀 DERROTA", color=discord.Color.dark_red())
             embed.add_field(name="⚔️ Te derrotó", value=f"```{boss['name']}```", inline=False)
@@ -495,6 +394,10 @@ class BossesCog(commands.Cog):
         embed.add_field(name="HP Actual", value=f"{boss_data.get('current_hp', '?')} / {boss_data.get('max_hp', '?')}", inline=True)
         embed.add_field(name="Ataque", value=boss.get("ataque", "?"), inline=True)
         embed.add_field(name="Rareza", value=boss.get("rareza", "?"), inline=True)
+        damage = await get_boss_damage(guild_id, boss_data.get("boss_name"))
+        if damage:
+            lines = [f"<@{uid}> — {dmg} daño" for uid, dmg in list(damage.items())[:RAID_SHOWN]]
+            embed.add_field(name=f"🤝 Raid ({len(damage)} jugadores)", value="\n".join(lines), inline=False)
         embed.add_field(name="Usa !fight o /fight para atacar", value="⚔️", inline=False)
         
         await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -558,13 +461,7 @@ class BossesCog(commands.Cog):
         
         # Luego enviar a los canales configurados
         channels = await get_event_channels(guild_id)
-        for ch_id in channels:
-            try:
-                ch = self.bot.get_channel(ch_id)
-                if ch and ch.id != ctx.channel.id:
-                    await ch.send(embed=embed)
-            except:
-                pass
+        announce(self.bot, [(guild_id, ch_id) for ch_id in channels], embed=embed, exclude={ctx.channel.id})
 
     @app_commands.command(name="spawnboss", description="Forzar spawn de jefe (Admin)")
     @app_commands.describe(tipo="Tipo de jefe: Mini-Boss, Boss o Especial", jefe="O selecciona un jefe específico")
@@ -618,13 +515,7 @@ class BossesCog(commands.Cog):
         
         # Luego enviar a los canales configurados
         channels = await get_event_channels(guild_id)
-        for ch_id in channels:
-            try:
-                ch = self.bot.get_channel(ch_id)
-                if ch and ch.id != interaction.channel_id:
-                    await ch.send(embed=embed)
-            except:
-                pass
+        announce(self.bot, [(guild_id, ch_id) for ch_id in channels], embed=embed, exclude={interaction.channel_id})
 
 async def setup(bot):
     await bot.add_cog(BossesCog(bot))
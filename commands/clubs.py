@@ -1,14 +1,12 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import aiosqlite
-
-DB = "economy.db"
+from db import pool, transaction
 
 async def club_autocomplete(interaction: discord.Interaction, current: str):
     """Autocompletado para nombres de clubs"""
     try:
-        async with aiosqlite.connect(DB) as db:
+        async with pool.read() as db:
             cur = await db.execute("SELECT nombre FROM clubs WHERE nombre LIKE ? LIMIT 25", (f"%{current}%",))
             rows = await cur.fetchall()
             return [app_commands.Choice(name=row[0][:100], value=row[0]) for row in rows]
@@ -36,7 +34,7 @@ class ClubsCog(commands.Cog):
 
     async def get_club_by_name(self, nombre):
         """Obtener club por nombre"""
-        async with aiosqlite.connect(DB) as db:
+        async with pool.read() as db:
             cur = await db.execute("SELECT id, nombre, lider, dinero, miembros_max FROM clubs WHERE nombre = ?", (nombre,))
             row = await cur.fetchone()
             if row:
@@ -45,11 +43,11 @@ class ClubsCog(commands.Cog):
 
     async def get_user_club(self, user_id):
         """Obtener club del usuario"""
-        async with aiosqlite.connect(DB) as db:
+        async with pool.read() as db:
             cur = await db.execute(
                 "SELECT c.id, c.nombre, c.lider, c.dinero FROM clubs c "
                 "JOIN club_members cm ON c.id = cm.club_id WHERE cm.user_id = ?",
-                (str(user_id),)
+                (user_id,)
             )
             row = await cur.fetchone()
             if row:
@@ -58,7 +56,7 @@ class ClubsCog(commands.Cog):
 
     async def get_club_members(self, club_id):
         """Obtener miembros de un club"""
-        async with aiosqlite.connect(DB) as db:
+        async with pool.read() as db:
             cur = await db.execute(
                 "SELECT user_id, rango FROM club_members WHERE club_id = ? ORDER BY rango DESC",
                 (club_id,)
@@ -69,11 +67,11 @@ class ClubsCog(commands.Cog):
     async def is_club_leader(self, club_id, user_id):
         """Verificar si el usuario es líder del club"""
         club = await self.get_club_by_id(club_id)
-        return club and club["lider"] == str(user_id)
+        return club and club["lider"] == int(user_id)
     
     async def get_club_by_id(self, club_id):
         """Obtener club por ID"""
-        async with aiosqlite.connect(DB) as db:
+        async with pool.read() as db:
             cur = await db.execute("SELECT id, nombre, lider, dinero, miembros_max FROM clubs WHERE id = ?", (club_id,))
             row = await cur.fetchone()
             if row:
@@ -95,22 +93,20 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ Ya estás en un club. Sal del actual para crear uno nuevo.")
             return
         
-        async with aiosqlite.connect(DB) as db:
-            cur = await db.execute(
+        async with transaction() as tx:
+            cur = await tx.execute(
                 "INSERT INTO clubs(nombre, lider) VALUES (?, ?) RETURNING id",
-                (nombre, str(interaction.user.id))
+                (nombre, interaction.user.id)
             )
             row = await cur.fetchone()
-            if not row:
-                await interaction.followup.send("❌ Error al crear el club.")
-                return
-            club_id = row[0]
-            
-            await db.execute(
-                "INSERT INTO club_members(club_id, user_id, rango) VALUES (?, ?, ?)",
-                (club_id, str(interaction.user.id), "lider")
-            )
-            await db.commit()
+            if row:
+                await tx.execute(
+                    "INSERT INTO club_members(club_id, user_id, rango) VALUES (?, ?, ?)",
+                    (row[0], interaction.user.id, "lider")
+                )
+        if not row:
+            await interaction.followup.send("❌ Error al crear el club.")
+            return
         
         await interaction.followup.send(f"✅ Club **{nombre}** creado exitosamente. ¡Eres el líder!")
 
@@ -135,12 +131,11 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ Club lleno.")
             return
         
-        async with aiosqlite.connect(DB) as db:
-            await db.execute(
+        async with transaction() as tx:
+            await tx.execute(
                 "INSERT INTO club_members(club_id, user_id, rango) VALUES (?, ?, ?)",
-                (club_info["id"], str(interaction.user.id), "miembro")
+                (club_info["id"], interaction.user.id, "miembro")
             )
-            await db.commit()
         
         await interaction.followup.send(f"✅ ¡Bienvenido a **{club}**!")
 
@@ -181,16 +176,15 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ No estás en un club.")
             return
         
-        if club["lider"] == str(interaction.user.id):
+        if club["lider"] == interaction.user.id:
             await interaction.followup.send("❌ El líder no puede salir. Transfiere liderazgo primero.")
             return
         
-        async with aiosqlite.connect(DB) as db:
-            await db.execute(
+        async with transaction() as tx:
+            await tx.execute(
                 "DELETE FROM club_members WHERE club_id = ? AND user_id = ?",
-                (club["id"], str(interaction.user.id))
+                (club["id"], interaction.user.id)
             )
-            await db.commit()
         
         await interaction.followup.send(f"✅ Saliste de **{club['nombre']}**")
 
@@ -208,17 +202,17 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ No estás en un club.")
             return
         
-        from db import get_money, add_money
-        balance = await get_money(interaction.user.id)
-        if balance < cantidad:
+        async with transaction() as tx:
+            # Cobro condicional: comprobación y cobro en el mismo UPDATE
+            paid = await tx.spend_money(interaction.user.id, cantidad)
+            if paid:
+                await tx.execute("UPDATE clubs SET dinero = dinero + ? WHERE id = ?", (cantidad, club["id"]))
+            else:
+                balance = await tx.get_money(interaction.user.id)
+        if not paid:
             await interaction.followup.send(f"❌ No tienes {cantidad}💰. Tienes {balance}💰")
             return
         
-        async with aiosqlite.connect(DB) as db:
-            await db.execute("UPDATE users SET dinero = dinero - ? WHERE user_id = ?", (cantidad, str(interaction.user.id)))
-            await db.execute("UPDATE clubs SET dinero = dinero + ? WHERE id = ?", (cantidad, club["id"]))
-            await db.commit()
-        
         await interaction.followup.send(f"✅ Depositaste {cantidad}💰 a **{club['nombre']}**")
 
     @app_commands.command(name="retirar-club", description="Retirar dinero del club (solo líder)")
@@ -235,7 +229,7 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ No estás en un club.")
             return
         
-        if club["lider"] != str(interaction.user.id):
+        if club["lider"] != interaction.user.id:
             await interaction.followup.send("❌ Solo el líder puede retirar dinero.")
             return
         
@@ -243,10 +237,18 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send(f"❌ El club no tiene {cantidad}💰. Tiene {club['dinero']}💰")
             return
         
-        async with aiosqlite.connect(DB) as db:
-            await db.execute("UPDATE clubs SET dinero = dinero - ? WHERE id = ?", (cantidad, club["id"]))
-            await db.execute("UPDATE users SET dinero = dinero + ? WHERE user_id = ?", (cantidad, str(interaction.user.id)))
-            await db.commit()
+        async with transaction() as tx:
+            # Solo si la tesorería todavía alcanza: otro retiro pudo adelantarse
+            cur = await tx.execute(
+                "UPDATE clubs SET dinero = dinero - ? WHERE id = ? AND dinero >= ?",
+                (cantidad, club["id"], cantidad)
+            )
+            paid = cur.rowcount == 1
+            if paid:
+                await tx.add_money(interaction.user.id, cantidad)
+        if not paid:
+            await interaction.followup.send(f"❌ El club ya no tiene {cantidad}💰.")
+            return
         
         await interaction.followup.send(f"✅ Retiraste {cantidad}💰 del club.")
 
@@ -264,7 +266,7 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ No estás en un club.")
             return
         
-        if club["lider"] != str(interaction.user.id):
+        if club["lider"] != interaction.user.id:
             await interaction.followup.send("❌ Solo el líder puede dar dinero a los miembros.")
             return
         
@@ -280,10 +282,18 @@ class ClubsCog(commands.Cog):
             return
         
         # Transferir dinero
-        async with aiosqlite.connect(DB) as db:
-            await db.execute("UPDATE clubs SET dinero = dinero - ? WHERE id = ?", (cantidad, club["id"]))
-            await db.execute("UPDATE users SET dinero = dinero + ? WHERE user_id = ?", (cantidad, str(usuario.id)))
-            await db.commit()
+        async with transaction() as tx:
+            cur = await tx.execute(
+                "UPDATE clubs SET dinero = dinero - ? WHERE id = ? AND dinero >= ? RETURNING dinero",
+                (cantidad, club["id"], cantidad)
+            )
+            row = await cur.fetchone()
+            paid = row is not None
+            if paid:
+                await tx.add_money(usuario.id, cantidad)
+        if not paid:
+            await interaction.followup.send(f"❌ El club ya no tiene {cantidad}💰.")
+            return
         
         embed = discord.Embed(
             title="💰 Donación de Club",
@@ -291,7 +301,7 @@ class ClubsCog(commands.Cog):
             color=discord.Color.green()
         )
         embed.add_field(name="💚 Generosidad Terapéutica", value=f"El líder del grupo de apoyo compartió recursos para la recuperación grupal.", inline=False)
-        embed.set_footer(text=f"Tesorería del club: {club['dinero'] - cantidad}💰")
+        embed.set_footer(text=f"Tesorería del club: {row[0]}💰")
         await interaction.followup.send(embed=embed)
 
     @app_commands.command(name="expulsar-miembro", description="Expulsar miembro del club (solo líder)")
@@ -304,7 +314,7 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ No estás en un club.")
             return
         
-        if club["lider"] != str(interaction.user.id):
+        if club["lider"] != interaction.user.id:
             await interaction.followup.send("❌ Solo el líder puede expulsar miembros.")
             return
         
@@ -313,16 +323,15 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ Ese usuario no está en tu club.")
             return
         
-        if str(usuario.id) == club["lider"]:
+        if usuario.id == club["lider"]:
             await interaction.followup.send("❌ No puedes expulsar al líder.")
             return
         
-        async with aiosqlite.connect(DB) as db:
-            await db.execute(
+        async with transaction() as tx:
+            await tx.execute(
                 "DELETE FROM club_members WHERE club_id = ? AND user_id = ?",
-                (club["id"], str(usuario.id))
+                (club["id"], usuario.id)
             )
-            await db.commit()
         
         await interaction.followup.send(f"✅ Expulsaste a {usuario.mention} del club.")
 
@@ -336,7 +345,7 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ No estás en un club.")
             return
         
-        if club["lider"] != str(interaction.user.id):
+        if club["lider"] != interaction.user.id:
             await interaction.followup.send("❌ Solo el líder puede promover miembros.")
             return
         
@@ -345,12 +354,11 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ Ese usuario no está en tu club.")
             return
         
-        async with aiosqlite.connect(DB) as db:
-            await db.execute(
+        async with transaction() as tx:
+            await tx.execute(
                 "UPDATE club_members SET rango = 'oficial' WHERE club_id = ? AND user_id = ?",
-                (club["id"], str(usuario.id))
+                (club["id"], usuario.id)
             )
-            await db.commit()
         
         await interaction.followup.send(f"✅ Promoviste a {usuario.mention} a oficial.")
 
@@ -359,7 +367,7 @@ class ClubsCog(commands.Cog):
         """Listar todos los clubs"""
         await interaction.response.defer()
         
-        async with aiosqlite.connect(DB) as db:
+        async with pool.read() as db:
             cur = await db.execute(
                 "SELECT id, nombre, lider, dinero, miembros_max FROM clubs ORDER BY dinero DESC LIMIT 20"
             )
@@ -422,7 +430,7 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ No estás en un club.")
             return
         
-        if club["lider"] != str(interaction.user.id):
+        if club["lider"] != interaction.user.id:
             await interaction.followup.send("❌ Solo el líder puede transferir liderazgo.")
             return
         
@@ -431,17 +439,16 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ Ese usuario no está en tu club.")
             return
         
-        async with aiosqlite.connect(DB) as db:
-            await db.execute("UPDATE clubs SET lider = ? WHERE id = ?", (str(usuario.id), club["id"]))
-            await db.execute(
+        async with transaction() as tx:
+            await tx.execute("UPDATE clubs SET lider = ? WHERE id = ?", (usuario.id, club["id"]))
+            await tx.execute(
                 "UPDATE club_members SET rango = 'oficial' WHERE club_id = ? AND user_id = ?",
-                (club["id"], str(interaction.user.id))
+                (club["id"], interaction.user.id)
             )
-            await db.execute(
+            await tx.execute(
                 "UPDATE club_members SET rango = 'lider' WHERE club_id = ? AND user_id = ?",
-                (club["id"], str(usuario.id))
+                (club["id"], usuario.id)
             )
-            await db.commit()
         
         await interaction.followup.send(f"✅ Transferiste el liderazgo a {usuario.mention}.")
 
@@ -471,7 +478,7 @@ class ClubsCog(commands.Cog):
         owned = []
         available = []
         
-        async with aiosqlite.connect(DB) as db:
+        async with pool.read() as db:
             for upg_name in UPGRADES.keys():
                 cur = await db.execute(
                     "SELECT 1 FROM club_upgrades WHERE club_id = ? AND upgrade = ?",
@@ -522,7 +529,7 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send("❌ No estás en un club.")
             return
         
-        if club["lider"] != str(interaction.user.id):
+        if club["lider"] != interaction.user.id:
             await interaction.followup.send("❌ Solo el líder puede comprar upgrades.")
             return
         
@@ -531,21 +538,30 @@ class ClubsCog(commands.Cog):
             await interaction.followup.send(f"❌ Dinero insuficiente. Necesitas {costo}💰 (tienes {club['dinero']}💰)")
             return
         
-        async with aiosqlite.connect(DB) as db:
-            cur = await db.execute(
+        async with transaction() as tx:
+            cur = await tx.execute(
                 "SELECT 1 FROM club_upgrades WHERE club_id = ? AND upgrade = ?",
                 (club["id"], upgrade)
             )
-            if await cur.fetchone():
-                await interaction.followup.send("❌ Ya tienes este upgrade.")
-                return
-            
-            await db.execute("UPDATE clubs SET dinero = dinero - ? WHERE id = ?", (costo, club["id"]))
-            await db.execute(
-                "INSERT INTO club_upgrades(club_id, upgrade) VALUES (?, ?)",
-                (club["id"], upgrade)
-            )
-            await db.commit()
+            owned = await cur.fetchone() is not None
+            paid = False
+            if not owned:
+                cur = await tx.execute(
+                    "UPDATE clubs SET dinero = dinero - ? WHERE id = ? AND dinero >= ?",
+                    (costo, club["id"], costo)
+                )
+                paid = cur.rowcount == 1
+                if paid:
+                    await tx.execute(
+                        "INSERT INTO club_upgrades(club_id, upgrade) VALUES (?, ?)",
+                        (club["id"], upgrade)
+                    )
+        if owned:
+            await interaction.followup.send("❌ Ya tienes este upgrade.")
+            return
+        if not paid:
+            await interaction.followup.send(f"❌ Dinero insuficiente. Necesitas {costo}💰")
+            return
         
         await interaction.followup.send(f"✅ Compraste **{upgrade}** por {costo}💰!\n💡 {UPGRADES[upgrade]['desc']}")
 
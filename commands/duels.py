@@ -4,6 +4,7 @@ from discord import app_commands
 import random
 from db import (create_duel, get_pending_duels, accept_duel, 
                 add_money, get_user, get_duel_cooldown, set_duel_cooldown)
+from names import resolve_names
 
 async def cantidad_sugerida_autocomplete(interaction: discord.Interaction, current: str):
     """Sugerencias de cantidad para duelos"""
@@ -59,16 +60,13 @@ class DuelsCog(commands.Cog):
             return
         
         embed = discord.Embed(title="⚔️ Duelos Pendientes", color=discord.Color.red())
+        names = await resolve_names(self.bot, [duel['retador'] for duel in duels], interaction.guild)
         for duel in duels:
-            try:
-                user = await self.bot.fetch_user(int(duel['retador']))
-                embed.add_field(
-                    name=f"ID: {duel['id']} - {user.name}",
-                    value=f"Apuesta: {duel['cantidad']}💰\n\nUsa `/aceptar-duel {duel['id']}` para aceptar",
-                    inline=False
-                )
-            except:
-                pass
+            embed.add_field(
+                name=f"ID: {duel['id']} - {names[duel['retador']]}",
+                value=f"Apuesta: {duel['cantidad']}💰\n\nUsa `/aceptar-duel {duel['id']}` para aceptar",
+                inline=False
+            )
         
         await interaction.followup.send(embed=embed)
 
@@ -93,18 +91,13 @@ class DuelsCog(commands.Cog):
         await add_money(ganador, cantidad)
         await add_money(perdedor, -cantidad)
         
-        # Mensaje de resultado
-        try:
-            ganador_user = await self.bot.fetch_user(ganador)
-            perdedor_user = await self.bot.fetch_user(perdedor)
-            embed = discord.Embed(
-                title="⚔️ ¡Duelo Completado!",
-                description=f"**Ganador:** {ganador_user.mention}\n**Perdedor:** {perdedor_user.mention}\n**Cantidad:** {cantidad}💰",
-                color=discord.Color.gold()
-            )
-            await interaction.followup.send(embed=embed)
-        except:
-            await interaction.followup.send(f"⚔️ Duelo completado. Ganador: <@{ganador}>")
+        # Mensaje de resultado (una mención no necesita pedir el usuario)
+        embed = discord.Embed(
+            title="⚔️ ¡Duelo Completado!",
+            description=f"**Ganador:** <@{ganador}>\n**Perdedor:** <@{perdedor}>\n**Cantidad:** {cantidad}💰",
+            color=discord.Color.gold()
+        )
+        await interaction.followup.send(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(DuelsCog(bot))
@@ -8,7 +8,7 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from discord.ui import Button, View
-from db import add_item_to_user, get_inventory, remove_item, get_lives, set_lives, reset_user_progress, update_mission_progress, add_pet_xp, set_explore_cooldown
+from db import add_item_to_user, get_inventory, get_inventory_view, remove_item, get_lives, set_lives, reset_user_progress, update_mission_progress, add_pet_xp, set_explore_cooldown, check_and_set_cooldown
 import random
 from typing import Tuple, List, Optional
 from cache import set_buff, get_buff, clear_buff
@@ -264,19 +264,15 @@ class ExploreCog(commands.Cog):
     @commands.cooldown(1, 25, commands.BucketType.user)
     async def explore_prefix(self, ctx):
         """Comando prefix: 🧠 Exploración del Subconsciente"""
+        await set_explore_cooldown(ctx.author.id)
         await self._do_explore(ctx.author, send_fn=lambda **kw: ctx.send(**kw), author_ctx=ctx)
 
     @app_commands.command(name="explore", description="🧠 Exploración del Subconsciente - Descubre traumas ocultos")
     async def explore_slash(self, interaction: discord.Interaction):
         """Comando slash: exploración del subconsciente"""
-        from db import get_explore_cooldown
-        from datetime import datetime, timedelta
-        
-        # Verificar cooldown de 25 segundos
-        last_explore = await get_explore_cooldown(interaction.user.id)
-        if last_explore and datetime.now() < last_explore:
-            remaining = last_explore - datetime.now()
-            secs = int(remaining.total_seconds())
+        # Verificar y registrar el cooldown de 25 segundos
+        secs = await check_and_set_cooldown(interaction.user.id, "explore")
+        if secs:
             return await interaction.response.send_message(f"⏳ Aún estás explorando. Espera {secs}s.", ephemeral=True)
         
         await interaction.response.defer()
@@ -284,11 +280,8 @@ class ExploreCog(commands.Cog):
 
     async def _do_explore(self, user, send_fn, author_ctx):
         """Lógica principal de exploración"""
-        # Establecer cooldown de 25 segundos
-        await set_explore_cooldown(user.id)
-        
-        inv = await get_inventory(user.id)
-        has_linterna = has_item_in_inv(inv, "linterna")
+        inv = await get_inventory_view(user.id)
+        has_linterna = inv.has("linterna")
 
         # Decidir entre cofre e item
         chest_chance = CHEST_CHANCE + (0.05 if has_linterna else 0.0)
@@ -296,7 +289,7 @@ class ExploreCog(commands.Cog):
         if random.random() < chest_chance:
             await self._handle_chest(user, send_fn, has_linterna)
         else:
-            await self._handle_item(user, send_fn, inv)
+            await self._handle_item(user, send_fn, inv.items)
 
     async def _handle_chest(self, user, send_fn, has_linterna: bool):
         """Maneja el encuentro de un cofre"""
@@ -5,7 +5,7 @@ Sistema de pesca para encontrar objetos acuáticos.
 import discord
 from discord.ext import commands
 from discord import app_commands
-from db import add_item_to_user, get_inventory, add_pet_xp, update_mission_progress, set_fishing_cooldown, get_fishing_cooldown, initialize_user_tools
+from db import add_item_to_user, get_inventory, get_inventory_view, add_pet_xp, update_mission_progress, set_fishing_cooldown, check_and_set_cooldown, initialize_user_tools
 from datetime import datetime
 import random
 
@@ -89,18 +89,15 @@ class FishingCog(commands.Cog):
     @commands.cooldown(1, 40, commands.BucketType.user)
     async def fish_prefix(self, ctx):
         """Comando prefix: pescar"""
+        await set_fishing_cooldown(ctx.author.id)
         await self._do_fish(ctx.author, send_fn=lambda **kw: ctx.send(**kw))
 
     @app_commands.command(name="pescar", description="🎣 Buceo en el Inconsciente - Pesca traumas sumergidos")
     async def fish_slash(self, interaction: discord.Interaction):
         """Comando slash: pescar"""
-        from datetime import datetime, timedelta
-        
-        # Verificar cooldown de 40 segundos
-        last_fish = await get_fishing_cooldown(interaction.user.id)
-        if last_fish and datetime.now() < last_fish:
-            remaining = last_fish - datetime.now()
-            secs = int(remaining.total_seconds())
+        # Verificar y registrar el cooldown de 40 segundos
+        secs = await check_and_set_cooldown(interaction.user.id, "fishing")
+        if secs:
             return await interaction.response.send_message(f"⏳ Aún estás pescando. Espera {secs}s.", ephemeral=True)
         
         await interaction.response.defer()
@@ -108,16 +105,15 @@ class FishingCog(commands.Cog):
 
     async def _do_fish(self, user, send_fn):
         """Lógica de pesca con sistema de clicks"""
-        await set_fishing_cooldown(user.id)
         
         # Inicializar herramientas si es la primera vez
         await initialize_user_tools(user.id)
         
-        inv = await get_inventory(user.id)
+        inv = await get_inventory_view(user.id)
         
         # Verificar si tiene cañas mejoradas
-        has_epic_rod = any(item["item"].lower() == "caña épica" for item in inv)
-        has_rare_rod = any(item["item"].lower() == "caña mejorada" for item in inv)
+        has_epic_rod = inv.has("caña épica")
+        has_rare_rod = inv.has("caña mejorada")
         
         # Ajustar pesos según herramientas
         weights = list(FISHING_WEIGHTS)
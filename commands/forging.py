@@ -5,7 +5,7 @@ Sistema de forja para crear armas únicas usando objetos de minería y pesca.
 import discord
 from discord.ext import commands
 from discord import app_commands
-from db import add_item_to_user, get_inventory, remove_item, replace_tool
+from db import get_inventory_view, transaction
 from typing import Optional, List, Tuple
 
 # Armas por rareza con sus requisitos
@@ -149,7 +149,7 @@ class ForgingCog(commands.Cog):
             return
         
         weapons = WEAPONS_RECIPES[rareza]
-        inv = await get_inventory(interaction.user.id)
+        inv = await get_inventory_view(interaction.user.id)
         
         # Crear embed con opciones
         embed = discord.Embed(
@@ -165,7 +165,7 @@ class ForgingCog(commands.Cog):
             can_forge = True
             missing = []
             for material_name, amount_needed in weapon_data["materials"]:
-                amount_have = sum(1 for item in inv if item["item"].lower() == material_name.lower())
+                amount_have = inv.count(material_name)
                 if amount_have < amount_needed:
                     can_forge = False
                     missing.append(f"{material_name} ({amount_have}/{amount_needed})")
@@ -194,12 +194,12 @@ class ForgingCog(commands.Cog):
         user_id = interaction.user.id
         
         # Actualizar inventario
-        inv = await get_inventory(user_id)
+        inv = await get_inventory_view(user_id)
         
         # Verificar que tiene todos los materiales con sugerencias detalladas
         missing_materials = []
         for material_name, amount_needed in materials:
-            amount_have = sum(1 for item in inv if item["item"].lower() == material_name.lower())
+            amount_have = inv.count(material_name)
             if amount_have < amount_needed:
                 missing_materials.append((material_name, amount_have, amount_needed))
         
@@ -225,36 +225,37 @@ class ForgingCog(commands.Cog):
             
             return await interaction.followup.send(embed=error_embed)
         
-        # Consumir materiales (eliminar del inventario)
+        # Elegir los materiales a consumir
+        material_ids = []
         for material_name, amount_needed in materials:
-            consumed = 0
-            for item in inv:
-                if consumed >= amount_needed:
-                    break
-                if item["item"].lower() == material_name.lower():
-                    await remove_item(item["id"])
-                    consumed += 1
+            matching = inv.find(material_name)[:amount_needed]
+            material_ids.extend(item["id"] for item in matching)
         
         # Determinar categoría según el tipo de herramienta
         categoria = "arma_forjada"
         poder = 45
-        tool_type = None
+        tool_type = weapon_data.get("tool_type")
         
-        if weapon_data.get("tool_type") == "mining":
+        if tool_type == "mining":
             categoria = "pico_mejorado"
             poder = 30
-            tool_type = "mining"
-            # Reemplazar pico anterior
-            await replace_tool(user_id, "mining")
-        elif weapon_data.get("tool_type") == "fishing":
+        elif tool_type == "fishing":
             categoria = "caña_mejorada"
             poder = 30
-            tool_type = "fishing"
-            # Reemplazar caña anterior
-            await replace_tool(user_id, "fishing")
         
-        # Agregar arma forjada o herramienta
-        await add_item_to_user(user_id, weapon_name, rareza=rareza, usos=1, durabilidad=100, categoria=categoria, poder=poder)
+        # Consumir materiales, reemplazar herramienta y crear el arma en una
+        # sola transacción: o se forja todo o no se toca nada
+        try:
+            async with transaction() as tx:
+                removed = await tx.remove_items(material_ids, owner_id=user_id)
+                if removed != len(material_ids):
+                    # Algún material se usó/vendió mientras se elegía el arma
+                    raise ValueError("materiales ya no disponibles")
+                if tool_type:
+                    await tx.replace_tool(user_id, tool_type)
+                await tx.add_item_to_user(user_id, weapon_name, rareza=rareza, usos=1, durabilidad=100, categoria=categoria, poder=poder)
+        except ValueError:
+            return await interaction.followup.send("❌ Tus materiales cambiaron durante la forja. Inténtalo de nuevo.")
         
         rarity_emoji = {"comun": "⚪", "raro": "🔵", "epico": "🟣", "legendario": "🟠"}
         
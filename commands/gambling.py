@@ -3,7 +3,8 @@ import random
 import discord
 from discord.ext import commands
 from discord import app_commands
-from db import get_user, add_money, get_inventory
+from db import get_user, add_money, get_inventory, get_inventory_view
+from item_effects import payout_multiplier
 
 class GamblingCog(commands.Cog):
     def __init__(self, bot):
@@ -30,15 +31,13 @@ class GamblingCog(commands.Cog):
         
         # Tirada
         result = random.choice([True, False])
-        inv = await get_inventory(interaction.user.id)
-        items_low = [i["item"].lower() for i in inv]
-        mecha_x2 = any(it == "x2 de dinero de mecha" for it in items_low)
+        inv = await get_inventory_view(interaction.user.id)
+        items_mult = payout_multiplier(inv)
         
         if result:
             # Ganó - duplica dinero
             payout = cantidad * 2
-            if mecha_x2:
-                payout *= 2
+            payout = int(payout * items_mult)
             await add_money(interaction.user.id, payout)
             
             embed = discord.Embed(
@@ -47,7 +46,7 @@ class GamblingCog(commands.Cog):
                 color=discord.Color.green()
             )
             embed.add_field(name="💚 Recuperación Mental", value=f"```+{payout}💰```", inline=False)
-            embed.set_footer(text="La confianza en tu intuición se fortalece..." + (" (Items aplicados)" if mecha_x2 else ""))
+            embed.set_footer(text="La confianza en tu intuición se fortalece..." + (" (Items aplicados)" if items_mult > 1 else ""))
         else:
             # Perdió
             embed = discord.Embed(
@@ -85,15 +84,13 @@ class GamblingCog(commands.Cog):
         
         # Girar ruleta
         winning_number = random.randint(1, 36)
-        inv = await get_inventory(interaction.user.id)
-        items_low = [i["item"].lower() for i in inv]
-        mecha_x2 = any(it == "x2 de dinero de mecha" for it in items_low)
+        inv = await get_inventory_view(interaction.user.id)
+        items_mult = payout_multiplier(inv)
         
         if numero == winning_number:
             # ¡GANÓ GRANDE!
             payout = cantidad * 36
-            if mecha_x2:
-                payout *= 2
+            payout = int(payout * items_mult)
             await add_money(interaction.user.id, payout)
             
             embed = discord.Embed(
@@ -103,7 +100,7 @@ class GamblingCog(commands.Cog):
             )
             embed.add_field(name="💚 Epifanía Psicológica", value=f"```+{payout}💰```", inline=False)
             embed.add_field(name="📝 Análisis", value="Tu intuición ha alcanzado su máxima claridad. Has ganado una batalla interna significativa.", inline=False)
-            embed.set_footer(text="¡Eres un verdadero maestro del azar!" + (" (Items aplicados)" if mecha_x2 else ""))
+            embed.set_footer(text="¡Eres un verdadero maestro del azar!" + (" (Items aplicados)" if items_mult > 1 else ""))
         else:
             # Perdió
             embed = discord.Embed(
@@ -151,17 +148,15 @@ class GamblingCog(commands.Cog):
         spin = [random.choice(symbol_names) for _ in range(3)]
         
         # Calcular payout
-        inv = await get_inventory(interaction.user.id)
-        items_low = [i["item"].lower() for i in inv]
-        mecha_x2 = any(it == "x2 de dinero de mecha" for it in items_low)
+        inv = await get_inventory_view(interaction.user.id)
+        items_mult = payout_multiplier(inv)
         
         # Comprobar coincidencias
         if spin[0] == spin[1] == spin[2]:
             # ¡JACKPOT! Todos 3 iguales
             multiplier = symbols[spin[0]]
             payout = cantidad * multiplier * 20  # Bonificador por 3 iguales
-            if mecha_x2:
-                payout *= 2
+            payout = int(payout * items_mult)
             await add_money(interaction.user.id, payout)
             
             emoji_name = {
@@ -179,7 +174,7 @@ class GamblingCog(commands.Cog):
             )
             embed.add_field(name="💚 Recuperación Espectacular", value=f"```+{payout}💰```", inline=False)
             embed.add_field(name="🎊 Celebración", value="Has alcanzado un estado de claridad mental excepcional. ¡Tu sanidad mental está en su pico máximo!", inline=False)
-            embed.set_footer(text="¡El universo te sonríe hoy!" + (" (Items aplicados)" if mecha_x2 else ""))
+            embed.set_footer(text="¡El universo te sonríe hoy!" + (" (Items aplicados)" if items_mult > 1 else ""))
         elif spin[0] == spin[1] or spin[1] == spin[2] or spin[0] == spin[2]:
             # 2 iguales - buscar el par
             pair_symbol = None
@@ -192,8 +187,7 @@ class GamblingCog(commands.Cog):
             if pair_symbol:
                 multiplier = symbols[pair_symbol]
                 payout = cantidad * multiplier * 5  # Bonificador por 2 iguales
-                if mecha_x2:
-                    payout *= 2
+                payout = int(payout * items_mult)
                 await add_money(interaction.user.id, payout)
                 
                 embed = discord.Embed(
@@ -203,7 +197,7 @@ class GamblingCog(commands.Cog):
                 )
                 embed.add_field(name="💚 Mejora Moderada", value=f"```+{payout}💰```", inline=False)
                 embed.add_field(name="📝 Reflexión", value="Pequeñas victorias son el camino hacia grandes transformaciones.", inline=False)
-                embed.set_footer(text="¡Buen resultado!" + (" (Items aplicados)" if mecha_x2 else ""))
+                embed.set_footer(text="¡Buen resultado!" + (" (Items aplicados)" if items_mult > 1 else ""))
             else:
                 # No hay coincidencia
                 embed = discord.Embed(
@@ -8,6 +8,7 @@ from discord.ext import commands
 from discord import app_commands, ui
 from db import get_inventory, remove_item, add_money, update_rank, repair_item, add_lives, create_pet, get_pet
 from typing import Optional
+from item_effects import item_effect
 
 
 # ==================== AUTOCOMPLETE ====================
@@ -178,9 +179,10 @@ class ItemsCog(commands.Cog):
             return
         
         item_name = item['item'].lower()
+        effect = item_effect(item['item'], item.get('categoria')).use
         
         # Efectos especiales de HUEVOS DE MASCOTAS
-        if "huevo" in item_name:
+        if effect.hatch:
             import asyncio
             import random
             
@@ -246,25 +248,9 @@ class ItemsCog(commands.Cog):
             return
         
         # Efectos especiales de items
-        if "papitas" in item_name:
-            await send_fn("🍟 **Papitas consumidas** — ¡Curas 20 HP mental! Tu ánimo sube.")
-        elif "bebida de la vida" in item_name:
-            await add_lives(user_id, 1)
-            await send_fn("💊 **Bebida de Vida Eterna administrada** — ¡Has recuperado una vida psicológica! 💚")
-        elif "kit de reparación" in item_name:
-            await send_fn("🔧 **Kit de Reparación Emocional usado** — Instrumentos terapéuticos restaurados")
-        elif "botella de sedante" in item_name:
-            await send_fn("💤 **Sedante Mental usado** — Sientes calma profunda...")
-        elif "teléfono" in item_name:
-            await send_fn("📞 **Teléfono de Emergencia activado** — Contactaste con el sanatorio")
-        elif "linterna" in item_name:
-            await send_fn("🔦 **Linterna Mental encendida** — ¡Tus traumas se iluminan!")
-        elif "chihuahua" in item_name or "animal de apoyo" in item_name:
-            await send_fn("🐕 **Animal de Apoyo activado** — Tu compañero emocional te acompaña")
-        elif "caja de cerillas" in item_name or "cerillas" in item_name:
-            await send_fn("🔥 **Catarsis encendida** — ¡Libera tu fuego interno! 🔥")
-        else:
-            await send_fn(f"✅ **{item['item']} usado** — Efecto especial aplicado")
+        if effect.lives:
+            await add_lives(user_id, effect.lives)
+        await send_fn(effect.text.format(item=item['item']))
         
         # Remover el item
         await remove_item(item_id)
@@ -1,7 +1,8 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from db import get_leaderboard, get_user
+from db import get_leaderboard, get_guild_rank, get_user
+from names import resolve_names
 
 class LeaderboardCog(commands.Cog):
     def __init__(self, bot):
@@ -23,12 +24,17 @@ class LeaderboardCog(commands.Cog):
             color=discord.Color.gold()
         )
         
+        names = await resolve_names(self.bot, [leader["user_id"] for leader in leaders], interaction.guild)
         for i, leader in enumerate(leaders, 1):
-            user = await self.bot.fetch_user(int(leader["user_id"])) if leader["user_id"].isdigit() else None
-            name = user.name if user else f"Usuario {leader['user_id']}"
+            name = names[leader["user_id"]]
             value = leader[stat]
             embed.add_field(name=f"{i}. {name}", value=f"`{value:,}`", inline=False)
         
+        if interaction.guild_id:
+            rank = await get_guild_rank(interaction.guild_id, interaction.user.id, stat)
+            if rank:
+                embed.set_footer(text=f"Tu posición: #{rank[0]} de {rank[2]} ({rank[1]:,})")
+        
         await interaction.followup.send(embed=embed)
 
 async def setup(bot):
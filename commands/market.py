@@ -1,7 +1,10 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from db import list_item_for_sale, get_market_listings, buy_from_market, get_inventory, remove_item, add_item_to_user, add_money
+from db import (list_item_for_sale, search_market, get_market_item_names, get_market_categories,
+                get_listings_by_seller, cancel_listing, buy_from_market, get_inventory, get_price_stats,
+                MARKET_BOUGHT, MARKET_OWN, MARKET_NO_MONEY)
+from names import resolve_names
 
 async def inventario_id_autocomplete(interaction: discord.Interaction, current: str):
     """Autocomplete para IDs de items del inventario"""
@@ -15,6 +18,73 @@ async def inventario_id_autocomplete(interaction: discord.Interaction, current:
     except Exception:
         return []
 
+async def mercado_item_autocomplete(interaction: discord.Interaction, current: str):
+    """Autocomplete con los nombres que hay en venta"""
+    try:
+        names = await get_market_item_names(current)
+        return [app_commands.Choice(name=name[:100], value=name[:100]) for name in names]
+    except Exception:
+        return []
+
+async def mercado_categoria_autocomplete(interaction: discord.Interaction, current: str):
+    try:
+        cats = await get_market_categories()
+        return [app_commands.Choice(name=c, value=c) for c in cats if current.lower() in c][:25]
+    except Exception:
+        return []
+
+async def mis_ventas_autocomplete(interaction: discord.Interaction, current: str):
+    """Autocomplete con las publicaciones propias"""
+    try:
+        listings = await get_listings_by_seller(interaction.user.id)
+        choices = [(f"{l.item} - {l.precio}💰 (ID: {l.id})", l.id) for l in listings]
+        filtered = [c for c in choices if current.lower() in c[0].lower()] if current else choices
+        return [app_commands.Choice(name=name[:100], value=lid) for name, lid in filtered[:25]]
+    except Exception:
+        return []
+
+class MarketPageView(discord.ui.View):
+    """Páginas del mercado con ◀ / ▶ (paginación por cursor)"""
+
+    def __init__(self, cog, author_id: int, guild, filters: dict, timeout: int = 120):
+        super().__init__(timeout=timeout)
+        self.cog = cog
+        self.author_id = int(author_id)
+        self.guild = guild
+        self.filters = filters
+        # cursores con los que se abrió cada página vista (None = la primera)
+        self.cursors = [None]
+        self.next_cursor = None
+
+    async def load(self):
+        listings, self.next_cursor = await search_market(after=self.cursors[-1], **self.filters)
+        self.empty = not listings
+        self.prev_btn.disabled = len(self.cursors) == 1
+        self.next_btn.disabled = self.next_cursor is None
+        return await self.cog.build_embed(listings, len(self.cursors), self.guild)
+
+    async def _check(self, interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Solo quien abrió el mercado puede pasar páginas.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def prev_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not await self._check(interaction):
+            return
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+        await interaction.response.edit_message(embed=await self.load(), view=self)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not await self._check(interaction):
+            return
+        if self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
+        await interaction.response.edit_message(embed=await self.load(), view=self)
+
 class MarketCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -24,6 +94,10 @@ class MarketCog(commands.Cog):
     async def sell_item(self, interaction: discord.Interaction, item_id: int, precio: int):
         await interaction.response.defer()
         
+        if precio <= 0:
+            await interaction.followup.send("❌ El precio debe ser mayor que 0.")
+            return
+
         inv = await get_inventory(interaction.user.id)
         item = next((i for i in inv if i['id'] == item_id), None)
         
@@ -31,31 +105,75 @@ class MarketCog(commands.Cog):
             await interaction.followup.send("❌ Item no encontrado.")
             return
         
-        await list_item_for_sale(interaction.user.id, item_id, precio)
-        await interaction.followup.send(f"✅ **{item['item']}** a la venta por {precio}💰")
+        if await list_item_for_sale(interaction.user.id, item_id, precio) is None:
+            await interaction.followup.send("❌ Item no encontrado.")
+            return
+        await interaction.followup.send(f"✅ **{item['item']}** a la venta por {precio}💰 (queda en custodia hasta que se venda)")
+
+    @app_commands.command(name="comprar-item", description="Comprar un item del mercado")
+    async def buy_item(self, interaction: discord.Interaction, publicacion_id: int):
+        await interaction.response.defer()
+        result, listing = await buy_from_market(publicacion_id, interaction.user.id)
+        if result == MARKET_BOUGHT:
+            await interaction.followup.send(f"🛒 Compraste **{listing.item}** por {listing.precio}💰")
+        elif result == MARKET_OWN:
+            await interaction.followup.send("❌ No puedes comprar tu propia publicación. Usa `/retirar-venta`.")
+        elif result == MARKET_NO_MONEY:
+            await interaction.followup.send("❌ No tienes suficiente dinero.")
+        else:
+            await interaction.followup.send("❌ Esa publicación ya no está disponible.")
+
+    @app_commands.command(name="retirar-venta", description="Retirar un item tuyo del mercado")
+    @app_commands.autocomplete(publicacion_id=mis_ventas_autocomplete)
+    async def cancel_sale(self, interaction: discord.Interaction, publicacion_id: int):
+        await interaction.response.defer()
+        if await cancel_listing(publicacion_id, interaction.user.id):
+            await interaction.followup.send("✅ Publicación retirada; el item volvió a tu inventario.")
+        else:
+            await interaction.followup.send("❌ Publicación no encontrada (¿ya se vendió?).")
 
     @app_commands.command(name="mercado", description="Ver items en venta")
-    async def market(self, interaction: discord.Interaction):
+    @app_commands.describe(item="Buscar un item por nombre", rareza="Solo esta rareza",
+                           categoria="Solo esta categoría", orden="Más baratos o más recientes primero")
+    @app_commands.autocomplete(item=mercado_item_autocomplete, categoria=mercado_categoria_autocomplete)
+    @app_commands.choices(
+        rareza=[app_commands.Choice(name=r.capitalize(), value=r) for r in ("comun", "raro", "epico", "legendario", "maestro")],
+        orden=[
+            app_commands.Choice(name="💰 Más baratos", value="precio"),
+            app_commands.Choice(name="🕒 Más recientes", value="reciente"),
+        ],
+    )
+    async def market(self, interaction: discord.Interaction, item: str = None, rareza: str = None,
+                     categoria: str = None, orden: str = "precio"):
         await interaction.response.defer()
-        listings = await get_market_listings(15)
-        
-        if not listings:
-            await interaction.followup.send("📭 No hay items en el mercado.")
+        filters = {"item": item, "rareza": rareza, "categoria": categoria, "sort": orden}
+        view = MarketPageView(self, interaction.user.id, interaction.guild, filters)
+        embed = await view.load()
+        if view.empty:
+            await interaction.followup.send("📭 No hay items en el mercado con esos filtros.")
             return
-        
+        await interaction.followup.send(embed=embed, view=view if view.next_cursor else None)
+
+    async def build_embed(self, listings, page, guild):
         embed = discord.Embed(title="🏪 Mercado", color=discord.Color.purple())
+        if not listings:
+            embed.description = "📭 No quedan más items."
+        names = await resolve_names(self.bot, [listing.vendedor for listing in listings], guild)
+        stats = await get_price_stats(listing.item for listing in listings)
         for listing in listings:
-            try:
-                user = await self.bot.fetch_user(int(listing['vendedor']))
-                embed.add_field(
-                    name=f"ID: {listing['id']} - {user.name}",
-                    value=f"Item #{listing['item_id']}: {listing['precio']}💰",
-                    inline=False
-                )
-            except:
-                pass
-        
-        await interaction.followup.send(embed=embed)
+            value = f"{listing.precio}💰 · {listing.categoria} · vende {names[listing.vendedor]}"
+            price = stats.get(listing.item)
+            if price:
+                value += f"\n📈 Última venta: {price.ultimo}💰"
+                if price.volumen_24h:
+                    value += f" · 24h: media {price.media_24h}💰, {price.volumen_24h} ventas"
+            embed.add_field(
+                name=f"ID: {listing.id} - {listing.item} ({listing.rareza})",
+                value=value,
+                inline=False
+            )
+        embed.set_footer(text=f"Página {page}")
+        return embed
 
 async def setup(bot):
     await bot.add_cog(MarketCog(bot))
@@ -5,7 +5,7 @@ Sistema de minería para encontrar minerales y objetos.
 import discord
 from discord.ext import commands
 from discord import app_commands
-from db import add_item_to_user, get_inventory, add_pet_xp, update_mission_progress, set_mining_cooldown, get_mining_cooldown, initialize_user_tools
+from db import add_item_to_user, get_inventory, get_inventory_view, add_pet_xp, update_mission_progress, set_mining_cooldown, check_and_set_cooldown, initialize_user_tools
 from datetime import datetime
 import random
 
@@ -79,18 +79,15 @@ class MiningCog(commands.Cog):
     @commands.cooldown(1, 30, commands.BucketType.user)
     async def mine_prefix(self, ctx):
         """Comando prefix: minar minerales"""
+        await set_mining_cooldown(ctx.author.id)
         await self._do_mine(ctx.author, send_fn=lambda **kw: ctx.send(**kw))
 
     @app_commands.command(name="minar", description="⛏️ Excava Traumas - Busca cristales de sanación")
     async def mine_slash(self, interaction: discord.Interaction):
         """Comando slash: minar"""
-        from datetime import datetime, timedelta
-        
-        # Verificar cooldown de 30 segundos
-        last_mine = await get_mining_cooldown(interaction.user.id)
-        if last_mine and datetime.now() < last_mine:
-            remaining = last_mine - datetime.now()
-            secs = int(remaining.total_seconds())
+        # Verificar y registrar el cooldown de 30 segundos
+        secs = await check_and_set_cooldown(interaction.user.id, "mining")
+        if secs:
             return await interaction.response.send_message(f"⏳ Aún estás minando. Espera {secs}s.", ephemeral=True)
         
         await interaction.response.defer()
@@ -98,16 +95,15 @@ class MiningCog(commands.Cog):
 
     async def _do_mine(self, user, send_fn):
         """Lógica de minería con botones interactivos"""
-        await set_mining_cooldown(user.id)
         
         # Inicializar herramientas si es la primera vez
         await initialize_user_tools(user.id)
         
-        inv = await get_inventory(user.id)
+        inv = await get_inventory_view(user.id)
         
         # Verificar si tiene picos mejorados
-        has_epic_pick = any(item["item"].lower() == "pico épico" for item in inv)
-        has_rare_pick = any(item["item"].lower() == "pico mejorado" for item in inv)
+        has_epic_pick = inv.has("pico épico")
+        has_rare_pick = inv.has("pico mejorado")
         
         # Ajustar pesos según herramientas
         weights = list(MINING_WEIGHTS)
@@ -4,6 +4,7 @@ from discord.ext import commands
 from discord import app_commands
 from discord.ui import Button, View, Select, select
 from db import get_user, get_inventory, damage_item, add_money, remove_item, update_mission_progress, get_rob_cooldown, set_rob_cooldown, get_pet
+from item_effects import item_effect
 import random
 from typing import Optional
 
@@ -13,94 +14,10 @@ try:
 except ImportError:
     PET_ABILITIES = {}
 
-# Mapa de stats por nombre del item (lowercase)
-ITEM_STATS = {
-    "cinta adhesiva":      {"categoria": "herramientas", "poder": 3},
-    "botella de sedante":  {"categoria": "quimicos",    "poder": 6},
-    "cuchillo oxidado":    {"categoria": "arma",       "poder": 18},
-    "pistola vieja":       {"categoria": "arma",       "poder": 35},
-    "botiquín":            {"categoria": "salud",      "poder": 2},
-    "arma blanca artesanal":{"categoria":"arma",       "poder": 25},
-    "palo golpeador de parejas felices": {"categoria":"arma","poder":30},
-    "savi peluche":        {"categoria": "engano",     "poder": 10},
-    "hélice de ventilador":{"categoria": "herramientas","poder": 8},
-    "aconsejante fantasma": {"categoria":"engano",     "poder": 30},
-    "id falso":            {"categoria": "engano",     "poder": 22},
-    "máscara de xfi":      {"categoria": "engano",     "poder": 35},
-    "bastón de staff":     {"categoria": "herramientas","poder": 28},
-    "teléfono":            {"categoria": "tecnologia", "poder": 12},
-    "chihuahua":           {"categoria": "mascota",    "poder": 5},
-    "mecha enojado":       {"categoria": "arma",       "poder": 40},
-    "linterna":            {"categoria": "herramientas","poder": 7},
-    "llave maestra":       {"categoria": "herramientas","poder": 40},
-    # Items de tienda
-    "paquete de peluches fino": {"categoria": "consumible", "poder": 15},
-    "x2 de dinero de mecha": {"categoria": "consumible", "poder": 12},
-    "danza de saviteto": {"categoria": "consumible", "poder": 20},
-    "poción de furia": {"categoria": "consumible", "poder": 18},
-    "escudo mágico": {"categoria": "consumible", "poder": 10},
-    "nektar antiguo": {"categoria": "consumible", "poder": 8},
-    "kit de reparación": {"categoria": "consumible", "poder": 0},  # No es arma de combate
-    # Items adicionales de explore
-    "botiquín": {"categoria": "salud", "poder": 2},
-    "traje ritual": {"categoria": "ropa", "poder": 35},
-    "núcleo energético": {"categoria": "tecnologia", "poder": 45},
-    "fragmento omega": {"categoria": "arma", "poder": 50},
-    "anillo oxidado": {"categoria": "accesorio", "poder": 4},
-    "mapa antiguo": {"categoria": "herramientas", "poder": 6},
-    "gafas de soldador": {"categoria": "accesorio", "poder": 8},
-    "caja de cerillas": {"categoria": "herramientas", "poder": 5},
-    "receta secreta": {"categoria": "quimicos", "poder": 16},
-    "placa de identificación": {"categoria": "accesorio", "poder": 7},
-    "cable usb": {"categoria": "tecnologia", "poder": 9},
-    "garrafa de aceite": {"categoria": "quimicos", "poder": 10},
-    "guitarra rota": {"categoria": "arma", "poder": 20},  # Raro, más poder que comunes
-}
-
-# Sincronizar con explore.py
-ITEM_STATS_EXPLORE = {
-    "cinta adhesiva": {"categoria": "herramientas", "poder": 3},
-    "botella de sedante": {"categoria": "quimicos", "poder": 6},
-    "cuchillo oxidado": {"categoria": "arma", "poder": 18},
-    "pistola vieja": {"categoria": "arma", "poder": 35},
-    "botiquín": {"categoria": "salud", "poder": 2},
-    "arma blanca artesanal": {"categoria": "arma", "poder": 25},
-    "palo golpeador de parejas felices": {"categoria": "arma", "poder": 30},
-    "savi peluche": {"categoria": "engano", "poder": 10},
-    "hélice de ventilador": {"categoria": "herramientas", "poder": 8},
-    "aconsejante fantasma": {"categoria": "engano", "poder": 30},
-    "id falso": {"categoria": "engano", "poder": 22},
-    "máscara de xfi": {"categoria": "engano", "poder": 35},
-    "bastón de staff": {"categoria": "herramientas", "poder": 28},
-    "teléfono": {"categoria": "tecnologia", "poder": 12},
-    "chihuahua": {"categoria": "mascota", "poder": 5},
-    "mecha enojado": {"categoria": "arma", "poder": 40},
-    "linterna": {"categoria": "herramientas", "poder": 7},
-    "llave maestra": {"categoria": "herramientas", "poder": 40},
-    "anillo oxidado": {"categoria": "accesorio", "poder": 4},
-    "mapa antiguo": {"categoria": "herramientas", "poder": 6},
-    "gafas de soldador": {"categoria": "accesorio", "poder": 8},
-    "caja de cerillas": {"categoria": "herramientas", "poder": 5},
-    "receta secreta": {"categoria": "quimicos", "poder": 16},
-    "núcleo energético": {"categoria": "tecnologia", "poder": 45},
-    "fragmento omega": {"categoria": "arma", "poder": 50},
-    "traje ritual": {"categoria": "ropa", "poder": 35},
-    "placa de identificación": {"categoria": "accesorio", "poder": 7},
-    "cable usb": {"categoria": "tecnologia", "poder": 9},
-    "garrafa de aceite": {"categoria": "quimicos", "poder": 10},
-    "guitarra rota": {"categoria": "arma", "poder": 12},
-}
-
-def weapon_power_from_rareza(rareza: Optional[str]):
-    if not rareza:
-        return 1
-    if rareza.lower() == "comun":
-        return 5
-    if rareza.lower() == "raro":
-        return 20
-    if rareza.lower() == "epico":
-        return 40
-    return 1
+def item_power(item):
+    """Poder con el que roba un item del inventario: el mismo que usa _perform_rob.
+    Las filas son inmutables: el poder se consulta, no se copia a la fila."""
+    return item_effect(item["item"]).poder
 
 class ChooseWeaponSelectView(View):
     def __init__(self, user_id: int, items: list, timeout: int = 30):
@@ -114,7 +31,7 @@ class ChooseWeaponSelectView(View):
             def __init__(self, items_list):
                 options = []
                 for it in items_list[:25]:  # Discord limita a 25 opciones
-                    poder = it.get("poder", 0)
+                    poder = item_power(it)
                     rareza = it.get("rareza", "?")
                     option_label = f"{it['item'][:50]}"
                     option_desc = f"Rareza: {rareza} | Poder: {poder}"
@@ -200,13 +117,8 @@ class RobCog(commands.Cog):
         if chosen_item_id is not None:
             # try to grab item info from target's perspective not needed; we only need power
             # but ideally we trust passed name to look up stat
-            key = chosen_item_name.lower() if chosen_item_name else ""
-            stats = ITEM_STATS.get(key)
-            if stats:
-                power = stats.get("poder", 0)
-            else:
-                # fallback: try to get rarity from DB? (skip for simplicity) use base
-                power = 10
+            # poder del registro de efectos; items sin entrada: 10
+            power = item_effect(chosen_item_name or "").poder
         else:
             power = 0
 
@@ -282,15 +194,9 @@ class RobCog(commands.Cog):
 
         inv = await get_inventory(user.id)
 
-        # enrich inventory with power if available
-        for it in inv:
-            key = it["item"].lower()
-            if key in ITEM_STATS:
-                it.setdefault("poder", ITEM_STATS[key].get("poder"))
-
         # build suggestion text
         if inv:
-            lines = [f"{i['item']} ({i.get('rareza','?')}) — poder {i.get('poder', weapon_power_from_rareza(i.get('rareza')))}" for i in inv]
+            lines = [f"{i['item']} ({i.get('rareza','?')}) — poder {item_power(i)}" for i in inv]
             suggestion_text = "Tus objetos:\n" + "\n".join(lines)
         else:
             suggestion_text = "No tienes objetos (puedes conseguirlos con `!explore`)."
@@ -314,7 +220,7 @@ class RobCog(commands.Cog):
         items_to_show = inv
         if len(inv) > 25:
             # Ordenar por poder descendente y tomar los primeros 25
-            items_to_show = sorted(inv, key=lambda x: x.get("poder", 0), reverse=True)[:25]
+            items_to_show = sorted(inv, key=item_power, reverse=True)[:25]
             embed.add_field(
                 name="📌 Nota",
                 value=f"Tienes {len(inv)} objetos. Mostrando los 25 mejores por poder.",
@@ -323,7 +229,7 @@ class RobCog(commands.Cog):
         
         # Agregar resumen visual
         if len(inv) <= 10:
-            lines = [f"**{i['item']}** ({i.get('rareza','?')}) — ⚡ {i.get('poder', weapon_power_from_rareza(i.get('rareza')))}" for i in items_to_show]
+            lines = [f"**{i['item']}** ({i.get('rareza','?')}) — ⚡ {item_power(i)}" for i in items_to_show]
             embed.add_field(name="Objetos disponibles", value="\n".join(lines), inline=False)
 
         view = ChooseWeaponSelectView(user.id, items_to_show, timeout=30)
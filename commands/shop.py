@@ -6,7 +6,8 @@ from typing import Optional
 
 from db import (
     get_shop, get_shop_item, add_money, add_item_to_user,
-    update_rank, get_user, add_shop_item, get_inventory, create_pet, get_pet, remove_item
+    update_rank, get_user, add_shop_item, get_inventory, create_pet, get_pet, remove_item,
+    transaction
 )
 
 class ShopPaginationView(ui.View):
@@ -157,9 +158,14 @@ class ShopCog(commands.Cog):
         if user["dinero"] < item["price"]:
             return await ctx.send("❌ No tienes dinero suficiente.")
         
-        await add_money(ctx.author.id, -item["price"])
-        # add to inventory con categoría del shop (type)
-        await add_item_to_user(ctx.author.id, item["name"], item["rarity"], usos=1, durabilidad=100, categoria=item["type"], poder=15)
+        # cobrar y añadir al inventario (categoría del shop = type) en un solo commit;
+        # el cobro vuelve a comprobar el saldo dentro de la transacción
+        async with transaction() as tx:
+            paid = await tx.spend_money(ctx.author.id, item["price"])
+            if paid:
+                await tx.add_item_to_user(ctx.author.id, item["name"], item["rarity"], usos=1, durabilidad=100, categoria=item["type"], poder=15)
+        if not paid:
+            return await ctx.send("❌ No tienes dinero suficiente.")
         
         if item["type"] == "huevo_mascota":
             await ctx.send(f"🥚 ✅ Compraste **{item['name']}** por {item['price']}💰\n\n👉 Usa `/use` para eclosionar el huevo. El tiempo depende de su rareza.")
@@ -183,8 +189,12 @@ class ShopCog(commands.Cog):
             if user["dinero"] < item["price"]:
                 return await interaction.followup.send(f"❌ No tienes dinero suficiente.\n💰 Necesitas: {item['price']}\n💵 Tienes: {user['dinero']}", ephemeral=True)
             
-            await add_money(interaction.user.id, -item["price"])
-            await add_item_to_user(interaction.user.id, item["name"], item["rarity"], usos=1, durabilidad=100, categoria=item["type"], poder=15)
+            async with transaction() as tx:
+                paid = await tx.spend_money(interaction.user.id, item["price"])
+                if paid:
+                    await tx.add_item_to_user(interaction.user.id, item["name"], item["rarity"], usos=1, durabilidad=100, categoria=item["type"], poder=15)
+            if not paid:
+                return await interaction.followup.send(f"❌ No tienes dinero suficiente.\n💰 Necesitas: {item['price']}", ephemeral=True)
             
             if item["type"] == "huevo_mascota":
                 await interaction.followup.send(f"🥚 ✅ Compraste **{item['name']}** por {item['price']}💰\n\n👉 Usa `/use` para eclosionar el huevo. El tiempo depende de su rareza.")
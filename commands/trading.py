@@ -1,8 +1,9 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from db import (create_trade, get_pending_trades, accept_trade, 
-                get_inventory, remove_item, add_item_to_user)
+from db import (create_trade, get_pending_trades, accept_trade, get_inventory,
+                TRADE_DONE, TRADE_STALE)
+from names import resolve_names
 
 async def inventario_items_autocomplete(interaction: discord.Interaction, current: str):
     """Autocomplete para items del inventario"""
@@ -16,6 +17,16 @@ async def inventario_items_autocomplete(interaction: discord.Interaction, curren
     except Exception:
         return []
 
+async def trades_pendientes_autocomplete(interaction: discord.Interaction, current: str):
+    """Autocomplete con los trades pendientes recibidos"""
+    try:
+        trades = await get_pending_trades(interaction.user.id)
+        choices = [(f"Trade {t.id}: item #{t.item_remitente} por tu item #{t.item_receptor}", t.id) for t in trades]
+        filtered = [c for c in choices if current in c[0]] if current else choices
+        return [app_commands.Choice(name=name[:100], value=tid) for name, tid in filtered[:25]]
+    except Exception:
+        return []
+
 class TradingCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -35,7 +46,9 @@ class TradingCog(commands.Cog):
             await interaction.followup.send("❌ Item no encontrado en alguno de los inventarios.")
             return
         
-        await create_trade(interaction.user.id, usuario.id, mi_item['id'], su_item['id'])
+        if await create_trade(interaction.user.id, usuario.id, mi_item['id'], su_item['id']) is None:
+            await interaction.followup.send("❌ No se pudo crear la oferta (¿es tu propio usuario o el item ya no está?).")
+            return
         await interaction.followup.send(f"✅ Oferta enviada a {usuario.mention}: Tu **{item_tuyo}** por su **{item_suyo}**")
 
     @app_commands.command(name="mis-trades", description="Ver trades pendientes")
@@ -48,18 +61,30 @@ class TradingCog(commands.Cog):
             return
         
         embed = discord.Embed(title="📦 Trades Pendientes", color=discord.Color.blue())
+        names = await resolve_names(self.bot, [trade['remitente'] for trade in trades], interaction.guild)
         for trade in trades:
-            try:
-                user = await self.bot.fetch_user(int(trade['remitente']))
-                embed.add_field(
-                    name=f"ID: {trade['id']} - {user.name}",
-                    value=f"Te ofrece item #{trade['item_remitente']} por tu item #{trade['item_receptor']}",
-                    inline=False
-                )
-            except:
-                pass
+            embed.add_field(
+                name=f"ID: {trade['id']} - {names[trade['remitente']]}",
+                value=f"Te ofrece item #{trade['item_remitente']} por tu item #{trade['item_receptor']}",
+                inline=False
+            )
         
         await interaction.followup.send(embed=embed)
 
+    @app_commands.command(name="aceptar-trade", description="Aceptar un trade pendiente")
+    @app_commands.autocomplete(trade_id=trades_pendientes_autocomplete)
+    async def accept_trade_cmd(self, interaction: discord.Interaction, trade_id: int):
+        await interaction.response.defer()
+        result, trade = await accept_trade(trade_id, interaction.user.id)
+        if result == TRADE_DONE:
+            await interaction.followup.send(
+                f"🤝 Trade completado: recibiste el item #{trade.item_remitente} de <@{trade.remitente}> "
+                f"a cambio de tu item #{trade.item_receptor}."
+            )
+        elif result == TRADE_STALE:
+            await interaction.followup.send("❌ Alguno de los items ya no está disponible; el trade quedó anulado.")
+        else:
+            await interaction.followup.send("❌ Trade no encontrado o ya cerrado.")
+
 async def setup(bot):
     await bot.add_cog(TradingCog(bot))
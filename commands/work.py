@@ -5,7 +5,7 @@ from discord import app_commands
 import random
 import asyncio
 from datetime import datetime, timedelta
-from db import add_money, get_user, set_work_cooldown, get_work_cooldown, get_inventory, club_has_upgrade, add_experiencia, update_mission_progress, add_pet_xp, get_pet_bonus_multiplier
+from db import add_money, get_user, set_work_cooldown, get_work_cooldown, get_inventory, club_has_upgrade, add_experiencia, update_mission_progress, add_pet_xp, get_pet_bonus_multiplier, queue_user_delta
 from cache import set_buff, get_buff
 import time
 
@@ -492,7 +492,8 @@ class WorkCog(commands.Cog):
             # Aplicar bonificador de mascota
             pet_bonus = await get_pet_bonus_multiplier(user_id)
             result = int(result * pet_bonus)
-            await add_money(user_id, result)
+            # Dinero, XP de mascota y misión se escriben juntos (write-behind)
+            queue_user_delta(user_id, dinero=result)
             # Dar XP a mascota
             await add_pet_xp(user_id, 15)
             # Actualizar progreso de misión "trabajar"
@@ -1,331 +1,978 @@
 # db.py
+import os
+import time
+import asyncio
 import aiosqlite
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Optional
+from migrations import migrate, enable_incremental_vacuum, plain_text, ESCROW_USER_ID, AUTO_VACUUM_INCREMENTAL
+from models import User, InventoryItem, Pet, Listing, Trade, Duel, PriceStats, RaidHit
+from ranking import Leaderboards
 
 DB = "economy.db"
 
-# ---------- Inicialización ----------
-async def init_db():
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id TEXT PRIMARY KEY,
-            dinero INTEGER DEFAULT 0,
-            experiencia INTEGER DEFAULT 0,
-            rango TEXT DEFAULT 'Novato',
-            trabajo TEXT DEFAULT 'Desempleado',
-            vidas INTEGER DEFAULT 3
-        )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS inventory (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            item TEXT,
-            rareza TEXT,
-            usos INTEGER DEFAULT 1,
-            durabilidad INTEGER DEFAULT 100,
-            categoria TEXT DEFAULT 'desconocido',
-            poder INTEGER DEFAULT 0
-        )
-        """)
-        # intentar agregar columnas si la tabla es antigua (safe)
-        try:
-            await db.execute("ALTER TABLE inventory ADD COLUMN categoria TEXT DEFAULT 'desconocido'")
-        except aiosqlite.OperationalError:
-            pass
+# ---------- CONFIGURACIÓN SQLITE ----------
+
+# PRAGMAs aplicados a cada conexión del pool. Se pueden sobreescribir con
+# variables de entorno sin tocar el código.
+DB_SETTINGS = {
+    # WAL: los lectores no se bloquean mientras otro comando hace commit
+    "journal_mode": os.environ.get("DB_JOURNAL_MODE", "WAL"),
+    # NORMAL es seguro en WAL (solo se pierde el último commit si se cae el SO)
+    "synchronous": os.environ.get("DB_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.environ.get("DB_MMAP_SIZE", 64 * 1024 * 1024)),
+    # Negativo = KiB (≈16 MB de caché de páginas por conexión)
+    "cache_size": int(os.environ.get("DB_CACHE_SIZE", -16000)),
+    # Milisegundos que una conexión espera al lock antes de "database is locked"
+    "busy_timeout": int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000)),
+    "temp_store": os.environ.get("DB_TEMP_STORE", "MEMORY"),
+}
+
+# Cada cuántos segundos se hace checkpoint del WAL (0 = desactivado)
+WAL_CHECKPOINT_SECONDS = int(os.environ.get("DB_CHECKPOINT_SECONDS", 300))
+
+async def apply_pragmas(conn, settings=None):
+    """Aplicar los PRAGMAs de DB_SETTINGS a una conexión"""
+    settings = settings or DB_SETTINGS
+    for name, value in settings.items():
+        await conn.execute(f"PRAGMA {name} = {value}")
+
+async def get_pragmas(conn):
+    """Leer los valores efectivos de los PRAGMAs configurados"""
+    result = {}
+    for name in DB_SETTINGS:
+        cur = await conn.execute(f"PRAGMA {name}")
+        row = await cur.fetchone()
+        result[name] = row[0] if row else None
+    return result
+
+# ---------- POOL DE CONEXIONES ----------
+
+# Número de conexiones de solo lectura que se mantienen abiertas.
+READER_CONNECTIONS = 4
+
+class ConnectionPool:
+    """Conexiones aiosqlite de larga duración: un escritor y N lectores.
+
+    SQLite admite un único escritor a la vez, así que todas las escrituras
+    se serializan sobre la misma conexión; las lecturas se reparten entre
+    las conexiones lectoras libres. Abrir cada conexión cuesta un hilo y
+    un open() del archivo, por eso se abren una sola vez en init_db().
+    """
+
+    def __init__(self, path, readers: int = READER_CONNECTIONS):
+        self.path = path
+        self.readers = max(1, readers)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._reader_conns: list = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._write_lock = asyncio.Lock()
+        self._write_owner: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self._checkpoint_task: Optional[asyncio.Task] = None
+
+    @property
+    def started(self):
+        return self._writer is not None
+
+    async def start(self):
+        """Abrir las conexiones (idempotente: on_ready puede llamarse varias veces)"""
+        async with self._start_lock:
+            if self.started:
+                return
+            timeout = DB_SETTINGS["busy_timeout"] / 1000
+            # El escritor va primero: journal_mode=WAL se guarda en el archivo
+            writer = await aiosqlite.connect(self.path, timeout=timeout)
+            await apply_pragmas(writer)
+            reader_conns = []
+            for _ in range(self.readers):
+                conn = await aiosqlite.connect(self.path, timeout=timeout)
+                await apply_pragmas(conn)
+                reader_conns.append(conn)
+            idle = asyncio.Queue()
+            for conn in reader_conns:
+                idle.put_nowait(conn)
+            self._reader_conns, self._idle = reader_conns, idle
+            self._writer = writer
+            if WAL_CHECKPOINT_SECONDS > 0:
+                self._checkpoint_task = asyncio.create_task(self._checkpoint_loop())
+
+    async def checkpoint(self, mode: str = "PASSIVE"):
+        """Volcar el WAL al archivo principal; devuelve (busy, log, checkpointed)"""
+        async with self.write() as db:
+            cur = await db.execute(f"PRAGMA wal_checkpoint({mode})")
+            return await cur.fetchone()
+
+    async def _checkpoint_loop(self):
+        """Checkpoint periódico para que el -wal no crezca sin límite"""
+        while True:
+            await asyncio.sleep(WAL_CHECKPOINT_SECONDS)
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                print(f"Error en wal_checkpoint: {e}")
+
+    async def close(self):
+        """Cerrar todas las conexiones (al apagar el bot)"""
+        async with self._start_lock:
+            if not self.started:
+                return
+            if self._checkpoint_task:
+                self._checkpoint_task.cancel()
+                self._checkpoint_task = None
+            async with self._write_lock:
+                try:
+                    await self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except aiosqlite.Error:
+                    pass
+                await self._writer.close()
+                self._writer = None
+            for conn in self._reader_conns:
+                await conn.close()
+            self._reader_conns, self._idle = [], None
+
+    @asynccontextmanager
+    async def read(self):
+        """Tomar prestada una conexión lectora"""
+        if not self.started:
+            await self.start()
+        idle = self._idle
+        conn = await idle.get()
         try:
-            await db.execute("ALTER TABLE inventory ADD COLUMN poder INTEGER DEFAULT 0")
-        except aiosqlite.OperationalError:
-            pass
+            yield conn
+        finally:
+            idle.put_nowait(conn)
+
+    def current_writer(self):
+        """La conexión escritora si la tarea actual ya la tiene tomada"""
+        if self._write_owner is not None and self._write_owner is asyncio.current_task():
+            return self._writer
+        return None
+
+    @asynccontextmanager
+    async def write(self):
+        """Acceso exclusivo a la conexión escritora; rollback si algo falla"""
+        if not self.started:
+            await self.start()
+        if self.current_writer() is not None:
+            # El lock no es reentrante: esperar aquí sería un deadlock
+            raise RuntimeError("Escritura anidada dentro de una transacción: usa los métodos de tx")
+        async with self._write_lock:
+            self._write_owner = asyncio.current_task()
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            finally:
+                self._write_owner = None
+
+pool = ConnectionPool(DB)
+
+# ---------- CACHÉS EN MEMORIA ----------
+
+USER_CACHE_SIZE = int(os.environ.get("DB_USER_CACHE_SIZE", 5000))
+USER_CACHE_TTL = float(os.environ.get("DB_USER_CACHE_TTL", 60))
+INVENTORY_CACHE_SIZE = int(os.environ.get("DB_INVENTORY_CACHE_SIZE", 2000))
+INVENTORY_CACHE_TTL = float(os.environ.get("DB_INVENTORY_CACHE_TTL", 60))
+
+class RowCache:
+    """LRU con TTL de datos por usuario tal como están en SQLite.
+
+    Las escrituras de db.py invalidan la entrada después del commit; cada
+    invalidación sube `epoch`, y una lectura que empezó antes no guarda su
+    resultado (podría ser la versión vieja).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._rows = OrderedDict()  # user_id -> (expira_en, fila o None)
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """Devuelve (encontrado, fila)"""
+        entry = self._rows.get(user_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._rows.move_to_end(user_id)
+                self.hits += 1
+                return True, entry[1]
+            del self._rows[user_id]
+        self.misses += 1
+        return False, None
+
+    def put(self, user_id, row, epoch):
+        if epoch != self.epoch or self.maxsize <= 0:
+            return
+        self._rows[user_id] = (time.monotonic() + self.ttl, row)
+        self._rows.move_to_end(user_id)
+        while len(self._rows) > self.maxsize:
+            self._rows.popitem(last=False)
+
+    def invalidate(self, *user_ids):
+        self.epoch += 1
+        for user_id in user_ids:
+            self._rows.pop(int(user_id), None)
+
+    def clear(self):
+        self.epoch += 1
+        self._rows.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._rows),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+# User por user_id; lo pendiente en write-behind se suma al leer
+user_cache = RowCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+# InventoryView por usuario
+inventory_cache = RowCache(INVENTORY_CACHE_SIZE, INVENTORY_CACHE_TTL)
+
+def invalidate_user(user_id):
+    """Para código que escribe en `users` sin pasar por db.py"""
+    user_cache.invalidate(user_id)
+
+def invalidate_inventory(user_id):
+    """Para código que escribe en `inventory` sin pasar por db.py"""
+    inventory_cache.invalidate(user_id)
+
+# ---------- ESCRITURA DIFERIDA (WRITE-BEHIND) ----------
+
+# Ventana en la que se acumulan incrementos antes de escribirlos juntos
+WRITE_BEHIND_WINDOW = int(os.environ.get("DB_WRITE_BEHIND_MS", 50)) / 1000
+
+class WriteBehindQueue:
+    """Acumula incrementos (dinero/XP/vidas, XP de mascota, progreso de
+    misión) por usuario y los escribe todos en una sola transacción cada
+    WRITE_BEHIND_WINDOW segundos.
+
+    Lectura de lo propio: get_user/get_pet/get_daily_mission suman lo que
+    sigue pendiente, y si el usuario tiene un lote a medio escribir leen por
+    la conexión escritora, que espera a que ese lote haga commit.
+    """
+
+    def __init__(self, window: float = WRITE_BEHIND_WINDOW):
+        self.window = window
+        self._users = {}     # user_id -> [dinero, experiencia, vidas]
+        self._pets = {}      # user_id -> xp
+        self._missions = {}  # (user_id, fecha) -> progreso
+        self._inflight = set()  # claves del lote que se está escribiendo
+        self._seq = 0           # sube cada vez que un lote pasa a "en vuelo"
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.stats = {"queued": 0, "flushes": 0, "rows": 0}
+
+    # --- encolar ---
+
+    def add_user_delta(self, user_id, dinero=0, experiencia=0, vidas=0):
+        delta = self._users.setdefault(int(user_id), [0, 0, 0])
+        delta[0] += dinero
+        delta[1] += experiencia
+        delta[2] += vidas
+        self._queued()
+
+    def add_pet_xp(self, user_id, xp):
+        uid = int(user_id)
+        self._pets[uid] = self._pets.get(uid, 0) + xp
+        self._queued()
+
+    def add_mission_progress(self, user_id, fecha, amount):
+        key = (int(user_id), fecha)
+        self._missions[key] = self._missions.get(key, 0) + amount
+        self._queued()
+
+    def _queued(self):
+        self.stats["queued"] += 1
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.window)
         try:
-            await db.execute("ALTER TABLE users ADD COLUMN vidas INTEGER DEFAULT 3")
-        except aiosqlite.OperationalError:
-            pass
-
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS shop (
-            name TEXT PRIMARY KEY,
-            price INTEGER,
-            type TEXT,
-            effect TEXT,
-            rarity TEXT
-        )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS work_cooldowns (
-            user_id TEXT,
-            job_name TEXT,
-            last_work TIMESTAMP,
-            PRIMARY KEY(user_id, job_name)
-        )
-        """)
-        # tabla para buffs activos (consumibles que el usuario activa con !use)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS active_buffs (
-            user_id TEXT,
-            buff TEXT,
-            expira_en TIMESTAMP
-        )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS boss_tables (
-            guild_id TEXT,
-            boss_name TEXT,
-            current_hp INTEGER,
-            max_hp INTEGER,
-            active BOOLEAN DEFAULT 1,
-            PRIMARY KEY (guild_id, boss_name)
+            await self.flush()
+        except Exception as e:
+            print(f"Error en write-behind flush: {e}")
+            if self._users or self._pets or self._missions:
+                self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    # --- pendientes (para lectura de lo propio) ---
+
+    def pending_user(self, user_id):
+        return self._users.get(int(user_id))
+
+    def pending_pet_xp(self, user_id):
+        return self._pets.get(int(user_id), 0)
+
+    def pending_mission(self, user_id, fecha):
+        return self._missions.get((int(user_id), fecha), 0)
+
+    async def read(self, key, query):
+        """Ejecutar query(db) sin perder un lote en vuelo para `key`.
+
+        key es ("user"|"pet"|"mission", user_id). Si ese usuario tiene un
+        lote escribiéndose, o empezó uno durante la lectura, se repite por
+        la conexión escritora (que espera a su commit).
+        """
+        conn = pool.current_writer()
+        if conn is not None:
+            # Dentro de una transacción no hay lotes en vuelo
+            return await query(conn)
+        seq = self._seq
+        if key not in self._inflight:
+            async with pool.read() as db:
+                result = await query(db)
+            if seq == self._seq:
+                return result
+        async with pool.write() as db:
+            return await query(db)
+
+    # --- escribir ---
+
+    async def flush(self):
+        """Escribir todo lo pendiente en una transacción"""
+        async with self._flush_lock:
+            if not (self._users or self._pets or self._missions):
+                return
+            users, pets, missions = self._users, self._pets, self._missions
+            self._users, self._pets, self._missions = {}, {}, {}
+            self._inflight = (
+                {("user", uid) for uid in users}
+                | {("pet", uid) for uid in pets}
+                | {("mission", uid) for uid, _ in missions}
+            )
+            self._seq += 1
+            try:
+                async with pool.write() as db:
+                    await db.executemany(
+                        _USER_DELTA_UPSERT,
+                        [(uid, d[0], d[1], d[2]) for uid, d in users.items()]
+                    )
+                    await db.executemany(
+                        "UPDATE mascotas SET xp = xp + ? WHERE id = "
+                        "(SELECT id FROM mascotas WHERE user_id = ? AND activa = 1 LIMIT 1)",
+                        [(xp, uid) for uid, xp in pets.items()]
+                    )
+                    await db.executemany(
+                        "UPDATE daily_missions SET progreso = progreso + ? WHERE user_id = ? AND fecha = ?",
+                        [(amount, uid, fecha) for (uid, fecha), amount in missions.items()]
+                    )
+                    await db.commit()
+                    # Se limpia dentro del lock del escritor: quien lea por
+                    # el escritor ya ve el commit y no debe sumar el lote
+                    self._inflight = set()
+                    user_cache.invalidate(*users)
+                    leaderboards.apply({uid: (d[0], d[1]) for uid, d in users.items()})
+            except BaseException:
+                # No perder nada: devolver el lote a pendientes
+                self._inflight = set()
+                for uid, d in users.items():
+                    self.add_user_delta(uid, *d)
+                for uid, xp in pets.items():
+                    self.add_pet_xp(uid, xp)
+                for (uid, fecha), amount in missions.items():
+                    self.add_mission_progress(uid, fecha, amount)
+                raise
+            self.stats["flushes"] += 1
+            self.stats["rows"] += len(users) + len(pets) + len(missions)
+
+write_behind = WriteBehindQueue()
+
+def queue_user_delta(user_id, dinero: int = 0, experiencia: int = 0, vidas: int = 0):
+    """Como apply_user_delta, pero diferido y agrupado con otros incrementos"""
+    write_behind.add_user_delta(user_id, dinero, experiencia, vidas)
+
+async def flush_writes():
+    """Forzar la escritura de todo lo pendiente (p.ej. antes de un reset)"""
+    await write_behind.flush()
+
+async def close_db():
+    """Escribir lo pendiente y cerrar el pool de conexiones"""
+    await write_behind.flush()
+    await pool.close()
+
+# ---------- Inicialización ----------
+async def init_db():
+    """Abrir el pool y aplicar las migraciones pendientes (ver migrations.py)"""
+    await pool.start()
+    await migrate(pool)
+    await enable_incremental_vacuum(pool)
+    await load_leaderboards()
+
+# ---------- ÍNDICES ----------
+
+# Consultas calientes de db.py con parámetros de ejemplo, para comprobar con
+# EXPLAIN QUERY PLAN que ninguna recorre la tabla entera.
+HOT_QUERIES = {
+    "get_user": ("SELECT * FROM users WHERE user_id = ?", (0,)),
+    "get_inventory": ("SELECT id, item, rareza, usos, durabilidad, categoria, poder FROM inventory WHERE user_id = ?", (0,)),
+    "get_active_buffs": ("SELECT buff, expira_en FROM active_buffs WHERE user_id = ?", (0,)),
+    "get_pending_trades": ("SELECT id, remitente, item_remitente, item_receptor FROM trades WHERE receptor = ? AND estado = 'pendiente'", (0,)),
+    "invalidate_trades": ("UPDATE trades INDEXED BY idx_trades_item_remitente SET estado = 'invalido' "
+                          "WHERE item_remitente IN (?) AND estado = 'pendiente'", (0,)),
+    "get_pending_duels": ("SELECT id, retador, cantidad FROM duels WHERE oponente = ? AND estado = 'pendiente'", (0,)),
+    "get_pet": ("SELECT id, nombre, xp, rareza, activa FROM mascotas WHERE user_id = ? AND activa = 1 LIMIT 1", (0,)),
+    "get_all_pets": ("SELECT id, nombre, xp, rareza, activa FROM mascotas WHERE user_id = ? ORDER BY activa DESC, id ASC", (0,)),
+    "get_listings_by_seller": ("SELECT id, vendedor, item_id, precio, item, rareza, categoria, fecha_lista FROM market WHERE vendedor = ?", (0,)),
+    "search_market_precio": ("SELECT id, vendedor, item_id, precio, item, rareza, categoria, fecha_lista FROM market WHERE (precio, id) > (?, ?) ORDER BY precio, id LIMIT ?", (0, 0, 11)),
+    "search_market_item": ("SELECT id, vendedor, item_id, precio, item, rareza, categoria, fecha_lista FROM market WHERE item = ? AND (precio, id) > (?, ?) ORDER BY precio, id LIMIT ?", ("x", 0, 0, 11)),
+    "search_market_rareza": ("SELECT id, vendedor, item_id, precio, item, rareza, categoria, fecha_lista FROM market WHERE rareza = ? ORDER BY precio, id LIMIT ?", ("raro", 11)),
+    "search_market_reciente": ("SELECT id, vendedor, item_id, precio, item, rareza, categoria, fecha_lista FROM market WHERE (fecha_lista, id) < (?, ?) ORDER BY fecha_lista DESC, id DESC LIMIT ?", (2**40, 0, 11)),
+    "club_has_upgrade": ("SELECT 1 FROM club_upgrades cu JOIN club_members cm ON cu.club_id = cm.club_id "
+                         "WHERE cm.user_id = ? AND cu.upgrade = ?", (0, "x")),
+    "get_club_bonus": ("SELECT c.dinero FROM clubs c JOIN club_members cm ON c.id = cm.club_id WHERE cm.user_id = ?", (0,)),
+    "get_all_active_bosses": ("SELECT boss_name, current_hp, max_hp FROM boss_tables WHERE guild_id = ? AND active = 1", (0,)),
+    "get_boss_damage": ("SELECT user_id, damage FROM boss_damage WHERE guild_id = ? AND boss_name = ? ORDER BY damage DESC", (0, "")),
+    "get_event_channels": ("SELECT channel_id FROM event_channels WHERE guild_id = ?", (0,)),
+    "load_cooldowns": ("SELECT user_id, action, scope, expires_at FROM cooldowns WHERE expires_at > ?", (0,)),
+    "get_daily_mission": ("SELECT * FROM daily_missions WHERE user_id = ? AND fecha = ?", (0, "")),
+}
+
+async def explain_hot_queries():
+    """Devolver {nombre: (usa_indice, [detalle del plan])} para HOT_QUERIES.
+
+    Un paso "SCAN tabla" sin "USING ... INDEX" es un recorrido completo.
+    """
+    result = {}
+    async with pool.read() as db:
+        # Leer sqlite_master fuerza a la conexión a recargar el esquema si
+        # init_db creó índices después de abrirla
+        await db.execute("SELECT count(*) FROM sqlite_master")
+        for name, (sql, params) in HOT_QUERIES.items():
+            try:
+                cur = await db.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            except aiosqlite.OperationalError as e:
+                # p.ej. una tabla antigua con columnas distintas
+                result[name] = (False, [f"ERROR: {e}"])
+                continue
+            details = [row[3] for row in await cur.fetchall()]
+            full_scan = any(d.startswith("SCAN") and "INDEX" not in d for d in details)
+            result[name] = (not full_scan, details)
+    return result
+
+# ---------- TRANSACCIONES ----------
+
+class Transaction:
+    """Helpers de db.py ligados a una única transacción de escritura.
+
+    Se obtiene con `async with transaction() as tx:`. Todo lo que se haga
+    con `tx` se confirma con un solo commit al salir del bloque, o se deshace
+    entero si salta una excepción. Dentro del bloque hay que usar los métodos
+    de `tx`: los helpers sueltos que escriben esperan al mismo lock.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        # usuarios/inventarios escritos: se invalidan tras el commit
+        self.touched_users = set()
+        self.touched_inventories = set()
+        # user_id -> [dinero, experiencia] sumados: van a los rankings tras el commit
+        self.stat_deltas = {}
+        # items que cambiaron de dueño o se borraron: sus trades pendientes se anulan
+        self.moved_items = set()
+
+    async def execute(self, sql, params=()):
+        return await self.db.execute(sql, params)
+
+    def touch_user(self, user_id):
+        """Marcar un usuario como modificado (para SQL propio vía execute)"""
+        self.touched_users.add(int(user_id))
+
+    def touch_inventory(self, user_id):
+        """Marcar un inventario como modificado (para SQL propio vía execute)"""
+        self.touched_inventories.add(int(user_id))
+
+    def _add_stats(self, user_id, dinero=0, experiencia=0):
+        delta = self.stat_deltas.setdefault(int(user_id), [0, 0])
+        delta[0] += dinero
+        delta[1] += experiencia
+
+    def _touch_owners(self, rows):
+        for row in rows:
+            self.touched_inventories.add(int(row[0]))
+
+    def _moved(self, rows):
+        """rows de un RETURNING user_id, id sobre items movidos o borrados"""
+        self._touch_owners(rows)
+        self.moved_items.update(row[1] for row in rows)
+
+    # --- usuarios ---
+
+    async def get_user(self, user_id):
+        cur = await self.db.execute("SELECT * FROM users WHERE user_id = ?", (int(user_id),))
+        return _user_from_row(user_id, await cur.fetchone())
+
+    async def get_money(self, user_id):
+        user = await self.get_user(user_id)
+        return user.dinero if user else 0
+
+    async def _upsert_returning(self, sql, params):
+        self.touch_user(params[0])
+        cur = await self.db.execute(sql, params)
+        return await cur.fetchone()
+
+    # Cada escritura de contadores es un único INSERT ... ON CONFLICT DO
+    # UPDATE: atómica frente a recompensas concurrentes y con RETURNING para
+    # devolver el valor nuevo sin otra consulta.
+
+    async def add_money(self, user_id, amount):
+        row = await self._upsert_returning(
+            "INSERT INTO users(user_id, dinero, vidas) VALUES (?, ?, 3) "
+            "ON CONFLICT(user_id) DO UPDATE SET dinero = dinero + excluded.dinero "
+            "RETURNING dinero",
+            (int(user_id), amount)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS equipment (
-            user_id TEXT PRIMARY KEY,
-            item_id INTEGER,
-            item_name TEXT
+        self._add_stats(user_id, dinero=amount)
+        pending = write_behind.pending_user(user_id)
+        return row[0] + (pending[0] if pending else 0)
+
+    async def spend_money(self, user_id, amount):
+        """Cobrar solo si el saldo alcanza; False (y nada cambia) si no.
+
+        Es un UPDATE condicional, así que la comprobación y el cobro no se
+        pueden separar aunque haya otra compra en curso. Lo pendiente en
+        write-behind también cuenta como saldo.
+        """
+        uid = int(user_id)
+        pending = write_behind.pending_user(uid)
+        cur = await self.db.execute(
+            "UPDATE users SET dinero = dinero - ? WHERE user_id = ? AND dinero + ? >= ?",
+            (amount, uid, pending[0] if pending else 0, amount)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS boss_cooldowns (
-            user_id TEXT,
-            guild_id TEXT,
-            last_fight TIMESTAMP,
-            PRIMARY KEY (user_id, guild_id)
+        if cur.rowcount != 1:
+            return False
+        self.touch_user(uid)
+        self._add_stats(uid, dinero=-amount)
+        return True
+
+    async def add_experiencia(self, user_id, amount):
+        row = await self._upsert_returning(
+            "INSERT INTO users(user_id, experiencia) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET experiencia = experiencia + excluded.experiencia "
+            "RETURNING experiencia",
+            (int(user_id), amount)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS boss_spawn_times (
-            guild_id TEXT,
-            boss_type TEXT,
-            last_spawn TIMESTAMP,
-            PRIMARY KEY (guild_id, boss_type)
+        self._add_stats(user_id, experiencia=amount)
+        pending = write_behind.pending_user(user_id)
+        return row[0] + (pending[1] if pending else 0)
+
+    async def set_job(self, user_id, job):
+        row = await self._upsert_returning(
+            "INSERT INTO users(user_id, trabajo) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET trabajo = excluded.trabajo "
+            "RETURNING trabajo",
+            (int(user_id), job)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS event_channels (
-            guild_id TEXT,
-            channel_id TEXT,
-            PRIMARY KEY (guild_id, channel_id)
+        return row[0]
+
+    async def update_rank(self, user_id, new_rank):
+        row = await self._upsert_returning(
+            "INSERT INTO users(user_id, rango) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET rango = excluded.rango "
+            "RETURNING rango",
+            (int(user_id), new_rank)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS daily_missions (
-            user_id TEXT,
-            fecha TEXT,
-            tipo TEXT,
-            objetivo INTEGER,
-            progreso INTEGER DEFAULT 0,
-            recompensa INTEGER,
-            completado BOOLEAN DEFAULT 0,
-            PRIMARY KEY (user_id, fecha)
+        return row[0]
+
+    async def add_lives(self, user_id, amount: int):
+        row = await self._upsert_returning(
+            "INSERT INTO users(user_id, vidas) VALUES (?, MAX(3, ?)) "
+            "ON CONFLICT(user_id) DO UPDATE SET vidas = vidas + ? "
+            "RETURNING vidas",
+            (int(user_id), amount, amount)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS trades (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            remitente TEXT,
-            receptor TEXT,
-            item_remitente INTEGER,
-            item_receptor INTEGER,
-            estado TEXT DEFAULT 'pendiente'
+        pending = write_behind.pending_user(user_id)
+        return row[0] + (pending[2] if pending else 0)
+
+    async def apply_user_delta(self, user_id, dinero: int = 0, experiencia: int = 0, vidas: int = 0):
+        row = await self._upsert_returning(_USER_DELTA_SQL, (int(user_id), dinero, experiencia, vidas))
+        self._add_stats(user_id, dinero, experiencia)
+        pending = write_behind.pending_user(user_id) or (0, 0, 0)
+        return {"dinero": row[0] + pending[0], "experiencia": row[1] + pending[1], "vidas": row[2] + pending[2]}
+
+    async def apply_user_deltas(self, deltas):
+        params = [(int(user_id), dinero, experiencia, vidas) for user_id, dinero, experiencia, vidas in deltas]
+        self.touched_users.update(p[0] for p in params)
+        await self.db.executemany(_USER_DELTA_UPSERT, params)
+        for uid, dinero, experiencia, _ in params:
+            self._add_stats(uid, dinero, experiencia)
+
+    # --- inventario ---
+
+    async def get_inventory(self, user_id):
+        cur = await self.db.execute(_INVENTORY_SQL, (int(user_id),))
+        return _inventory_from_rows(await cur.fetchall())
+
+    async def add_item_to_user(self, user_id, item_name, rareza="comun", usos=1, durabilidad=100, categoria="desconocido", poder=0):
+        """Devuelve el id del item nuevo"""
+        self.touch_inventory(user_id)
+        cur = await self.db.execute(
+            "INSERT INTO inventory(user_id, item, rareza, usos, durabilidad, categoria, poder) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (int(user_id), item_name, rareza, usos, durabilidad, categoria, poder)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS market (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            vendedor TEXT,
-            item_id INTEGER,
-            precio INTEGER,
-            fecha_lista TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        return cur.lastrowid
+
+    async def remove_item(self, item_id):
+        cur = await self.db.execute("DELETE FROM inventory WHERE id = ? RETURNING user_id, id", (item_id,))
+        self._moved(await cur.fetchall())
+
+    async def remove_items(self, item_ids, owner_id=None):
+        """Borrar varios items de una vez; devuelve cuántos se borraron.
+
+        Con owner_id solo borra los que sigan siendo de ese usuario, para
+        que quien llama pueda abortar si algún item ya no está.
+        """
+        item_ids = list(item_ids)
+        if not item_ids:
+            return 0
+        marks = ",".join("?" * len(item_ids))
+        sql = f"DELETE FROM inventory WHERE id IN ({marks})"
+        params = list(item_ids)
+        if owner_id is not None:
+            sql += " AND user_id = ?"
+            params.append(int(owner_id))
+        cur = await self.db.execute(sql + " RETURNING user_id, id", params)
+        rows = await cur.fetchall()
+        self._moved(rows)
+        return len(rows)
+
+    async def damage_item(self, item_id, damage: int):
+        cur = await self.db.execute(
+            "UPDATE inventory SET durabilidad = MAX(0, durabilidad - ?) WHERE id = ? RETURNING user_id",
+            (damage, item_id)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS mascotas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT NOT NULL,
-            nombre TEXT NOT NULL,
-            xp INTEGER DEFAULT 0,
-            rareza TEXT DEFAULT 'común',
-            activa BOOLEAN DEFAULT 1
+        self._touch_owners(await cur.fetchall())
+
+    async def repair_item(self, item_id, amount: int = 100):
+        cur = await self.db.execute(
+            "UPDATE inventory SET durabilidad = MIN(100, durabilidad + ?) WHERE id = ? RETURNING user_id",
+            (amount, item_id)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS pet_xp (
-            user_id TEXT PRIMARY KEY,
-            xp INTEGER DEFAULT 0
+        self._touch_owners(await cur.fetchall())
+
+    async def use_item_once(self, item_id):
+        cur = await self.db.execute("SELECT usos, user_id FROM inventory WHERE id = ?", (item_id,))
+        row = await cur.fetchone()
+        if row:
+            self.touch_inventory(row[1])
+        if row and row[0] > 1:
+            await self.db.execute("UPDATE inventory SET usos = usos - 1 WHERE id = ?", (item_id,))
+        else:
+            await self.db.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
+            self.moved_items.add(item_id)
+
+    async def replace_tool(self, user_id, new_tool_type: str):
+        """Borrar el pico o la caña anterior (ver TOOL_NAMES)"""
+        names = TOOL_NAMES.get(new_tool_type)
+        if not names:
+            return 0
+        # Filtrar en Python: LOWER() de SQLite no pasa "É" a "é"
+        inv = await self.get_inventory(user_id)
+        old_tools = [item.id for item in inv if item.item.lower() in names]
+        return await self.remove_items(old_tools)
+
+    # --- trading y mercado ---
+
+    async def create_trade(self, sender_id, receiver_id, item_id, asking_item_id):
+        """Devuelve el id del trade, o None si algún item no es de quien debe"""
+        sender, receiver = int(sender_id), int(receiver_id)
+        cur = await self.db.execute(
+            """INSERT INTO trades(remitente, receptor, item_remitente, item_receptor, estado, creado_en)
+               SELECT ?, ?, ?, ?, 'pendiente', ?
+               WHERE ? != ?
+                 AND EXISTS (SELECT 1 FROM inventory WHERE id = ? AND user_id = ?)
+                 AND EXISTS (SELECT 1 FROM inventory WHERE id = ? AND user_id = ?)""",
+            (sender, receiver, item_id, asking_item_id, int(time.time()),
+             sender, receiver, item_id, sender, asking_item_id, receiver)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS duels (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            retador TEXT,
-            oponente TEXT,
-            cantidad INTEGER,
-            estado TEXT DEFAULT 'pendiente'
+        return cur.lastrowid if cur.rowcount == 1 else None
+
+    async def accept_trade(self, trade_id, receiver_id):
+        """Liquidar un trade: (resultado, Trade o None).
+
+        Cerrar el trade y cambiar los dos items de dueño van en la misma
+        transacción, y cada paso es condicional:
+        - el trade solo pasa a 'aceptado' si sigue pendiente y es para este usuario
+        - el intercambio solo toca cada item si sigue siendo de quien lo ofreció;
+          si no se mueven los dos se lanza TradeFailed y se deshace todo
+        Los demás trades pendientes con estos items se anulan antes del commit.
+        """
+        receiver = int(receiver_id)
+        cur = await self.db.execute(
+            "UPDATE trades SET estado = 'aceptado' WHERE id = ? AND receptor = ? AND estado = 'pendiente' "
+            "RETURNING id, remitente, item_remitente, item_receptor",
+            (trade_id, receiver)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS upgrades (
-            user_id TEXT,
-            nombre TEXT,
-            PRIMARY KEY (user_id, nombre)
+        row = await cur.fetchone()
+        if row is None:
+            raise TradeFailed(TRADE_GONE)
+        trade = Trade.from_row(row)
+        cur = await self.db.execute(
+            "UPDATE inventory SET user_id = CASE id WHEN ? THEN ? ELSE ? END "
+            "WHERE (id = ? AND user_id = ?) OR (id = ? AND user_id = ?) "
+            "RETURNING user_id, id",
+            (trade.item_remitente, receiver, trade.remitente,
+             trade.item_remitente, trade.remitente, trade.item_receptor, receiver)
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS clubs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre TEXT UNIQUE NOT NULL,
-            lider TEXT NOT NULL,
-            dinero INTEGER DEFAULT 0,
-            miembros_max INTEGER DEFAULT 10,
-            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        rows = await cur.fetchall()
+        if len(rows) != 2:
+            raise TradeFailed(TRADE_STALE)
+        self._moved(rows)
+        return TRADE_DONE, trade
+
+    async def invalidate_trades(self, item_ids):
+        """Anular de una vez los trades pendientes que usan alguno de estos items"""
+        item_ids = list(item_ids)
+        if not item_ids:
+            return 0
+        marks = ",".join("?" * len(item_ids))
+        # INDEXED BY: con estadísticas viejas (tabla casi vacía al analizarla)
+        # el planificador elige idx_trades_estado_creado y recorre todos los
+        # pendientes; así cada item es un rango de (item, estado)
+        total = 0
+        for column in ("item_remitente", "item_receptor"):
+            cur = await self.db.execute(
+                f"UPDATE trades INDEXED BY idx_trades_{column} SET estado = 'invalido' "
+                f"WHERE {column} IN ({marks}) AND estado = 'pendiente'",
+                item_ids
+            )
+            total += cur.rowcount
+        return total
+
+    async def list_item_for_sale(self, user_id, item_id, price):
+        """Pasar el item a custodia y publicarlo.
+
+        Devuelve el id de la publicación, o None si el item no es del usuario.
+        En custodia el item no está en ningún inventario: no se puede usar,
+        intercambiar ni volver a publicar hasta que se compre o se retire.
+        """
+        cur = await self.db.execute(
+            "UPDATE inventory SET user_id = ? WHERE id = ? AND user_id = ? "
+            "RETURNING item, rareza, categoria",
+            (ESCROW_USER_ID, item_id, int(user_id))
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS club_members (
-            club_id INTEGER,
-            user_id TEXT,
-            rango TEXT DEFAULT 'miembro',
-            fecha_union TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            PRIMARY KEY (club_id, user_id),
-            FOREIGN KEY (club_id) REFERENCES clubs(id)
+        row = await cur.fetchone()
+        if row is None:
+            return None
+        self.touch_inventory(user_id)
+        self.moved_items.add(item_id)
+        cur = await self.db.execute(
+            "INSERT INTO market(vendedor, item_id, precio, item, rareza, categoria, fecha_lista) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (int(user_id), item_id, price, row[0], plain_text(row[1]), plain_text(row[2]), int(time.time()))
         )
-        """)
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS club_upgrades (
-            club_id INTEGER,
-            upgrade TEXT,
-            PRIMARY KEY (club_id, upgrade),
-            FOREIGN KEY (club_id) REFERENCES clubs(id)
+        return cur.lastrowid
+
+    async def cancel_listing(self, listing_id, user_id):
+        """Retirar una publicación propia; el item vuelve al inventario"""
+        cur = await self.db.execute(
+            "DELETE FROM market WHERE id = ? AND vendedor = ? RETURNING item_id",
+            (listing_id, int(user_id))
         )
-        """)
-        
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS rob_cooldowns (
-            user_id TEXT,
-            target_id TEXT,
-            last_rob TIMESTAMP,
-            PRIMARY KEY (user_id, target_id)
+        row = await cur.fetchone()
+        if row is None:
+            return False
+        await self.db.execute(
+            "UPDATE inventory SET user_id = ? WHERE id = ? AND user_id = ?",
+            (int(user_id), row[0], ESCROW_USER_ID)
         )
-        """)
-        
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS explore_cooldowns (
-            user_id TEXT PRIMARY KEY,
-            last_explore TIMESTAMP
+        self.touch_inventory(user_id)
+        return True
+
+    async def buy_from_market(self, market_id, buyer_id):
+        """Comprar una publicación: (resultado, Listing o None).
+
+        Cada paso es un UPDATE/DELETE condicional, así que dos compradores
+        no pueden llevarse lo mismo aunque lean la publicación a la vez:
+        - DELETE ... RETURNING reclama la publicación (solo uno lo consigue)
+        - el cobro solo se aplica si el saldo alcanza
+        - el item solo sale de custodia si sigue en custodia
+        Si algo falla se lanza PurchaseFailed y transaction() deshace todo.
+        """
+        buyer = int(buyer_id)
+        cur = await self.db.execute(
+            "DELETE FROM market WHERE id = ? AND vendedor != ? "
+            "RETURNING id, vendedor, item_id, precio, item, rareza, categoria, fecha_lista",
+            (market_id, buyer)
         )
-        """)
-        
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS duel_cooldowns (
-            user_id TEXT PRIMARY KEY,
-            last_duel TIMESTAMP
+        row = await cur.fetchone()
+        if row is None:
+            cur = await self.db.execute("SELECT 1 FROM market WHERE id = ?", (market_id,))
+            raise PurchaseFailed(MARKET_OWN if await cur.fetchone() else MARKET_GONE)
+        listing = Listing.from_row(row)
+        if not await self.spend_money(buyer, listing.precio):
+            raise PurchaseFailed(MARKET_NO_MONEY)
+        await self.add_money(listing.vendedor, listing.precio)
+        cur = await self.db.execute(
+            "UPDATE inventory SET user_id = ? WHERE id = ? AND user_id = ?",
+            (buyer, listing.item_id, ESCROW_USER_ID)
         )
-        """)
-        
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS mining_cooldowns (
-            user_id TEXT PRIMARY KEY,
-            last_mine TIMESTAMP
+        if cur.rowcount != 1:
+            raise PurchaseFailed(MARKET_GONE)
+        self.touch_inventory(buyer)
+        await self._record_trade(listing, buyer)
+        return MARKET_BOUGHT, listing
+
+    async def _record_trade(self, listing, buyer):
+        """Historial de la venta y agregados del minuto en curso"""
+        now = int(time.time())
+        await self.db.execute(
+            "INSERT INTO market_trades(item, precio, vendedor, comprador, fecha) VALUES (?, ?, ?, ?, ?)",
+            (listing.item, listing.precio, listing.vendedor, buyer, now)
         )
-        """)
-        
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS fishing_cooldowns (
-            user_id TEXT PRIMARY KEY,
-            last_fish TIMESTAMP
+        await self.db.execute(
+            "INSERT INTO market_price_buckets(item, inicio, resolucion, volumen, suma, minimo, maximo) "
+            "VALUES (?, ?, 60, 1, ?, ?, ?) "
+            "ON CONFLICT(item, inicio, resolucion) DO UPDATE SET "
+            "volumen = volumen + 1, suma = suma + excluded.suma, "
+            "minimo = MIN(minimo, excluded.minimo), maximo = MAX(maximo, excluded.maximo)",
+            (listing.item, now - now % 60, listing.precio, listing.precio, listing.precio)
         )
-        """)
-        
-        await db.execute("""
-        CREATE TABLE IF NOT EXISTS clan_wars (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            club1_id INTEGER NOT NULL,
-            club2_id INTEGER NOT NULL,
-            estado TEXT DEFAULT 'pendiente',
-            ganador INTEGER,
-            fecha_inicio TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (club1_id) REFERENCES clubs(id),
-            FOREIGN KEY (club2_id) REFERENCES clubs(id)
+        await self.db.execute(
+            "INSERT INTO market_prices(item, ultimo, ultimo_en) VALUES (?, ?, ?) "
+            "ON CONFLICT(item) DO UPDATE SET ultimo = excluded.ultimo, ultimo_en = excluded.ultimo_en",
+            (listing.item, listing.precio, now)
         )
-        """)
 
-        await db.commit()
+# La transacción abierta (solo puede haber una: el escritor es exclusivo)
+_open_tx: Optional[Transaction] = None
+
+@asynccontextmanager
+async def transaction():
+    """Unidad de trabajo: `async with transaction() as tx:` y un solo commit.
+
+    Si la tarea actual ya tiene una transacción abierta, se une a ella (el
+    commit lo hace la de fuera).
+    """
+    global _open_tx
+    conn = pool.current_writer()
+    if conn is not None:
+        yield _open_tx if _open_tx is not None and _open_tx.db is conn else Transaction(conn)
+        return
+    async with pool.write() as db:
+        tx = _open_tx = Transaction(db)
+        try:
+            yield tx
+            await tx.invalidate_trades(tx.moved_items)
+            await db.commit()
+            leaderboards.apply(tx.stat_deltas)
+        finally:
+            _open_tx = None
+        user_cache.invalidate(*tx.touched_users)
+        inventory_cache.invalidate(*tx.touched_inventories)
 
 # ---------- USUARIOS ----------
 
+def _with_pending(user_id, user):
+    """Sumar al User lo que sigue pendiente en write-behind"""
+    pending = write_behind.pending_user(user_id)
+    if not pending:
+        return user
+    if user is None:
+        user = User(int(user_id), 0, 0, "Novato", "Desempleado", 3)
+    return user._replace(
+        dinero=user.dinero + pending[0],
+        experiencia=user.experiencia + pending[1],
+        vidas=user.vidas + pending[2],
+    )
+
+def _user_from_row(user_id, row):
+    return _with_pending(user_id, User.from_row(row) if row else None)
+
 async def get_user(user_id):
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT * FROM users WHERE user_id = ?", (str(user_id),))
-        row = await cur.fetchone()
-        if row:
-            return {"user_id": row[0], "dinero": row[1], "experiencia": row[2], "rango": row[3], "trabajo": row[4], "vidas": row[5] if len(row) > 5 else 3}
-        return None
+    uid = int(user_id)
+    async def query(db):
+        cur = await db.execute("SELECT * FROM users WHERE user_id = ?", (uid,))
+        return await cur.fetchone()
+    if pool.current_writer() is not None:
+        # Dentro de una transacción: puede no estar confirmado, no cachear
+        return _user_from_row(user_id, await query(pool.current_writer()))
+    found, user = user_cache.get(uid)
+    if not found:
+        epoch = user_cache.epoch
+        row = await write_behind.read(("user", uid), query)
+        user = User.from_row(row) if row else None
+        user_cache.put(uid, user, epoch)
+    return _with_pending(uid, user)
 
 async def add_money(user_id, amount):
-    async with aiosqlite.connect(DB) as db:
-        user = await get_user(user_id)
-        if user:
-            await db.execute("UPDATE users SET dinero = dinero + ? WHERE user_id = ?", (amount, str(user_id)))
-        else:
-            await db.execute("INSERT INTO users(user_id, dinero, vidas) VALUES (?, ?, ?)", (str(user_id), amount, 3))
-        await db.commit()
+    """Sumar (o restar) dinero; devuelve el saldo nuevo"""
+    async with transaction() as tx:
+        return await tx.add_money(user_id, amount)
 
 async def get_money(user_id):
     user = await get_user(user_id)
-    return user["dinero"] if user else 0
+    return user.dinero if user else 0
 
 async def add_experiencia(user_id, amount):
-    async with aiosqlite.connect(DB) as db:
-        user = await get_user(user_id)
-        if user:
-            await db.execute("UPDATE users SET experiencia = experiencia + ? WHERE user_id = ?", (amount, str(user_id)))
-        else:
-            await db.execute("INSERT INTO users(user_id, experiencia) VALUES (?, ?)", (str(user_id), amount))
-        await db.commit()
+    """Sumar experiencia; devuelve la experiencia nueva"""
+    async with transaction() as tx:
+        return await tx.add_experiencia(user_id, amount)
 
 async def get_experiencia(user_id):
     user = await get_user(user_id)
     return user["experiencia"] if user else 0
 
 async def set_job(user_id, job):
-    async with aiosqlite.connect(DB) as db:
-        user = await get_user(user_id)
-        if user:
-            await db.execute("UPDATE users SET trabajo = ? WHERE user_id = ?", (job, str(user_id)))
-        else:
-            await db.execute("INSERT INTO users(user_id, trabajo) VALUES (?, ?)", (str(user_id), job))
-        await db.commit()
+    async with transaction() as tx:
+        return await tx.set_job(user_id, job)
 
 async def update_rank(user_id, new_rank):
-    async with aiosqlite.connect(DB) as db:
-        user = await get_user(user_id)
-        if user:
-            await db.execute("UPDATE users SET rango = ? WHERE user_id = ?", (new_rank, str(user_id)))
-        else:
-            await db.execute("INSERT INTO users(user_id, rango) VALUES (?, ?)", (str(user_id), new_rank))
-        await db.commit()
+    async with transaction() as tx:
+        return await tx.update_rank(user_id, new_rank)
 
 async def add_lives(user_id, amount: int):
-    """Agregar vidas al usuario"""
-    async with aiosqlite.connect(DB) as db:
-        user = await get_user(user_id)
-        if user:
-            await db.execute("UPDATE users SET vidas = vidas + ? WHERE user_id = ?", (amount, str(user_id)))
-        else:
-            await db.execute("INSERT INTO users(user_id, vidas) VALUES (?, ?)", (str(user_id), max(3, amount)))
-        await db.commit()
+    """Agregar vidas al usuario; devuelve las vidas nuevas"""
+    async with transaction() as tx:
+        return await tx.add_lives(user_id, amount)
 
 async def set_lives(user_id, lives: int):
     """Establecer vidas del usuario"""
-    async with aiosqlite.connect(DB) as db:
-        user = await get_user(user_id)
-        if user:
-            await db.execute("UPDATE users SET vidas = ? WHERE user_id = ?", (lives, str(user_id)))
-        else:
-            await db.execute("INSERT INTO users(user_id, vidas) VALUES (?, ?)", (str(user_id), lives))
-        await db.commit()
+    # Un valor absoluto pisa lo pendiente: escribir antes los incrementos
+    await write_behind.flush()
+    async with transaction() as tx:
+        tx.touch_user(user_id)
+        cur = await tx.execute(
+            "INSERT INTO users(user_id, vidas) VALUES (?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET vidas = excluded.vidas "
+            "RETURNING vidas",
+            (int(user_id), lives)
+        )
+        row = await cur.fetchone()
+        return row[0]
+
+_USER_DELTA_UPSERT = (
+    "INSERT INTO users(user_id, dinero, experiencia, vidas) VALUES (?, ?, ?, 3 + ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET "
+    "dinero = dinero + excluded.dinero, "
+    "experiencia = experiencia + excluded.experiencia, "
+    "vidas = vidas + excluded.vidas - 3"
+)
+_USER_DELTA_SQL = _USER_DELTA_UPSERT + " RETURNING dinero, experiencia, vidas"
+
+async def apply_user_delta(user_id, dinero: int = 0, experiencia: int = 0, vidas: int = 0):
+    """Aplicar dinero/experiencia/vidas en una sola escritura.
+
+    Devuelve {"dinero", "experiencia", "vidas"} con los valores nuevos.
+    """
+    async with transaction() as tx:
+        return await tx.apply_user_delta(user_id, dinero, experiencia, vidas)
+
+async def apply_user_deltas(deltas):
+    """Versión por lotes: deltas = [(user_id, dinero, experiencia, vidas), ...].
+
+    Todo el lote va en una sola transacción (un solo commit).
+    """
+    async with transaction() as tx:
+        await tx.apply_user_deltas(deltas)
 
 async def get_lives(user_id):
     """Obtener vidas del usuario"""
@@ -334,75 +981,140 @@ async def get_lives(user_id):
 
 async def reset_user_progress(user_id):
     """Resetear el progreso de un usuario: dinero, experiencia, trabajo, inventario"""
-    async with aiosqlite.connect(DB) as db:
+    await write_behind.flush()
+    async with pool.write() as db:
         # Resetear dinero y experiencia
-        await db.execute("UPDATE users SET dinero = 0, experiencia = 0, trabajo = 'Desempleado' WHERE user_id = ?", (str(user_id),))
+        await db.execute("UPDATE users SET dinero = 0, experiencia = 0, trabajo = 'Desempleado' WHERE user_id = ?", (int(user_id),))
         # Eliminar todo el inventario
-        await db.execute("DELETE FROM inventory WHERE user_id = ?", (str(user_id),))
+        await db.execute("DELETE FROM inventory WHERE user_id = ?", (int(user_id),))
         # Resetear vidas a 3
-        await db.execute("UPDATE users SET vidas = 3 WHERE user_id = ?", (str(user_id),))
+        await db.execute("UPDATE users SET vidas = 3 WHERE user_id = ?", (int(user_id),))
         await db.commit()
+        user_cache.invalidate(user_id)
+        inventory_cache.invalidate(user_id)
+        leaderboards.set(int(user_id), (0, 0))
 
 # ---------- INVENTARIO ----------
 
+_INVENTORY_SQL = "SELECT id, item, rareza, usos, durabilidad, categoria, poder FROM inventory WHERE user_id = ?"
+
+def _inventory_from_rows(rows):
+    return InventoryItem.from_rows(rows)
+
+class InventoryView:
+    """Proyección de solo lectura del inventario de un usuario.
+
+    Indexa los items por nombre en minúscula y por categoría, así que
+    "¿tiene X?" y "¿cuántos X tiene?" son una búsqueda en un dict en vez de
+    recorrer la lista. Los InventoryItem son inmutables, así que se
+    comparten tal cual con la caché.
+    """
+
+    __slots__ = ("items", "_by_name", "_by_category", "_by_id")
+
+    def __init__(self, items):
+        self.items = items
+        self._by_name = {}
+        self._by_category = {}
+        self._by_id = {}
+        for item in items:
+            self._by_name.setdefault(item.item.lower(), []).append(item)
+            self._by_category.setdefault(item.categoria, []).append(item)
+            self._by_id[item.id] = item
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def has(self, name):
+        return name.lower() in self._by_name
+
+    def has_any(self, names):
+        return any(name.lower() in self._by_name for name in names)
+
+    def count(self, name):
+        return len(self._by_name.get(name.lower(), ()))
+
+    def counts(self):
+        """{nombre en minúscula: cantidad}"""
+        return {name: len(items) for name, items in self._by_name.items()}
+
+    def find(self, name):
+        """Todos los items con ese nombre (sin distinguir mayúsculas)"""
+        return list(self._by_name.get(name.lower(), ()))
+
+    def first(self, name):
+        items = self._by_name.get(name.lower())
+        return items[0] if items else None
+
+    def get(self, item_id):
+        return self._by_id.get(item_id)
+
+    def by_category(self, categoria):
+        return list(self._by_category.get(categoria, ()))
+
 async def add_item_to_user(user_id, item_name, rareza="comun", usos=1, durabilidad=100, categoria="desconocido", poder=0):
-    async with aiosqlite.connect(DB) as db:
-        await db.execute(
-            "INSERT INTO inventory(user_id, item, rareza, usos, durabilidad, categoria, poder) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (str(user_id), item_name, rareza, usos, durabilidad, categoria, poder)
-        )
-        await db.commit()
+    async with transaction() as tx:
+        return await tx.add_item_to_user(user_id, item_name, rareza, usos, durabilidad, categoria, poder)
+
+async def get_inventory_view(user_id) -> InventoryView:
+    """Inventario del usuario como InventoryView (cacheado)"""
+    uid = int(user_id)
+    conn = pool.current_writer()
+    if conn is not None:
+        # Dentro de una transacción: puede no estar confirmado, no cachear
+        cur = await conn.execute(_INVENTORY_SQL, (uid,))
+        return InventoryView(_inventory_from_rows(await cur.fetchall()))
+    found, view = inventory_cache.get(uid)
+    if not found:
+        epoch = inventory_cache.epoch
+        async with pool.read() as db:
+            cur = await db.execute(_INVENTORY_SQL, (uid,))
+            view = InventoryView(_inventory_from_rows(await cur.fetchall()))
+        inventory_cache.put(uid, view, epoch)
+    return view
 
 async def get_inventory(user_id):
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT id, item, rareza, usos, durabilidad, categoria, poder FROM inventory WHERE user_id = ?", (str(user_id),))
-        rows = await cur.fetchall()
-        return [{"id": r[0], "item": r[1], "rareza": r[2], "usos": r[3], "durabilidad": r[4], "categoria": r[5], "poder": r[6]} for r in rows]
+    view = await get_inventory_view(user_id)
+    return list(view.items)
 
 async def remove_item(item_id):
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
-        await db.commit()
+    async with transaction() as tx:
+        await tx.remove_item(item_id)
 
 async def damage_item(item_id, damage: int):
     """Reducir durabilidad de un item"""
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("UPDATE inventory SET durabilidad = MAX(0, durabilidad - ?) WHERE id = ?", (damage, item_id))
-        await db.commit()
+    async with transaction() as tx:
+        await tx.damage_item(item_id, damage)
 
 async def repair_item(item_id, amount: int = 100):
     """Restaurar durabilidad de un item"""
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("UPDATE inventory SET durabilidad = MIN(100, durabilidad + ?) WHERE id = ?", (amount, item_id))
-        await db.commit()
+    async with transaction() as tx:
+        await tx.repair_item(item_id, amount)
 
 async def use_item_once(item_id):
     """Usa un item una vez (reduce usos)"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT usos FROM inventory WHERE id = ?", (item_id,))
-        row = await cur.fetchone()
-        if row and row[0] > 1:
-            await db.execute("UPDATE inventory SET usos = usos - 1 WHERE id = ?", (item_id,))
-        else:
-            await db.execute("DELETE FROM inventory WHERE id = ?", (item_id,))
-        await db.commit()
+    async with transaction() as tx:
+        await tx.use_item_once(item_id)
 
 # ---------- TIENDA ----------
 
 async def get_shop():
-    async with aiosqlite.connect(DB) as db:
+    async with pool.read() as db:
         cur = await db.execute("SELECT name, price, type, effect, rarity FROM shop ORDER BY name")
         rows = await cur.fetchall()
         return [{"name": r[0], "price": r[1], "type": r[2], "effect": r[3], "rarity": r[4]} for r in rows]
 
 async def add_shop_item(name, price, item_type, effect, rarity):
-    async with aiosqlite.connect(DB) as db:
+    async with pool.write() as db:
         await db.execute("INSERT OR REPLACE INTO shop(name, price, type, effect, rarity) VALUES (?, ?, ?, ?, ?)", 
                         (name, price, item_type, effect, rarity))
         await db.commit()
 
 async def get_shop_item(name):
-    async with aiosqlite.connect(DB) as db:
+    async with pool.read() as db:
         cur = await db.execute("SELECT name, price, type, effect, rarity FROM shop WHERE LOWER(name) = LOWER(?)", (name,))
         row = await cur.fetchone()
         if row:
@@ -411,169 +1123,251 @@ async def get_shop_item(name):
 
 # ---------- COOLDOWNS ----------
 
-async def set_work_cooldown(user_id, job_name):
-    from datetime import timedelta
-    async with aiosqlite.connect(DB) as db:
-        cooldown_expiry = datetime.now() + timedelta(minutes=2)
-        await db.execute("INSERT OR REPLACE INTO work_cooldowns(user_id, job_name, last_work) VALUES (?, ?, ?)", 
-                        (str(user_id), job_name, cooldown_expiry.isoformat()))
+# Duración por acción, en segundos
+COOLDOWN_SECONDS = {
+    "work": 120,
+    "rob": 300,
+    "explore": 25,
+    "duel": 60,
+    "mining": 30,
+    "fishing": 40,
+    "fight": 120,
+}
+
+class CooldownStore:
+    """Cooldowns por (usuario, acción, ámbito) con expiración en segundos epoch.
+
+    Todo vive en un dict en memoria cargado una vez al arrancar; cada cambio
+    se escribe también en la tabla `cooldowns` (write-through) para que
+    sobreviva a un reinicio. El ámbito es "" salvo cuando la acción depende
+    de algo más (trabajo concreto, servidor del jefe...).
+
+    La comprobación y el registro en check_and_set no tienen ningún await en
+    medio, así que dos comandos simultáneos no pueden pasar los dos.
+    """
+
+    def __init__(self):
+        self._hot = {}  # (user_id, action, scope) -> expires_at
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    async def load(self):
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            async with pool.read() as db:
+                cur = await db.execute(
+                    "SELECT user_id, action, scope, expires_at FROM cooldowns WHERE expires_at > ?",
+                    (int(time.time()),)
+                )
+                for user_id, action, scope, expires_at in await cur.fetchall():
+                    self._hot[(user_id, action, scope)] = expires_at
+            self._loaded = True
+
+    def _expiry(self, key, now):
+        expires_at = self._hot.get(key)
+        if expires_at is None:
+            return None
+        if expires_at <= now:
+            del self._hot[key]
+            return None
+        return expires_at
+
+    async def get(self, user_id, action, scope=""):
+        """Epoch de expiración, o None si no hay cooldown activo"""
+        await self.load()
+        return self._expiry((int(user_id), action, str(scope)), time.time())
+
+    async def set(self, user_id, action, scope="", seconds=None):
+        await self.load()
+        key = (int(user_id), action, str(scope))
+        if seconds is None:
+            seconds = COOLDOWN_SECONDS[action]
+        expires_at = int(time.time() + seconds)
+        self._hot[key] = expires_at
+        await self._write([(*key, expires_at)])
+        return expires_at
+
+    async def check_and_set(self, entries):
+        """Comprobar y registrar varios cooldowns de una vez.
+
+        entries: [(user_id, action, scope, seconds|None), ...]. Si alguno
+        sigue activo no se registra ninguno y se devuelve
+        {(user_id, action, scope): segundos_restantes}; si no, se registran
+        todos en una sola escritura y se devuelve {}.
+        """
+        await self.load()
+        now = time.time()
+        keys = [(int(u), a, str(s), sec) for u, a, s, sec in entries]
+        active = {}
+        for user_id, action, scope, _ in keys:
+            key = (user_id, action, scope)
+            expires_at = self._expiry(key, now)
+            if expires_at is not None:
+                active[key] = int(expires_at - now) + 1
+        if active:
+            return active
+        rows = []
+        for user_id, action, scope, seconds in keys:
+            if seconds is None:
+                seconds = COOLDOWN_SECONDS[action]
+            expires_at = int(now + seconds)
+            self._hot[(user_id, action, scope)] = expires_at
+            rows.append((user_id, action, scope, expires_at))
+        await self._write(rows)
+        return {}
+
+    async def reset(self, user_id, action=None, scope=None):
+        """Borrar cooldowns de un usuario (todos, de una acción o de un ámbito)"""
+        await self.load()
+        uid = int(user_id)
+        for key in [k for k in self._hot if k[0] == uid
+                    and (action is None or k[1] == action)
+                    and (scope is None or k[2] == str(scope))]:
+            del self._hot[key]
+        sql = "DELETE FROM cooldowns WHERE user_id = ?"
+        params = [uid]
+        if action is not None:
+            sql += " AND action = ?"
+            params.append(action)
+        if scope is not None:
+            sql += " AND scope = ?"
+            params.append(str(scope))
+        async with _writer() as db:
+            await db.execute(sql, params)
+
+    def prune(self):
+        """Quitar del dict los cooldowns ya vencidos"""
+        now = time.time()
+        for key in [k for k, exp in self._hot.items() if exp <= now]:
+            del self._hot[key]
+
+    async def _write(self, rows):
+        async with _writer() as db:
+            await db.executemany(
+                "INSERT INTO cooldowns(user_id, action, scope, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id, action, scope) DO UPDATE SET expires_at = excluded.expires_at",
+                rows
+            )
+
+@asynccontextmanager
+async def _writer():
+    """Escritor con commit propio, o el de la transacción abierta por esta tarea"""
+    conn = pool.current_writer()
+    if conn is not None:
+        yield conn
+        return
+    async with pool.write() as db:
+        yield db
         await db.commit()
 
+cooldowns = CooldownStore()
+
+async def check_and_set_cooldown(user_id, action, scope="", seconds=None):
+    """0 si no había cooldown (y queda registrado); si no, segundos restantes"""
+    active = await cooldowns.check_and_set([(user_id, action, scope, seconds)])
+    return next(iter(active.values()), 0)
+
+async def check_and_set_cooldowns(entries):
+    return await cooldowns.check_and_set(entries)
+
+async def reset_cooldowns(user_id, action=None, scope=None):
+    await cooldowns.reset(user_id, action, scope)
+
+async def _get_cooldown_dt(user_id, action, scope=""):
+    expires_at = await cooldowns.get(user_id, action, scope)
+    return datetime.fromtimestamp(expires_at) if expires_at else None
+
+# Envoltorios con la firma de siempre: devuelven la expiración como datetime
+
+async def set_work_cooldown(user_id, job_name):
+    await cooldowns.set(user_id, "work", job_name)
+
 async def get_work_cooldown(user_id, job_name):
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT last_work FROM work_cooldowns WHERE user_id = ? AND job_name = ?", (str(user_id), job_name))
-        row = await cur.fetchone()
-        if row and row[0]:
-            return datetime.fromisoformat(row[0])
-        return None
+    return await _get_cooldown_dt(user_id, "work", job_name)
 
 async def has_work_cooldown(user_id, job_name, minutes=10):
-    last_work = await get_work_cooldown(user_id, job_name)
-    if not last_work:
-        return False
-    from datetime import timedelta
-    return datetime.now() - last_work < timedelta(minutes=minutes)
+    return await cooldowns.get(user_id, "work", job_name) is not None
 
 async def get_remaining_work_cooldown(user_id, job_name, minutes=10):
-    from datetime import timedelta
-    last_work = await get_work_cooldown(user_id, job_name)
-    if not last_work:
+    expires_at = await cooldowns.get(user_id, "work", job_name)
+    if not expires_at:
         return 0
-    elapsed = datetime.now() - last_work
-    remaining = timedelta(minutes=minutes) - elapsed
-    return max(0, int(remaining.total_seconds()))
+    return max(0, int(expires_at - time.time()))
 
 # ---------- ROB COOLDOWN (5 minutes) ----------
 
 async def set_rob_cooldown(user_id, target_id):
     """Set rob cooldown for a user (5 minutes)"""
-    from datetime import timedelta
-    async with aiosqlite.connect(DB) as db:
-        cooldown_expiry = datetime.now() + timedelta(minutes=5)
-        await db.execute(
-            "INSERT OR REPLACE INTO rob_cooldowns(user_id, target_id, last_rob) VALUES (?, ?, ?)",
-            (str(user_id), str(target_id), cooldown_expiry.isoformat())
-        )
-        await db.commit()
+    # El cooldown es por ladrón, sea cual sea la víctima
+    await cooldowns.set(user_id, "rob")
 
 async def get_rob_cooldown(user_id):
-    """Get the last rob time for a user"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT last_rob FROM rob_cooldowns WHERE user_id = ? ORDER BY last_rob DESC LIMIT 1", (str(user_id),))
-        row = await cur.fetchone()
-        if row and row[0]:
-            return datetime.fromisoformat(row[0])
-        return None
+    """Get the rob cooldown expiry for a user"""
+    return await _get_cooldown_dt(user_id, "rob")
 
 # ---------- EXPLORE COOLDOWN (25 seconds) ----------
 
 async def set_explore_cooldown(user_id):
     """Set explore cooldown for a user (25 seconds)"""
-    from datetime import timedelta
-    async with aiosqlite.connect(DB) as db:
-        cooldown_expiry = datetime.now() + timedelta(seconds=25)
-        await db.execute(
-            "INSERT OR REPLACE INTO explore_cooldowns(user_id, last_explore) VALUES (?, ?)",
-            (str(user_id), cooldown_expiry.isoformat())
-        )
-        await db.commit()
+    await cooldowns.set(user_id, "explore")
 
 async def get_explore_cooldown(user_id):
-    """Get the last explore time for a user"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT last_explore FROM explore_cooldowns WHERE user_id = ?", (str(user_id),))
-        row = await cur.fetchone()
-        if row and row[0]:
-            return datetime.fromisoformat(row[0])
-        return None
+    """Get the explore cooldown expiry for a user"""
+    return await _get_cooldown_dt(user_id, "explore")
 
 # ---------- DUEL COOLDOWN (1 minute) ----------
 
 async def set_duel_cooldown(user_id):
     """Set duel cooldown for a user (1 minute)"""
-    from datetime import timedelta
-    async with aiosqlite.connect(DB) as db:
-        cooldown_expiry = datetime.now() + timedelta(minutes=1)
-        await db.execute(
-            "INSERT OR REPLACE INTO duel_cooldowns(user_id, last_duel) VALUES (?, ?)",
-            (str(user_id), cooldown_expiry.isoformat())
-        )
-        await db.commit()
+    await cooldowns.set(user_id, "duel")
 
 async def get_duel_cooldown(user_id):
-    """Get the last duel time for a user"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT last_duel FROM duel_cooldowns WHERE user_id = ?", (str(user_id),))
-        row = await cur.fetchone()
-        if row and row[0]:
-            return datetime.fromisoformat(row[0])
-        return None
+    """Get the duel cooldown expiry for a user"""
+    return await _get_cooldown_dt(user_id, "duel")
 
 # ---------- MINING COOLDOWN (30 seconds) ----------
 
 async def set_mining_cooldown(user_id):
     """Set mining cooldown for a user (30 seconds)"""
-    from datetime import timedelta
-    async with aiosqlite.connect(DB) as db:
-        cooldown_expiry = datetime.now() + timedelta(seconds=30)
-        await db.execute(
-            "INSERT OR REPLACE INTO mining_cooldowns(user_id, last_mine) VALUES (?, ?)",
-            (str(user_id), cooldown_expiry.isoformat())
-        )
-        await db.commit()
+    await cooldowns.set(user_id, "mining")
 
 async def get_mining_cooldown(user_id):
-    """Get the last mining time for a user"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT last_mine FROM mining_cooldowns WHERE user_id = ?", (str(user_id),))
-        row = await cur.fetchone()
-        if row and row[0]:
-            return datetime.fromisoformat(row[0])
-        return None
+    """Get the mining cooldown expiry for a user"""
+    return await _get_cooldown_dt(user_id, "mining")
 
 # ---------- FISHING COOLDOWN (40 seconds) ----------
 
 async def set_fishing_cooldown(user_id):
     """Set fishing cooldown for a user (40 seconds)"""
-    from datetime import timedelta
-    async with aiosqlite.connect(DB) as db:
-        cooldown_expiry = datetime.now() + timedelta(seconds=40)
-        await db.execute(
-            "INSERT OR REPLACE INTO fishing_cooldowns(user_id, last_fish) VALUES (?, ?)",
-            (str(user_id), cooldown_expiry.isoformat())
-        )
-        await db.commit()
+    await cooldowns.set(user_id, "fishing")
 
 async def get_fishing_cooldown(user_id):
-    """Get the last fishing time for a user"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT last_fish FROM fishing_cooldowns WHERE user_id = ?", (str(user_id),))
-        row = await cur.fetchone()
-        if row and row[0]:
-            return datetime.fromisoformat(row[0])
-        return None
+    """Get the fishing cooldown expiry for a user"""
+    return await _get_cooldown_dt(user_id, "fishing")
 
 # ---------- BUFFS ACTIVOS ----------
 
 async def add_active_buff(user_id, buff_name, minutes=60):
-    from datetime import timedelta
-    async with aiosqlite.connect(DB) as db:
-        expira_en = (datetime.now() + timedelta(minutes=minutes)).isoformat()
+    async with pool.write() as db:
+        expira_en = int(time.time() + minutes * 60)
         await db.execute("INSERT INTO active_buffs(user_id, buff, expira_en) VALUES (?, ?, ?)", 
-                        (str(user_id), buff_name, expira_en))
+                        (int(user_id), buff_name, expira_en))
         await db.commit()
 
 async def get_active_buffs(user_id):
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT buff, expira_en FROM active_buffs WHERE user_id = ?", (str(user_id),))
+    async with pool.write() as db:
+        cur = await db.execute("SELECT buff, expira_en FROM active_buffs WHERE user_id = ?", (int(user_id),))
         rows = await cur.fetchall()
         result = {}
+        now = time.time()
         for buff, expira_en in rows:
-            exp_dt = datetime.fromisoformat(expira_en)
-            if exp_dt > datetime.now():
-                result[buff] = exp_dt
+            if expira_en > now:
+                result[buff] = datetime.fromtimestamp(expira_en)
             else:
-                await db.execute("DELETE FROM active_buffs WHERE user_id = ? AND buff = ?", (str(user_id), buff))
+                await db.execute("DELETE FROM active_buffs WHERE user_id = ? AND buff = ?", (int(user_id), buff))
         await db.commit()
         return result
 
@@ -582,75 +1376,180 @@ async def has_active_buff(user_id, buff_name):
     return buff_name in buffs
 
 async def clear_active_buff(user_id, buff_name):
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("DELETE FROM active_buffs WHERE user_id = ? AND buff = ?", (str(user_id), buff_name))
+    async with pool.write() as db:
+        await db.execute("DELETE FROM active_buffs WHERE user_id = ? AND buff = ?", (int(user_id), buff_name))
         await db.commit()
 
 # ---------- JEFE ACTUAL ----------
 
 async def get_active_boss(guild_id, boss_name):
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT boss_name, current_hp, max_hp, active FROM boss_tables WHERE guild_id = ? AND boss_name = ?", (str(guild_id), boss_name))
+    async with pool.read() as db:
+        cur = await db.execute("SELECT boss_name, current_hp, max_hp, active FROM boss_tables WHERE guild_id = ? AND boss_name = ?", (int(guild_id), boss_name))
         row = await cur.fetchone()
         if row:
             return {"boss_name": row[0], "current_hp": row[1], "max_hp": row[2], "active": row[3]}
         return None
 
+# Espejo en memoria de los bosses activos: guild_id -> {boss_name: (hp, max_hp)}.
+# Se carga y se actualiza siempre con el escritor tomado (tras el commit), así
+# que coincide con boss_tables y las peleas no consultan la base en cada turno.
+_active_bosses = {}
+
+async def _boss_mirror(db, gid):
+    """Bosses activos del servidor; `db` es el escritor"""
+    bosses = _active_bosses.get(gid)
+    if bosses is None:
+        cur = await db.execute("SELECT boss_name, current_hp, max_hp FROM boss_tables WHERE guild_id = ? AND active = 1", (gid,))
+        bosses = _active_bosses[gid] = {name: (hp, max_hp) for name, hp, max_hp in await cur.fetchall()}
+    return bosses
+
 async def create_boss(guild_id, boss_name, max_hp):
-    async with aiosqlite.connect(DB) as db:
+    gid = int(guild_id)
+    async with pool.write() as db:
         await db.execute("INSERT OR REPLACE INTO boss_tables(guild_id, boss_name, current_hp, max_hp, active) VALUES (?, ?, ?, ?, ?)", 
-                        (str(guild_id), boss_name, max_hp, max_hp, 1))
+                        (gid, boss_name, max_hp, max_hp, 1))
+        await db.execute("DELETE FROM boss_damage WHERE guild_id = ? AND boss_name = ?", (gid, boss_name))
         await db.commit()
+        (await _boss_mirror(db, gid))[boss_name] = (max_hp, max_hp)
 
 async def damage_boss(guild_id, boss_name, damage):
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("UPDATE boss_tables SET current_hp = MAX(0, current_hp - ?) WHERE guild_id = ? AND boss_name = ?", 
-                        (damage, str(guild_id), boss_name))
+    gid = int(guild_id)
+    async with pool.write() as db:
+        cur = await db.execute("UPDATE boss_tables SET current_hp = MAX(0, current_hp - ?) WHERE guild_id = ? AND boss_name = ? RETURNING current_hp, max_hp, active", 
+                        (damage, gid, boss_name))
+        row = await cur.fetchone()
         await db.commit()
+        if row and row[2]:
+            (await _boss_mirror(db, gid))[boss_name] = (row[0], row[1])
 
 async def deactivate_boss(guild_id, boss_name):
-    async with aiosqlite.connect(DB) as db:
+    gid = int(guild_id)
+    async with pool.write() as db:
         await db.execute("UPDATE boss_tables SET active = 0 WHERE guild_id = ? AND boss_name = ?", 
-                        (str(guild_id), boss_name))
+                        (gid, boss_name))
+        await db.execute("DELETE FROM boss_damage WHERE guild_id = ? AND boss_name = ?", (gid, boss_name))
         await db.commit()
+        (await _boss_mirror(db, gid)).pop(boss_name, None)
 
 async def get_all_active_bosses(guild_id):
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT boss_name, current_hp, max_hp FROM boss_tables WHERE guild_id = ? AND active = 1", (str(guild_id),))
-        rows = await cur.fetchall()
-        return [{"boss_name": r[0], "current_hp": r[1], "max_hp": r[2]} for r in rows]
+    gid = int(guild_id)
+    bosses = _active_bosses.get(gid)
+    if bosses is None:
+        async with pool.write() as db:
+            bosses = await _boss_mirror(db, gid)
+    return [{"boss_name": name, "current_hp": hp, "max_hp": max_hp} for name, (hp, max_hp) in bosses.items()]
+
+def peek_boss_hp(guild_id, boss_name):
+    """(hp, max_hp) del boss si sigue activo según el espejo, sin ir a la base"""
+    bosses = _active_bosses.get(int(guild_id))
+    return bosses.get(boss_name) if bosses else None
+
+# ---------- RAIDS ----------
+
+async def hit_boss(guild_id, boss_name, user_id, damage):
+    """Golpe de un jugador al boss compartido del servidor.
+
+    Resta `damage` de forma atómica (nunca por debajo de 0) y suma al jugador
+    el daño que de verdad entró. El golpe que deja al boss en 0 es el único
+    que lo mata: en la misma transacción se desactiva y se vacía el registro
+    de daño, que vuelve en `contributions` ({user_id: daño}) para repartir.
+    None si el boss ya no está vivo (lo mató otro o fue reemplazado).
+    """
+    gid, uid, damage = int(guild_id), int(user_id), int(damage)
+    async with pool.write() as db:
+        bosses = await _boss_mirror(db, gid)
+        if boss_name not in bosses or damage <= 0:
+            hp = bosses.get(boss_name)
+            return None if hp is None or hp[0] <= 0 else RaidHit(0, hp[0], hp[1], False, None)
+        cur = await db.execute(
+            "UPDATE boss_tables SET current_hp = MAX(0, current_hp - ?) "
+            "WHERE guild_id = ? AND boss_name = ? AND active = 1 AND current_hp > 0 "
+            "RETURNING current_hp, max_hp",
+            (damage, gid, boss_name)
+        )
+        row = await cur.fetchone()
+        if row is None:
+            await db.rollback()
+            bosses.pop(boss_name, None)
+            return None
+        hp, max_hp = row
+        # Con el escritor tomado el espejo tiene la vida de antes del golpe
+        applied = min(damage, bosses[boss_name][0])
+        await db.execute(
+            "INSERT INTO boss_damage(guild_id, boss_name, user_id, damage) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(guild_id, boss_name, user_id) DO UPDATE SET damage = damage + excluded.damage",
+            (gid, boss_name, uid, applied)
+        )
+        contributions = None
+        if hp == 0:
+            await db.execute("UPDATE boss_tables SET active = 0 WHERE guild_id = ? AND boss_name = ?", (gid, boss_name))
+            cur = await db.execute(
+                "DELETE FROM boss_damage WHERE guild_id = ? AND boss_name = ? RETURNING user_id, damage",
+                (gid, boss_name)
+            )
+            contributions = {u: d for u, d in await cur.fetchall() if d > 0}
+        await db.commit()
+        if hp == 0:
+            del bosses[boss_name]
+        else:
+            bosses[boss_name] = (hp, max_hp)
+        return RaidHit(applied, hp, max_hp, hp == 0, contributions)
+
+async def get_boss_damage(guild_id, boss_name):
+    """{user_id: daño} acumulado contra el boss activo, de mayor a menor"""
+    async with pool.read() as db:
+        cur = await db.execute(
+            "SELECT user_id, damage FROM boss_damage WHERE guild_id = ? AND boss_name = ? ORDER BY damage DESC",
+            (int(guild_id), boss_name)
+        )
+        return dict(await cur.fetchall())
 
 # ---------- EVENTOS POR GUILD ----------
 
 async def set_event_channel(guild_id, channel_id):
     """Save an event channel for a guild"""
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("INSERT OR IGNORE INTO event_channels(guild_id, channel_id) VALUES (?, ?)", (str(guild_id), str(channel_id)))
+    async with pool.write() as db:
+        await db.execute("INSERT OR IGNORE INTO event_channels(guild_id, channel_id) VALUES (?, ?)", (int(guild_id), int(channel_id)))
+        await db.commit()
+
+async def replace_event_channel(guild_id, channel_id):
+    """Dejar un único canal de eventos en el servidor (borra los anteriores)"""
+    async with pool.write() as db:
+        await db.execute("DELETE FROM event_channels WHERE guild_id = ?", (int(guild_id),))
+        await db.execute("INSERT INTO event_channels(guild_id, channel_id) VALUES (?, ?)", (int(guild_id), int(channel_id)))
         await db.commit()
 
 async def remove_event_channel(guild_id, channel_id):
     """Remove an event channel from a guild"""
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("DELETE FROM event_channels WHERE guild_id = ? AND channel_id = ?", (str(guild_id), str(channel_id)))
+    async with pool.write() as db:
+        await db.execute("DELETE FROM event_channels WHERE guild_id = ? AND channel_id = ?", (int(guild_id), int(channel_id)))
         await db.commit()
 
+async def remove_event_channels(pairs):
+    """Quitar varios canales de eventos: [(guild_id, channel_id)]"""
+    async with _writer() as db:
+        await db.executemany(
+            "DELETE FROM event_channels WHERE guild_id = ? AND channel_id = ?",
+            [(int(gid), int(cid)) for gid, cid in pairs]
+        )
+
 async def get_event_channels(guild_id):
     """Get all event channels for a guild"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT channel_id FROM event_channels WHERE guild_id = ?", (str(guild_id),))
+    async with pool.read() as db:
+        cur = await db.execute("SELECT channel_id FROM event_channels WHERE guild_id = ?", (int(guild_id),))
         rows = await cur.fetchall()
         return [int(row[0]) for row in rows]
 
 async def set_equipped_item(user_id, item_id, item_name):
     """Equip an item for a user"""
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("INSERT OR REPLACE INTO equipment(user_id, item_id, item_name) VALUES (?, ?, ?)", (str(user_id), item_id, item_name))
+    async with pool.write() as db:
+        await db.execute("INSERT OR REPLACE INTO equipment(user_id, item_id, item_name) VALUES (?, ?, ?)", (int(user_id), item_id, item_name))
         await db.commit()
 
 async def get_equipped_item(user_id):
     """Get the equipped item for a user"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT item_id, item_name FROM equipment WHERE user_id = ?", (str(user_id),))
+    async with pool.read() as db:
+        cur = await db.execute("SELECT item_id, item_name FROM equipment WHERE user_id = ?", (int(user_id),))
         row = await cur.fetchone()
         if row:
             return {"item_id": row[0], "item_name": row[1]}
@@ -658,171 +1557,450 @@ async def get_equipped_item(user_id):
 
 async def set_fight_cooldown(user_id, guild_id):
     """Set fight cooldown for a user in a guild (2 minutes)"""
-    from datetime import timedelta
-    async with aiosqlite.connect(DB) as db:
-        cooldown_expiry = datetime.now() + timedelta(minutes=2)
-        await db.execute("INSERT OR REPLACE INTO boss_cooldowns(user_id, guild_id, last_fight) VALUES (?, ?, ?)", (str(user_id), str(guild_id), cooldown_expiry.isoformat()))
-        await db.commit()
+    await cooldowns.set(user_id, "fight", guild_id)
 
 async def get_fight_cooldown(user_id, guild_id):
-    """Get the last fight time for a user in a guild"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT last_fight FROM boss_cooldowns WHERE user_id = ? AND guild_id = ?", (str(user_id), str(guild_id)))
-        row = await cur.fetchone()
-        if row and row[0]:
-            return datetime.fromisoformat(row[0])
-        return None
+    """Get the fight cooldown expiry for a user in a guild"""
+    return await _get_cooldown_dt(user_id, "fight", guild_id)
 
 async def set_boss_spawn_time(guild_id, boss_type):
     """Guardar el tiempo del último spawn de boss"""
-    async with aiosqlite.connect(DB) as db:
+    async with pool.write() as db:
         await db.execute(
             "INSERT OR REPLACE INTO boss_spawn_times(guild_id, boss_type, last_spawn) VALUES (?, ?, ?)",
-            (str(guild_id), boss_type, datetime.now().isoformat())
+            (int(guild_id), boss_type, int(time.time()))
         )
         await db.commit()
 
 async def get_boss_spawn_time(guild_id, boss_type):
     """Obtener el tiempo del último spawn de boss"""
-    async with aiosqlite.connect(DB) as db:
+    async with pool.read() as db:
         cur = await db.execute(
             "SELECT last_spawn FROM boss_spawn_times WHERE guild_id = ? AND boss_type = ?",
-            (str(guild_id), boss_type)
+            (int(guild_id), boss_type)
         )
         row = await cur.fetchone()
         if row and row[0]:
-            return datetime.fromisoformat(row[0])
+            return datetime.fromtimestamp(row[0])
         return None
 
+# Servidores por consulta IN (...) al buscar canales de eventos
+GUILDS_CHUNK = 500
+
+async def get_all_boss_spawn_times():
+    """{(guild_id, boss_type): último spawn en epoch} de todos los servidores"""
+    async with pool.read() as db:
+        cur = await db.execute("SELECT guild_id, boss_type, last_spawn FROM boss_spawn_times WHERE last_spawn IS NOT NULL")
+        return {(gid, boss_type): ts for gid, boss_type, ts in await cur.fetchall()}
+
+async def spawn_bosses(spawns):
+    """Spawnear varios bosses en una sola transacción.
+
+    spawns: [(guild_id, boss_type, boss_name, max_hp)]. En cada servidor se
+    desactiva el boss activo, se crea el nuevo con la vida llena y se guarda la
+    hora del spawn. Devuelve esa hora (epoch).
+    """
+    now = int(time.time())
+    if not spawns:
+        return now
+    rows = [(int(gid), boss_type, name, hp) for gid, boss_type, name, hp in spawns]
+    gids = [(gid,) for gid in {r[0] for r in rows}]
+    async with pool.write() as db:
+        await db.executemany("UPDATE boss_tables SET active = 0 WHERE guild_id = ? AND active = 1", gids)
+        await db.executemany("DELETE FROM boss_damage WHERE guild_id = ?", gids)
+        await db.executemany(
+            "INSERT OR REPLACE INTO boss_tables(guild_id, boss_name, current_hp, max_hp, active) VALUES (?, ?, ?, ?, 1)",
+            [(gid, name, hp, hp) for gid, _, name, hp in rows]
+        )
+        await db.executemany(
+            "INSERT OR REPLACE INTO boss_spawn_times(guild_id, boss_type, last_spawn) VALUES (?, ?, ?)",
+            [(gid, boss_type, now) for gid, boss_type, _, _ in rows]
+        )
+        await db.commit()
+        for gid, _, name, hp in rows:
+            _active_bosses[gid] = {name: (hp, hp)}
+    return now
+
+async def get_event_channels_for(guild_ids):
+    """{guild_id: [channel_id]} de varios servidores (solo los que tienen canales)"""
+    gids = list({int(gid) for gid in guild_ids})
+    result = {}
+    async with pool.read() as db:
+        for i in range(0, len(gids), GUILDS_CHUNK):
+            chunk = gids[i:i + GUILDS_CHUNK]
+            cur = await db.execute(
+                f"SELECT guild_id, channel_id FROM event_channels "
+                f"WHERE guild_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            for gid, cid in await cur.fetchall():
+                result.setdefault(gid, []).append(int(cid))
+    return result
+
 # ---------- LEADERBOARDS ----------
 
+LEADERBOARD_STATS = ("dinero", "experiencia")
+
+# Filas por transacción al registrar los miembros de un servidor entero
+GUILD_SYNC_BATCH = 1000
+
+# Rankings en memoria (ver ranking.py); init_db los carga de users y guild_members
+leaderboards = Leaderboards(LEADERBOARD_STATS)
+
+async def load_leaderboards():
+    """Reconstruir los rankings desde la base (con el escritor tomado: nada
+    se confirma entre la lectura y el primer cambio aplicado)"""
+    async with pool.write() as db:
+        cur = await db.execute(f"SELECT user_id, {', '.join(LEADERBOARD_STATS)} FROM users")
+        users = await cur.fetchall()
+        cur = await db.execute("SELECT guild_id, user_id FROM guild_members")
+        members = await cur.fetchall()
+        leaderboards.load(users, members)
+
+async def add_guild_member(guild_id, user_id):
+    """Registrar que el usuario juega en el servidor (se llama en cada comando)"""
+    gid, uid = int(guild_id), int(user_id)
+    if leaderboards.is_member(gid, uid):
+        return
+    async with _writer() as db:
+        await db.execute("INSERT OR IGNORE INTO guild_members(guild_id, user_id) VALUES (?, ?)", (gid, uid))
+        leaderboards.join(gid, uid)
+
+async def sync_guild_members(guild_id, user_ids):
+    """Registrar, de una lista de miembros, los que ya son jugadores"""
+    gid = int(guild_id)
+    uids = [int(uid) for uid in user_ids]
+    uids = [uid for uid in uids if leaderboards.has_user(uid) and not leaderboards.is_member(gid, uid)]
+    for i in range(0, len(uids), GUILD_SYNC_BATCH):
+        batch = uids[i:i + GUILD_SYNC_BATCH]
+        async with pool.write() as db:
+            await db.executemany(
+                "INSERT OR IGNORE INTO guild_members(guild_id, user_id) VALUES (?, ?)",
+                [(gid, uid) for uid in batch]
+            )
+            await db.commit()
+            for uid in batch:
+                leaderboards.join(gid, uid)
+        await asyncio.sleep(0)
+
+async def remove_guild_member(guild_id, user_id):
+    gid, uid = int(guild_id), int(user_id)
+    async with _writer() as db:
+        await db.execute("DELETE FROM guild_members WHERE guild_id = ? AND user_id = ?", (gid, uid))
+        leaderboards.leave(gid, uid)
+
+async def remove_guild(guild_id):
+    """El bot salió del servidor: olvidar a todos sus miembros"""
+    gid = int(guild_id)
+    async with _writer() as db:
+        await db.execute("DELETE FROM guild_members WHERE guild_id = ?", (gid,))
+        leaderboards.drop_guild(gid)
+
+def _check_stat(stat):
+    if stat not in LEADERBOARD_STATS:
+        raise ValueError(f"Estadística desconocida: {stat}")
+
 async def get_leaderboard(guild_id, stat="dinero", limit=10):
-    """Obtener top jugadores por stat"""
-    async with aiosqlite.connect(DB) as db:
-        query = f"SELECT user_id, {stat} FROM users ORDER BY {stat} DESC LIMIT ?"
-        cur = await db.execute(query, (limit,))
-        rows = await cur.fetchall()
-        return [{"user_id": r[0], stat: r[1]} for r in rows]
+    """Top de jugadores del servidor por stat (global si guild_id es None).
+
+    Sale de memoria: lo confirmado en la base, sin lo pendiente en write-behind.
+    """
+    _check_stat(stat)
+    if not leaderboards.loaded:
+        await load_leaderboards()
+    gid = None if guild_id is None else int(guild_id)
+    return [{"user_id": uid, stat: value} for uid, value in leaderboards.top(gid, stat, limit)]
+
+async def get_guild_rank(guild_id, user_id, stat="dinero"):
+    """(puesto, valor, total) del usuario en el servidor (global si guild_id
+    es None), o None si no figura. Empates por user_id, igual que el top.
+    """
+    _check_stat(stat)
+    if not leaderboards.loaded:
+        await load_leaderboards()
+    gid = None if guild_id is None else int(guild_id)
+    return leaderboards.rank(gid, int(user_id), stat)
 
 # ---------- MISIONES DIARIAS ----------
 
 async def init_daily_mission(user_id, mission_type="work", target=5, reward=500):
     """Crear misión diaria para usuario"""
-    async with aiosqlite.connect(DB) as db:
+    await write_behind.flush()
+    async with pool.write() as db:
         today = datetime.now().strftime("%Y-%m-%d")
         await db.execute(
             """INSERT OR REPLACE INTO daily_missions(user_id, fecha, tipo, objetivo, progreso, recompensa, completado)
                VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (str(user_id), today, mission_type, target, 0, reward, 0)
+            (int(user_id), today, mission_type, target, 0, reward, 0)
         )
         await db.commit()
 
 async def get_daily_mission(user_id):
     """Obtener misión diaria del usuario"""
-    async with aiosqlite.connect(DB) as db:
-        today = datetime.now().strftime("%Y-%m-%d")
+    today = datetime.now().strftime("%Y-%m-%d")
+    async def query(db):
         cur = await db.execute(
             "SELECT * FROM daily_missions WHERE user_id = ? AND fecha = ?",
-            (str(user_id), today)
+            (int(user_id), today)
         )
-        row = await cur.fetchone()
-        if row:
-            return {"user_id": row[0], "fecha": row[1], "tipo": row[2], "objetivo": row[3], 
-                    "progreso": row[4], "recompensa": row[5], "completado": row[6]}
-        return None
+        return await cur.fetchone()
+    row = await write_behind.read(("mission", int(user_id)), query)
+    if row:
+        return {"user_id": row[0], "fecha": row[1], "tipo": row[2], "objetivo": row[3], 
+                "progreso": row[4] + write_behind.pending_mission(user_id, today),
+                "recompensa": row[5], "completado": row[6]}
+    return None
 
 async def update_mission_progress(user_id, amount=1):
-    """Actualizar progreso de misión"""
-    async with aiosqlite.connect(DB) as db:
-        today = datetime.now().strftime("%Y-%m-%d")
-        await db.execute(
-            "UPDATE daily_missions SET progreso = progreso + ? WHERE user_id = ? AND fecha = ?",
-            (amount, str(user_id), today)
-        )
-        await db.commit()
+    """Actualizar progreso de misión (diferido, ver WriteBehindQueue)"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    write_behind.add_mission_progress(user_id, today, amount)
 
 async def complete_mission(user_id):
     """Marcar misión como completada"""
-    async with aiosqlite.connect(DB) as db:
+    async with pool.write() as db:
         today = datetime.now().strftime("%Y-%m-%d")
         await db.execute(
             "UPDATE daily_missions SET completado = 1 WHERE user_id = ? AND fecha = ?",
-            (str(user_id), today)
+            (int(user_id), today)
         )
         await db.commit()
 
 # ---------- TRADING ----------
 
 async def create_trade(sender_id, receiver_id, item_id, asking_item_id):
-    """Crear propuesta de trade"""
-    async with aiosqlite.connect(DB) as db:
-        await db.execute(
-            """INSERT INTO trades(remitente, receptor, item_remitente, item_receptor, estado)
-               VALUES (?, ?, ?, ?, 'pendiente')""",
-            (str(sender_id), str(receiver_id), item_id, asking_item_id)
-        )
-        await db.commit()
+    """Crear propuesta de trade; devuelve su id, o None si algún item no es
+    de quien debe"""
+    async with transaction() as tx:
+        return await tx.create_trade(sender_id, receiver_id, item_id, asking_item_id)
 
 async def get_pending_trades(user_id):
     """Obtener trades pendientes para usuario"""
-    async with aiosqlite.connect(DB) as db:
+    async with pool.read() as db:
         cur = await db.execute(
             "SELECT id, remitente, item_remitente, item_receptor FROM trades WHERE receptor = ? AND estado = 'pendiente'",
-            (str(user_id),)
+            (int(user_id),)
         )
         rows = await cur.fetchall()
-        return [{"id": r[0], "remitente": r[1], "item_remitente": r[2], "item_receptor": r[3]} for r in rows]
+        return Trade.from_rows(rows)
 
-async def accept_trade(trade_id):
-    """Aceptar trade"""
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("UPDATE trades SET estado = 'aceptado' WHERE id = ?", (trade_id,))
-        await db.commit()
+# Resultados de accept_trade
+TRADE_DONE = "aceptado"
+TRADE_GONE = "no_disponible"
+TRADE_STALE = "invalido"
+
+class TradeFailed(Exception):
+    """Liquidación abortada; lanzada dentro de la transacción para deshacerla"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+async def accept_trade(trade_id, receiver_id):
+    """Aceptar y liquidar un trade; devuelve (resultado, Trade o None) con
+    resultado una de las constantes TRADE_*.
+
+    Si algún item ya no es de quien lo ofreció, el trade queda anulado.
+    """
+    try:
+        async with transaction() as tx:
+            return await tx.accept_trade(trade_id, receiver_id)
+    except TradeFailed as e:
+        if e.reason == TRADE_STALE:
+            async with transaction() as tx:
+                await tx.execute(
+                    "UPDATE trades SET estado = 'invalido' WHERE id = ? AND estado = 'pendiente'", (trade_id,)
+                )
+        return e.reason, None
 
 # ---------- MERCADO ----------
 
+MARKET_PAGE_SIZE = 10
+
+# Resultados de buy_from_market
+MARKET_BOUGHT = "comprado"
+MARKET_GONE = "no_disponible"
+MARKET_OWN = "propio"
+MARKET_NO_MONEY = "sin_dinero"
+
+class PurchaseFailed(Exception):
+    """Compra abortada; lanzada dentro de la transacción para deshacerla"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+# orden -> (columna, sentido); el id desempata y completa el cursor
+MARKET_SORTS = {"precio": ("precio", "ASC"), "reciente": ("fecha_lista", "DESC")}
+
+_LISTING_SQL = "SELECT id, vendedor, item_id, precio, item, rareza, categoria, fecha_lista FROM market"
+
 async def list_item_for_sale(user_id, item_id, price):
-    """Poner item a la venta en el mercado"""
-    async with aiosqlite.connect(DB) as db:
-        await db.execute(
-            "INSERT INTO market(vendedor, item_id, precio) VALUES (?, ?, ?)",
-            (str(user_id), item_id, price)
-        )
-        await db.commit()
+    """Poner item a la venta; devuelve el id de la publicación o None"""
+    async with transaction() as tx:
+        return await tx.list_item_for_sale(user_id, item_id, price)
+
+async def search_market(item=None, rareza=None, categoria=None, sort="precio", after=None, limit=MARKET_PAGE_SIZE):
+    """Una página del mercado: (publicaciones, cursor de la siguiente o None).
+
+    Paginación por clave: `after` es el cursor que devolvió la página
+    anterior, (valor de orden, id), y cada página es un rango de índice
+    que empieza ahí; la página mil cuesta lo mismo que la primera.
+    """
+    if sort not in MARKET_SORTS:
+        raise ValueError(f"Orden desconocido: {sort}")
+    column, direction = MARKET_SORTS[sort]
+    where, params = [], []
+    if item:
+        where.append("item = ?")
+        params.append(item)
+    if rareza:
+        where.append("rareza = ?")
+        params.append(plain_text(rareza))
+    if categoria:
+        where.append("categoria = ?")
+        params.append(plain_text(categoria))
+    if after is not None:
+        where.append(f"({column}, id) {'>' if direction == 'ASC' else '<'} (?, ?)")
+        params.extend(after)
+    sql = _LISTING_SQL
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {column} {direction}, id {direction} LIMIT ?"
+    # Una fila de más dice si hay página siguiente sin contar nada
+    params.append(limit + 1)
+    async with pool.read() as db:
+        cur = await db.execute(sql, params)
+        rows = await cur.fetchall()
+    listings = Listing.from_rows(rows[:limit])
+    cursor = None
+    if len(rows) > limit:
+        last = listings[-1]
+        cursor = (getattr(last, column), last.id)
+    return listings, cursor
 
 async def get_market_listings(limit=25):
-    """Obtener items en venta"""
-    async with aiosqlite.connect(DB) as db:
+    """Publicaciones más recientes"""
+    listings, _ = await search_market(sort="reciente", limit=limit)
+    return listings
+
+async def get_listings_by_seller(user_id):
+    """Publicaciones del usuario (sus items en custodia)"""
+    async with pool.read() as db:
+        cur = await db.execute(_LISTING_SQL + " WHERE vendedor = ? ORDER BY id", (int(user_id),))
+        return Listing.from_rows(await cur.fetchall())
+
+async def get_market_item_names(prefix="", limit=25):
+    """Nombres distintos en venta que empiezan por `prefix` (autocompletar)"""
+    async with pool.read() as db:
+        # GROUP BY sobre idx_market_item_precio: recorre el índice ya ordenado
         cur = await db.execute(
-            "SELECT id, vendedor, item_id, precio FROM market LIMIT ?",
-            (limit,)
+            "SELECT item FROM market WHERE item LIKE ? GROUP BY item LIMIT ?",
+            (f"{prefix}%", limit)
         )
-        rows = await cur.fetchall()
-        return [{"id": r[0], "vendedor": r[1], "item_id": r[2], "precio": r[3]} for r in rows]
-
-async def buy_from_market(market_id):
-    """Comprar item del mercado"""
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("DELETE FROM market WHERE id = ?", (market_id,))
+        return [row[0] for row in await cur.fetchall()]
+
+async def get_market_categories():
+    async with pool.read() as db:
+        cur = await db.execute("SELECT categoria FROM market GROUP BY categoria")
+        return [row[0] for row in await cur.fetchall() if row[0]]
+
+async def cancel_listing(listing_id, user_id):
+    """Retirar una publicación propia; True si se retiró"""
+    async with transaction() as tx:
+        return await tx.cancel_listing(listing_id, user_id)
+
+async def buy_from_market(market_id, buyer_id):
+    """Comprar en una sola transacción: cobro, pago al vendedor, item y
+    publicación. Devuelve (resultado, Listing o None); resultado es una de
+    las constantes MARKET_*."""
+    try:
+        async with transaction() as tx:
+            return await tx.buy_from_market(market_id, buyer_id)
+    except PurchaseFailed as e:
+        return e.reason, None
+
+# ---------- HISTORIAL DE PRECIOS ----------
+
+# Días de cubos por hora (y de ventas en market_trades) que se conservan
+PRICE_HISTORY_DAYS = int(os.environ.get("DB_PRICE_HISTORY_DAYS", 30))
+
+async def get_price_stats(items):
+    """{item: PriceStats} con el último precio y la media y el volumen de
+    las últimas 24 h, leídos de los agregados (sin recorrer market_trades).
+
+    La ventana de 24 h tiene precisión de una hora: un cubo horario cuenta
+    entero si empieza dentro de la ventana.
+    """
+    items = list(dict.fromkeys(items))
+    if not items:
+        return {}
+    marks = ",".join("?" * len(items))
+    since = int(time.time()) - 24 * 3600
+    since -= since % 3600
+    async with pool.read() as db:
+        cur = await db.execute(f"SELECT item, ultimo, ultimo_en FROM market_prices WHERE item IN ({marks})", items)
+        last = {row[0]: row[1:] for row in await cur.fetchall()}
+        cur = await db.execute(
+            f"SELECT item, SUM(volumen), SUM(suma) FROM market_price_buckets "
+            f"WHERE item IN ({marks}) AND inicio >= ? GROUP BY item",
+            (*items, since)
+        )
+        window = {row[0]: row[1:] for row in await cur.fetchall()}
+    stats = {}
+    for item in last:
+        volumen, suma = window.get(item, (0, 0))
+        stats[item] = PriceStats(item, *last[item], suma // volumen if volumen else None, volumen)
+    return stats
+
+async def compact_price_history():
+    """Plegar los cubos por minuto de horas ya cerradas en cubos por hora y
+    borrar los cubos por hora más viejos que PRICE_HISTORY_DAYS.
+
+    Cada plegado es una transacción: un minuto cuenta o en su cubo o en el
+    de su hora, nunca en los dos. Devuelve (minutos plegados, horas borradas).
+    """
+    now = int(time.time())
+    hour_start = now - now % 3600
+    async with pool.write() as db:
+        await db.execute(
+            "INSERT INTO market_price_buckets(item, inicio, resolucion, volumen, suma, minimo, maximo) "
+            "SELECT item, inicio - inicio % 3600, 3600, SUM(volumen), SUM(suma), MIN(minimo), MAX(maximo) "
+            "FROM market_price_buckets WHERE resolucion = 60 AND inicio < ? "
+            "GROUP BY item, inicio - inicio % 3600 "
+            "ON CONFLICT(item, inicio, resolucion) DO UPDATE SET "
+            "volumen = volumen + excluded.volumen, suma = suma + excluded.suma, "
+            "minimo = MIN(minimo, excluded.minimo), maximo = MAX(maximo, excluded.maximo)",
+            (hour_start,)
+        )
+        cur = await db.execute(
+            "DELETE FROM market_price_buckets WHERE resolucion = 60 AND inicio < ?", (hour_start,)
+        )
+        folded = cur.rowcount
+        cur = await db.execute(
+            "DELETE FROM market_price_buckets WHERE resolucion = 3600 AND inicio < ?",
+            (now - PRICE_HISTORY_DAYS * 24 * 3600,)
+        )
+        dropped = cur.rowcount
         await db.commit()
+    return folded, dropped
 
 # ---------- PET XP ----------
 
 async def add_pet_xp(user_id, xp=10):
     """Agregar XP a mascota"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT xp FROM pet_xp WHERE user_id = ?", (str(user_id),))
+    async with pool.write() as db:
+        cur = await db.execute("SELECT xp FROM pet_xp WHERE user_id = ?", (int(user_id),))
         row = await cur.fetchone()
         if row:
-            await db.execute("UPDATE pet_xp SET xp = xp + ? WHERE user_id = ?", (xp, str(user_id)))
+            await db.execute("UPDATE pet_xp SET xp = xp + ? WHERE user_id = ?", (xp, int(user_id)))
         else:
-            await db.execute("INSERT INTO pet_xp(user_id, xp) VALUES (?, ?)", (str(user_id), xp))
+            await db.execute("INSERT INTO pet_xp(user_id, xp) VALUES (?, ?)", (int(user_id), xp))
         await db.commit()
 
 async def get_pet_level(user_id):
     """Obtener nivel de mascota (cada 100 XP = 1 nivel)"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT xp FROM pet_xp WHERE user_id = ?", (str(user_id),))
+    async with pool.read() as db:
+        cur = await db.execute("SELECT xp FROM pet_xp WHERE user_id = ?", (int(user_id),))
         row = await cur.fetchone()
         if row:
             return row[0] // 100
@@ -832,46 +2010,46 @@ async def get_pet_level(user_id):
 
 async def create_duel(challenger_id, opponent_id, amount):
     """Crear desafío de duelo"""
-    async with aiosqlite.connect(DB) as db:
+    async with pool.write() as db:
         await db.execute(
-            "INSERT INTO duels(retador, oponente, cantidad, estado) VALUES (?, ?, ?, 'pendiente')",
-            (str(challenger_id), str(opponent_id), amount)
+            "INSERT INTO duels(retador, oponente, cantidad, estado, creado_en) VALUES (?, ?, ?, 'pendiente', ?)",
+            (int(challenger_id), int(opponent_id), amount, int(time.time()))
         )
         await db.commit()
 
 async def accept_duel(duel_id):
     """Aceptar duelo"""
-    async with aiosqlite.connect(DB) as db:
+    async with pool.write() as db:
         await db.execute("UPDATE duels SET estado = 'aceptado' WHERE id = ?", (duel_id,))
         await db.commit()
 
 async def get_pending_duels(user_id):
     """Obtener duelos pendientes"""
-    async with aiosqlite.connect(DB) as db:
+    async with pool.read() as db:
         cur = await db.execute(
             "SELECT id, retador, cantidad FROM duels WHERE oponente = ? AND estado = 'pendiente'",
-            (str(user_id),)
+            (int(user_id),)
         )
         rows = await cur.fetchall()
-        return [{"id": r[0], "retador": r[1], "cantidad": r[2]} for r in rows]
+        return Duel.from_rows(rows)
 
 # ---------- UPGRADES ----------
 
 async def buy_upgrade(user_id, upgrade_name):
     """Comprar upgrade permanente"""
-    async with aiosqlite.connect(DB) as db:
+    async with pool.write() as db:
         await db.execute(
             "INSERT OR IGNORE INTO upgrades(user_id, nombre) VALUES (?, ?)",
-            (str(user_id), upgrade_name)
+            (int(user_id), upgrade_name)
         )
         await db.commit()
 
 async def has_upgrade(user_id, upgrade_name):
     """Verificar si usuario tiene upgrade"""
-    async with aiosqlite.connect(DB) as db:
+    async with pool.read() as db:
         cur = await db.execute(
             "SELECT 1 FROM upgrades WHERE user_id = ? AND nombre = ?",
-            (str(user_id), upgrade_name)
+            (int(user_id), upgrade_name)
         )
         return await cur.fetchone() is not None
 
@@ -880,11 +2058,11 @@ async def has_upgrade(user_id, upgrade_name):
 async def club_has_upgrade(user_id, upgrade_name):
     """Verificar si el club del usuario tiene un upgrade específico"""
     try:
-        async with aiosqlite.connect(DB) as db:
+        async with pool.read() as db:
             cur = await db.execute(
                 "SELECT 1 FROM club_upgrades cu JOIN club_members cm ON cu.club_id = cm.club_id "
                 "WHERE cm.user_id = ? AND cu.upgrade = ?",
-                (str(user_id), upgrade_name)
+                (int(user_id), upgrade_name)
             )
             return await cur.fetchone() is not None
     except:
@@ -893,10 +2071,10 @@ async def club_has_upgrade(user_id, upgrade_name):
 async def get_club_bonus(user_id):
     """Calcular bonificador de trabajo basado en dinero del club"""
     try:
-        async with aiosqlite.connect(DB) as db:
+        async with pool.read() as db:
             cur = await db.execute(
                 "SELECT c.dinero FROM clubs c JOIN club_members cm ON c.id = cm.club_id WHERE cm.user_id = ?",
-                (str(user_id),)
+                (int(user_id),)
             )
             row = await cur.fetchone()
             if row and row[0]:
@@ -917,47 +2095,53 @@ async def get_club_bonus(user_id):
 
 async def get_pet(user_id):
     """Obtener mascota activa del usuario"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT id, nombre, xp, rareza FROM mascotas WHERE user_id = ? AND activa = 1 LIMIT 1", (str(user_id),))
-        row = await cur.fetchone()
-        if row:
-            return {"id": row[0], "nombre": row[1], "xp": row[2], "rareza": row[3]}
-        return None
+    async def query(db):
+        cur = await db.execute("SELECT id, nombre, xp, rareza, activa FROM mascotas WHERE user_id = ? AND activa = 1 LIMIT 1", (int(user_id),))
+        return await cur.fetchone()
+    row = await write_behind.read(("pet", int(user_id)), query)
+    if row:
+        pet = Pet.from_row(row)
+        pending = write_behind.pending_pet_xp(user_id)
+        return pet._replace(xp=pet.xp + pending) if pending else pet
+    return None
 
 async def get_all_pets(user_id):
     """Obtener todas las mascotas del usuario"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT id, nombre, xp, rareza, activa FROM mascotas WHERE user_id = ? ORDER BY activa DESC, id ASC", (str(user_id),))
-        rows = await cur.fetchall()
-        return [{"id": r[0], "nombre": r[1], "xp": r[2], "rareza": r[3], "activa": r[4]} for r in rows]
+    async def query(db):
+        cur = await db.execute("SELECT id, nombre, xp, rareza, activa FROM mascotas WHERE user_id = ? ORDER BY activa DESC, id ASC", (int(user_id),))
+        return await cur.fetchall()
+    rows = await write_behind.read(("pet", int(user_id)), query)
+    pets = Pet.from_rows(rows)
+    pending = write_behind.pending_pet_xp(user_id)
+    if pending:
+        pets = [p._replace(xp=p.xp + pending) if p.activa else p for p in pets]
+    return pets
 
 async def create_pet(user_id, nombre, rareza="común"):
     """Crear nueva mascota (deactivar otras)"""
-    async with aiosqlite.connect(DB) as db:
+    # La XP pendiente es de la mascota activa actual
+    await write_behind.flush()
+    async with pool.write() as db:
         # Deactivar mascotas previas
-        await db.execute("UPDATE mascotas SET activa = 0 WHERE user_id = ?", (str(user_id),))
+        await db.execute("UPDATE mascotas SET activa = 0 WHERE user_id = ?", (int(user_id),))
         # Crear nueva mascota activa
         await db.execute(
             "INSERT INTO mascotas(user_id, nombre, xp, rareza, activa) VALUES (?, ?, ?, ?, ?)",
-            (str(user_id), nombre, 0, rareza, 1)
+            (int(user_id), nombre, 0, rareza, 1)
         )
         await db.commit()
 
 async def set_active_pet(user_id, pet_id):
     """Cambiar mascota activa"""
-    async with aiosqlite.connect(DB) as db:
-        await db.execute("UPDATE mascotas SET activa = 0 WHERE user_id = ?", (str(user_id),))
-        await db.execute("UPDATE mascotas SET activa = 1 WHERE id = ? AND user_id = ?", (pet_id, str(user_id)))
+    await write_behind.flush()
+    async with pool.write() as db:
+        await db.execute("UPDATE mascotas SET activa = 0 WHERE user_id = ?", (int(user_id),))
+        await db.execute("UPDATE mascotas SET activa = 1 WHERE id = ? AND user_id = ?", (pet_id, int(user_id)))
         await db.commit()
 
 async def add_pet_xp(user_id, xp=10):
-    """Agregar XP a mascota activa"""
-    async with aiosqlite.connect(DB) as db:
-        cur = await db.execute("SELECT id FROM mascotas WHERE user_id = ? AND activa = 1 LIMIT 1", (str(user_id),))
-        row = await cur.fetchone()
-        if row:
-            await db.execute("UPDATE mascotas SET xp = xp + ? WHERE id = ?", (xp, row[0]))
-        await db.commit()
+    """Agregar XP a mascota activa (diferido, ver WriteBehindQueue)"""
+    write_behind.add_pet_xp(user_id, xp)
 
 async def get_pet_level(user_id):
     """Obtener nivel de mascota activa"""
@@ -998,13 +2182,19 @@ async def get_pet_bonus_multiplier(user_id):
 
 # ---------- HERRAMIENTAS ----------
 
+# Nombres (en minúscula) de cada familia de herramienta
+TOOL_NAMES = {
+    "mining": ("pico normal", "pico mejorado", "pico épico"),
+    "fishing": ("caña normal", "caña mejorada", "caña épica"),
+}
+
 async def initialize_user_tools(user_id):
     """Inicializar al usuario con pico normal y caña normal"""
-    inv = await get_inventory(user_id)
+    inv = await get_inventory_view(user_id)
     
     # Verificar si ya tiene herramientas
-    has_pick = any(item["item"].lower() in ["pico normal", "pico mejorado", "pico épico"] for item in inv)
-    has_rod = any(item["item"].lower() in ["caña normal", "caña mejorada", "caña épica"] for item in inv)
+    has_pick = inv.has_any(TOOL_NAMES["mining"])
+    has_rod = inv.has_any(TOOL_NAMES["fishing"])
     
     if not has_pick:
         await add_item_to_user(user_id, "Pico Normal", rareza="comun", usos=1, durabilidad=100, categoria="pico_normal", poder=5)
@@ -1014,16 +2204,118 @@ async def initialize_user_tools(user_id):
 
 async def replace_tool(user_id, new_tool_type: str):
     """Reemplazar herramienta antigua con nueva (pico o caña)"""
-    inv = await get_inventory(user_id)
-    
-    if new_tool_type == "mining":
-        # Eliminar cualquier pico anterior (normal, mejorado, épico)
-        old_picks = [item for item in inv if item["item"].lower() in ["pico normal", "pico mejorado", "pico épico"]]
-        for pick in old_picks:
-            await remove_item(pick["id"])
-    
-    elif new_tool_type == "fishing":
-        # Eliminar cualquier caña anterior (normal, mejorada, épica)
-        old_rods = [item for item in inv if item["item"].lower() in ["caña normal", "caña mejorada", "caña épica"]]
-        for rod in old_rods:
-            await remove_item(rod["id"])
+    async with transaction() as tx:
+        await tx.replace_tool(user_id, new_tool_type)
+
+# ---------- NOMBRES VISIBLES ----------
+
+# Ids por consulta IN (...): lejos del límite de parámetros de SQLite
+NAMES_CHUNK = 500
+
+async def get_display_names(user_ids):
+    """{user_id: (nombre, actualizado_en)} de los que estén guardados, frescos o no"""
+    uids = list({int(uid) for uid in user_ids})
+    result = {}
+    async with pool.read() as db:
+        for i in range(0, len(uids), NAMES_CHUNK):
+            chunk = uids[i:i + NAMES_CHUNK]
+            cur = await db.execute(
+                f"SELECT user_id, nombre, actualizado_en FROM display_names "
+                f"WHERE user_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            for uid, nombre, ts in await cur.fetchall():
+                result[uid] = (nombre, ts)
+    return result
+
+async def save_display_names(names):
+    """Guardar {user_id: nombre} con la hora actual"""
+    if not names:
+        return
+    now = int(time.time())
+    async with _writer() as db:
+        await db.executemany(
+            "INSERT INTO display_names(user_id, nombre, actualizado_en) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET nombre = excluded.nombre, actualizado_en = excluded.actualizado_en",
+            [(int(uid), nombre, now) for uid, nombre in names.items()]
+        )
+
+# ---------- MANTENIMIENTO ----------
+
+# Filas borradas por transacción: cada lote toma el escritor muy poco tiempo
+JANITOR_BATCH = int(os.environ.get("DB_JANITOR_BATCH", 500))
+# Trades/duelos pendientes más viejos que esto se descartan
+PENDING_TTL_SECONDS = int(os.environ.get("DB_PENDING_TTL_SECONDS", 24 * 3600))
+# Días de misiones diarias que se conservan
+MISSION_KEEP_DAYS = int(os.environ.get("DB_MISSION_KEEP_DAYS", 7))
+# Nombres visibles sin refrescar en este tiempo se olvidan
+NAME_KEEP_SECONDS = int(os.environ.get("DB_NAME_KEEP_SECONDS", 30 * 24 * 3600))
+# Páginas libres devueltas al sistema por pasada
+VACUUM_PAGES = int(os.environ.get("DB_VACUUM_PAGES", 1000))
+
+async def _purge_batches(table, where, params, batch):
+    """Borrar en lotes de `batch` filas, soltando el escritor entre lotes"""
+    total = 0
+    while True:
+        async with pool.write() as db:
+            cur = await db.execute(
+                f"DELETE FROM {table} WHERE rowid IN "
+                f"(SELECT rowid FROM {table} WHERE {where} LIMIT ?)",
+                (*params, batch)
+            )
+            await db.commit()
+            deleted = cur.rowcount
+        total += deleted
+        if deleted < batch:
+            return total
+        await asyncio.sleep(0)
+
+async def purge_expired(batch: int = None):
+    """Borrar filas caducadas; devuelve {tabla: filas borradas}"""
+    from datetime import timedelta
+    batch = batch or JANITOR_BATCH
+    now = time.time()
+    cutoff_day = (datetime.now() - timedelta(days=MISSION_KEEP_DAYS)).strftime("%Y-%m-%d")
+    jobs = {
+        "cooldowns": ("expires_at <= ?", (int(now),)),
+        "active_buffs": ("expira_en <= ?", (int(now),)),
+        "trades": ("estado IN ('pendiente', 'invalido') AND creado_en <= ?", (int(now - PENDING_TTL_SECONDS),)),
+        "duels": ("estado = 'pendiente' AND creado_en <= ?", (int(now - PENDING_TTL_SECONDS),)),
+        "daily_missions": ("fecha < ?", (cutoff_day,)),
+        "display_names": ("actualizado_en <= ?", (int(now - NAME_KEEP_SECONDS),)),
+        "market_trades": ("fecha <= ?", (int(now - PRICE_HISTORY_DAYS * 24 * 3600),)),
+    }
+    result = {}
+    for table, (where, params) in jobs.items():
+        try:
+            result[table] = await _purge_batches(table, where, params, batch)
+        except aiosqlite.OperationalError as e:
+            # p.ej. una tabla antigua con otras columnas
+            print(f"Janitor: no se pudo limpiar {table}: {e}")
+            result[table] = 0
+    cooldowns.prune()
+    return result
+
+async def vacuum_step(pages: int = None):
+    """Devolver hasta `pages` páginas libres al sistema y refrescar estadísticas.
+
+    Solo con auto_vacuum=INCREMENTAL (init_db convierte la base al arrancar);
+    en otro modo no hace nada: un VACUUM completo aquí bloquearía al escritor.
+    Devuelve las páginas liberadas.
+    """
+    pages = pages or VACUUM_PAGES
+    async with pool.write() as db:
+        cur = await db.execute("PRAGMA auto_vacuum")
+        if (await cur.fetchone())[0] != AUTO_VACUUM_INCREMENTAL:
+            return 0
+        cur = await db.execute("PRAGMA freelist_count")
+        before = (await cur.fetchone())[0]
+        # Libera una página por paso y el módulo sqlite3 solo da el primero
+        # (el pragma no declara columnas); executescript lo corre hasta el final
+        await db.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        cur = await db.execute("PRAGMA freelist_count")
+        after = (await cur.fetchone())[0]
+        # Solo analiza las tablas que lo necesitan
+        await db.execute("PRAGMA optimize")
+        await db.commit()
+    return before - after
@@ -0,0 +1,203 @@
+"""
+Efectos de items en un solo registro, compartido por los cogs.
+- Cada entrada dice qué hace el item en una pelea de jefe (bosses), al usarlo
+  con /use (items), cuánto poder da al robar (rob) y si multiplica los
+  premios de las apuestas (gambling, blackjack)
+- Se busca por nombre normalizado (minúsculas, sin tildes); lo que el nombre
+  no defina sale de su categoría y, si no, del efecto por defecto
+- Nombres con variantes ("Huevo Mascota Raro", "Palo golpeador de ...") se
+  resuelven por palabra clave la primera vez y quedan memorizados
+- Un item nuevo es una línea de datos, no otra rama de if/elif
+"""
+from migrations import plain_text
+
+class CombatEffect:
+    """Efecto en combate: daño (fijo o (mín, máx)), curación, buff de +50%
+    al próximo ataque, escudo. `charge` hace que el primer uso solo cargue
+    y el segundo seguido dispare (Fragmento Omega)."""
+
+    __slots__ = ("text", "damage", "heal", "buff", "shield", "charge")
+
+    def __init__(self, text, damage=0, heal=0, buff=False, shield=False, charge=None):
+        self.text = text
+        self.damage = damage
+        self.heal = heal
+        self.buff = buff
+        self.shield = shield
+        self.charge = charge
+
+    def apply(self, engine) -> int:
+        """Aplicar sobre un FightEngine; devuelve el daño al jefe"""
+        if self.charge:
+            if not engine.charging:
+                engine.charging = True
+                engine.log.append(self.charge)
+                return 0
+            engine.charging = False
+        damage = self.damage
+        if type(damage) is tuple:
+            damage = engine.rng.randint(*damage)
+        if self.heal:
+            engine.heal(self.heal)
+        if self.buff:
+            engine.damage_buff = True
+        if self.shield:
+            engine.defend_next = True
+        engine.log.append(self.text.format(dmg=damage))
+        return damage
+
+class UseEffect:
+    """Efecto de /use: mensaje, vidas que devuelve, o eclosión de huevo"""
+
+    __slots__ = ("text", "lives", "hatch")
+
+    def __init__(self, text=None, lives=0, hatch=False):
+        self.text = text
+        self.lives = lives
+        self.hatch = hatch
+
+class ItemEffect:
+    """Lo que hace un item en cada contexto; None = lo decide la categoría
+    o el efecto por defecto. payout multiplica las ganancias de las apuestas
+    y bonus el premio extra del blackjack natural."""
+
+    __slots__ = ("combat", "use", "poder", "payout", "bonus")
+
+    def __init__(self, combat=None, use=None, poder=None, payout=None, bonus=None):
+        self.combat = combat
+        self.use = use
+        self.poder = poder
+        self.payout = payout
+        self.bonus = bonus
+
+_CRITICAL = CombatEffect("🔫 ¡Ataque crítico! -50 HP al jefe!", damage=50)
+_EFFECTIVE = CombatEffect("💀 ¡Ataque efectivo! -35 HP al jefe!", damage=35)
+_BLUNT = CombatEffect("⚒️ ¡Golpe contundente! -40 HP al jefe!", damage=40)
+_BUFF = CombatEffect("⚡ ¡Tu próximo ataque inflige +50% de daño!", buff=True)
+_SUPPORT = UseEffect("🐕 **Animal de Apoyo activado** — Tu compañero emocional te acompaña")
+
+# Por nombre (o parte del nombre). El orden cuenta: si un nombre contiene
+# varias claves gana la primera.
+ITEM_EFFECTS = {
+    "huevo": ItemEffect(use=UseEffect(hatch=True)),
+    "núcleo energético": ItemEffect(
+        combat=CombatEffect("⚡ ¡Núcleo Energético explotó! -80 HP al jefe!", damage=80), poder=45),
+    "fragmento omega": ItemEffect(
+        combat=CombatEffect(
+            "⚡⚡ ¡¡SUPER ATAQUE FRAGMENTO OMEGA!! -120 HP CRÍTICO al jefe!", damage=120,
+            charge="✨ ¡PREPARANDO FRAGMENTO OMEGA! Usa de nuevo el próximo turno para SUPER ATAQUE (120 dmg)!"),
+        poder=50),
+    "pistola vieja": ItemEffect(combat=_CRITICAL, poder=35),
+    "máscara de xfi": ItemEffect(combat=_CRITICAL, poder=35),
+    "llave maestra": ItemEffect(
+        combat=CombatEffect("🔑 ¡Magia de la llave! +40 HP y -30 HP jefe!", damage=30, heal=40), poder=40),
+    "aconsejante fantasma": ItemEffect(
+        combat=CombatEffect("👻 ¡El fantasma te fortalece! +50% daño próximo!", buff=True), poder=30),
+    "chihuahua": ItemEffect(
+        combat=CombatEffect("🐕 ¡El chihuahua ataca! -{dmg} HP al jefe!", damage=(15, 35)),
+        use=_SUPPORT, poder=5),
+    "animal de apoyo": ItemEffect(use=_SUPPORT),
+    "traje ritual": ItemEffect(
+        combat=CombatEffect("🎭 ¡Ritual mágico! +60 HP y defensa!", heal=60, shield=True), poder=35),
+    "botella de sedante": ItemEffect(
+        combat=_EFFECTIVE, use=UseEffect("💤 **Sedante Mental usado** — Sientes calma profunda..."), poder=6),
+    "cuchillo oxidado": ItemEffect(combat=_EFFECTIVE, poder=18),
+    "palo golpeador": ItemEffect(combat=_BLUNT, poder=30),
+    "arma blanca artesanal": ItemEffect(combat=_BLUNT, poder=25),
+    "mecha enojado": ItemEffect(
+        combat=CombatEffect("🤖 ¡Mecha Enojado te ayuda! -70 HP al jefe!", damage=70), poder=40),
+    "papitas": ItemEffect(
+        combat=CombatEffect("🍟 ¡Papitas consumidas! +20 HP (¡qué delicia!)", heal=20),
+        use=UseEffect("🍟 **Papitas consumidas** — ¡Curas 20 HP mental! Tu ánimo sube.")),
+    "poción de furia": ItemEffect(
+        combat=CombatEffect("🧪 ¡Poción de Furia lanzada! -60 HP al jefe!", damage=60), poder=18),
+    "nektar antiguo": ItemEffect(
+        combat=CombatEffect("🍹 ¡Nektar Antiguo! +100 HP (recuperación completa)!", heal=100), poder=8),
+    "danza de saviteto": ItemEffect(combat=_BUFF, poder=20, bonus=1.15),
+    "bebida de la vida": ItemEffect(
+        use=UseEffect("💊 **Bebida de Vida Eterna administrada** — ¡Has recuperado una vida psicológica! 💚", lives=1)),
+    "kit de reparación": ItemEffect(
+        use=UseEffect("🔧 **Kit de Reparación Emocional usado** — Instrumentos terapéuticos restaurados"),
+        poder=0),  # No es arma de combate
+    "teléfono": ItemEffect(
+        use=UseEffect("📞 **Teléfono de Emergencia activado** — Contactaste con el sanatorio"), poder=12),
+    "linterna": ItemEffect(
+        use=UseEffect("🔦 **Linterna Mental encendida** — ¡Tus traumas se iluminan!"), poder=7),
+    "cerillas": ItemEffect(
+        use=UseEffect("🔥 **Catarsis encendida** — ¡Libera tu fuego interno! 🔥"), poder=5),
+    "x2 de dinero de mecha": ItemEffect(poder=12, payout=2),
+    # Solo poder para robar
+    "cinta adhesiva": ItemEffect(poder=3),
+    "botiquín": ItemEffect(poder=2),
+    "savi peluche": ItemEffect(poder=10),
+    "hélice de ventilador": ItemEffect(poder=8),
+    "id falso": ItemEffect(poder=22),
+    "bastón de staff": ItemEffect(poder=28),
+    "paquete de peluches fino": ItemEffect(poder=15),
+    "escudo mágico": ItemEffect(poder=10),
+    "anillo oxidado": ItemEffect(poder=4),
+    "mapa antiguo": ItemEffect(poder=6),
+    "gafas de soldador": ItemEffect(poder=8),
+    "receta secreta": ItemEffect(poder=16),
+    "placa de identificación": ItemEffect(poder=7),
+    "cable usb": ItemEffect(poder=9),
+    "garrafa de aceite": ItemEffect(poder=10),
+    "guitarra rota": ItemEffect(poder=20),  # Raro, más poder que comunes
+}
+
+# Por categoría, para lo que el nombre no define
+CATEGORY_EFFECTS = {
+    "consumible": ItemEffect(combat=CombatEffect("📦 ¡Recuperaste 50 HP!", heal=50)),
+    "consumible_damage": ItemEffect(combat=CombatEffect("💥 ¡Infligiste 40 de daño directo!", damage=40)),
+    "consumible_buff": ItemEffect(combat=_BUFF),
+    "consumible_shield": ItemEffect(combat=CombatEffect("🛡️ ¡Te protegerás del próximo ataque!", shield=True)),
+    "arma": ItemEffect(combat=CombatEffect("⚔️ ¡Arma equipada! -35 HP al jefe!", damage=35)),
+    "herramientas": ItemEffect(combat=CombatEffect("🔧 ¡Herramienta usada! +20 HP!", heal=20)),
+    "salud": ItemEffect(combat=CombatEffect("⚕️ ¡Recuperaste 40 HP!", heal=40)),
+    "mascota": ItemEffect(combat=CombatEffect("🐾 ¡Tu mascota ataca! -{dmg} HP al jefe!", damage=(10, 25))),
+    "engano": ItemEffect(combat=CombatEffect("🎭 ¡Engaño! +50% daño próximo!", buff=True)),
+    "quimicos": ItemEffect(combat=CombatEffect("🧪 ¡Químico! -30 HP al jefe!", damage=30)),
+    "tecnologia": ItemEffect(combat=CombatEffect("⚙️ ¡Tecnología! -25 HP al jefe!", damage=25)),
+}
+
+DEFAULT_EFFECT = ItemEffect(
+    combat=CombatEffect("📦 ¡Usaste item! +25 HP!", heal=25),
+    use=UseEffect("✅ **{item} usado** — Efecto especial aplicado"),
+    poder=10,
+    payout=1,
+    bonus=1,
+)
+
+_by_name = {plain_text(name): effect for name, effect in ITEM_EFFECTS.items()}
+# (nombre, categoría) -> ItemEffect ya combinado: una búsqueda por uso
+_resolved = {}
+# Items de apuestas: el inventario se consulta solo por estos nombres
+_PAYOUT_ITEMS = [(name, e.payout) for name, e in ITEM_EFFECTS.items() if e.payout]
+_BONUS_ITEMS = [(name, e.bonus) for name, e in ITEM_EFFECTS.items() if e.bonus]
+
+def _resolve(name, categoria):
+    plain = plain_text(name) or ""
+    own = _by_name.get(plain)
+    if own is None:
+        own = next((e for key, e in _by_name.items() if key in plain), None)
+    layers = [e for e in (own, CATEGORY_EFFECTS.get(categoria), DEFAULT_EFFECT) if e is not None]
+    return ItemEffect(**{
+        field: next((getattr(e, field) for e in layers if getattr(e, field) is not None), None)
+        for field in ItemEffect.__slots__
+    })
+
+def item_effect(name, categoria=None) -> ItemEffect:
+    """Efecto completo de un item (nombre, luego categoría, luego defecto)"""
+    key = (name, categoria)
+    effect = _resolved.get(key)
+    if effect is None:
+        effect = _resolved[key] = _resolve(name, categoria)
+    return effect
+
+def payout_multiplier(inv) -> float:
+    """Multiplicador de ganancias por los items de un InventoryView"""
+    return max((mult for name, mult in _PAYOUT_ITEMS if inv.has(name)), default=1)
+
+def bonus_multiplier(inv) -> float:
+    """Multiplicador del premio extra del blackjack natural"""
+    return max((mult for name, mult in _BONUS_ITEMS if inv.has(name)), default=1)
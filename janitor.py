@@ -0,0 +1,31 @@
+"""
+Mantenimiento periódico de la base de datos.
+- Borra cooldowns, buffs, trades/duelos pendientes, misiones y nombres caducados en lotes pequeños
+- Pliega los precios del mercado por minuto en cubos por hora
+- Devuelve páginas libres (incremental_vacuum) y refresca estadísticas (PRAGMA optimize)
+"""
+import asyncio
+import os
+from db import purge_expired, vacuum_step, compact_price_history
+
+# Cada cuántos segundos se pasa el janitor
+JANITOR_INTERVAL = int(os.environ.get("DB_JANITOR_SECONDS", 600))
+
+async def run_janitor(bot):
+    """Tarea que limpia la base cada JANITOR_INTERVAL segundos"""
+    await bot.wait_until_ready()
+
+    while not bot.is_closed():
+        try:
+            deleted = await purge_expired()
+            folded, _ = await compact_price_history()
+            pages = await vacuum_step()
+            total = sum(deleted.values())
+            if total or pages or folded:
+                detail = ", ".join(f"{t}={n}" for t, n in deleted.items() if n)
+                print(f"🧹 Janitor: {total} filas borradas ({detail or 'ninguna'}), "
+                      f"{folded} cubos de precio plegados, {pages} páginas liberadas")
+        except Exception as e:
+            print(f"Error en janitor: {e}")
+
+        await asyncio.sleep(JANITOR_INTERVAL)
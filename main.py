@@ -4,7 +4,8 @@ import logging
 import asyncio
 import discord
 from discord.ext import commands
-from db import init_db
+from db import init_db, close_db, add_guild_member, sync_guild_members, remove_guild_member, remove_guild
+from boss_autospawn import schedule_guild, unschedule_guild
 from keep_alive import keep_alive
 
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +16,13 @@ keep_alive()
 
 intents = discord.Intents.default()
 intents.message_content = True
+# Intent privilegiado: sin él no llegan on_member_join/on_member_remove y
+# guild.members solo trae una parte del servidor (el leaderboard por servidor
+# se queda corto). Hay que activarlo también en el Developer Portal:
+# Bot > Privileged Gateway Intents > Server Members Intent.
+# DISCORD_MEMBERS_INTENT=0 lo desactiva; guild_members se llena entonces solo
+# con quien usa comandos.
+intents.members = os.environ.get("DISCORD_MEMBERS_INTENT", "1") != "0"
 bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
 
 # para evitar sincronizar múltiples veces
@@ -25,7 +33,9 @@ async def on_ready():
     global _tree_synced
     if bot.user:
         print(f"🏥 Sanatorio listo: {bot.user} (ID: {bot.user.id})")
-    await init_db()
+    # Registrar en guild_members a los jugadores que ya están en cada servidor
+    for guild in bot.guilds:
+        await sync_guild_members(guild.id, [m.id for m in guild.members])
     if not _tree_synced:
         try:
             synced = await bot.tree.sync()
@@ -54,9 +64,35 @@ async def on_app_command_error(interaction: discord.Interaction, error: Exceptio
     else:
         await interaction.response.send_message(f"🏥 Error en sesión terapéutica: {error}", ephemeral=True)
 
+@bot.listen("on_interaction")
+async def remember_member_slash(interaction: discord.Interaction):
+    """Cada comando usado en un servidor cuenta para su leaderboard"""
+    if interaction.guild_id and interaction.type == discord.InteractionType.application_command:
+        await add_guild_member(interaction.guild_id, interaction.user.id)
+
+@bot.before_invoke
+async def remember_member_prefix(ctx):
+    if ctx.guild:
+        await add_guild_member(ctx.guild.id, ctx.author.id)
+
+@bot.event
+async def on_member_join(member):
+    # Solo entra al leaderboard si ya es jugador
+    await sync_guild_members(member.guild.id, [member.id])
+
+@bot.event
+async def on_member_remove(member):
+    await remove_guild_member(member.guild.id, member.id)
+
+@bot.event
+async def on_guild_remove(guild):
+    await remove_guild(guild.id)
+    unschedule_guild(guild.id)
+
 @bot.event
 async def on_guild_join(guild):
     """Sincronizar comandos cuando el bot se une a un nuevo servidor"""
+    schedule_guild(guild.id)
     try:
         synced = await bot.tree.sync(guild=guild)
         print(f"Comandos sincronizados en servidor {guild.name}: {len(synced)}")
@@ -200,6 +236,10 @@ async def main():
         from boss_autospawn import auto_spawn_bosses
         bot.loop.create_task(auto_spawn_bosses(bot))
 
+        # Limpieza periódica de filas caducadas
+        from janitor import run_janitor
+        bot.loop.create_task(run_janitor(bot))
+
 
 
         # keep_alive no es un cog, es un servidor web - opcional
@@ -214,8 +254,21 @@ async def main():
         if not TOKEN:
             print("❌ ERROR: No hay DISCORD_TOKEN en variables de entorno.")
             return
-        print("🏥 Conectando al sanatorio psiquiátrico...")
-        await bot.start(TOKEN)
+        try:
+            # Esquema y conversión de la base antes de conectar: sin
+            # comandos en curso que esperen al escritor
+            await init_db()
+            print("🏥 Conectando al sanatorio psiquiátrico...")
+            await bot.start(TOKEN)
+        except discord.PrivilegedIntentsRequired:
+            print(
+                "❌ ERROR: Discord rechazó el intent de miembros. Actívalo en el Developer Portal "
+                "(Bot > Privileged Gateway Intents > Server Members Intent) "
+                "o arranca con DISCORD_MEMBERS_INTENT=0."
+            )
+        finally:
+            # Cerrar las conexiones compartidas de la base de datos
+            await close_db()
 
 if __name__ == "__main__":
     asyncio.run(main())
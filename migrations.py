@@ -0,0 +1,809 @@
+"""
+Migraciones del esquema de economy.db.
+- PRAGMA user_version guarda la última migración aplicada
+- Cada migración corre una sola vez y en orden; con la base al día no se hace nada
+- Los backfills de datos van en lotes pequeños, cada uno con su commit
+"""
+import asyncio
+import os
+import time
+import unicodedata
+from datetime import datetime, timezone
+
+# Filas por lote de backfill
+BACKFILL_BATCH = int(os.environ.get("DB_BACKFILL_BATCH", 1000))
+
+class Migration:
+    """Un paso del esquema.
+
+    schema(db) corre entero en una transacción. backfill(db, batch), si
+    existe, se llama después una y otra vez (un commit por lote) hasta que
+    devuelve menos de `batch` filas; debe ser idempotente, porque si el bot
+    se cae a medias la migración se repite desde el principio.
+    """
+
+    def __init__(self, version, description, schema=None, backfill=None):
+        self.version = version
+        self.description = description
+        self.schema = schema
+        self.backfill = backfill
+
+async def get_version(db):
+    cur = await db.execute("PRAGMA user_version")
+    return (await cur.fetchone())[0]
+
+async def _columns(db, table):
+    cur = await db.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in await cur.fetchall()}
+
+async def _tables(db):
+    cur = await db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    return {row[0] for row in await cur.fetchall()}
+
+async def add_column(db, table, column, decl):
+    """ALTER TABLE ADD COLUMN solo si la columna no existe"""
+    if column not in await _columns(db, table):
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+# ---------- 1: esquema base ----------
+
+async def _base_schema(db):
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        user_id TEXT PRIMARY KEY,
+        dinero INTEGER DEFAULT 0,
+        experiencia INTEGER DEFAULT 0,
+        rango TEXT DEFAULT 'Novato',
+        trabajo TEXT DEFAULT 'Desempleado',
+        vidas INTEGER DEFAULT 3
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS inventory (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        item TEXT,
+        rareza TEXT,
+        usos INTEGER DEFAULT 1,
+        durabilidad INTEGER DEFAULT 100,
+        categoria TEXT DEFAULT 'desconocido',
+        poder INTEGER DEFAULT 0
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS shop (
+        name TEXT PRIMARY KEY,
+        price INTEGER,
+        type TEXT,
+        effect TEXT,
+        rarity TEXT
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS cooldowns (
+        user_id TEXT,
+        action TEXT,
+        scope TEXT DEFAULT '',
+        expires_at INTEGER,
+        PRIMARY KEY(user_id, action, scope)
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS active_buffs (
+        user_id TEXT,
+        buff TEXT,
+        expira_en TIMESTAMP
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS boss_tables (
+        guild_id TEXT,
+        boss_name TEXT,
+        current_hp INTEGER,
+        max_hp INTEGER,
+        active BOOLEAN DEFAULT 1,
+        PRIMARY KEY (guild_id, boss_name)
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS equipment (
+        user_id TEXT PRIMARY KEY,
+        item_id INTEGER,
+        item_name TEXT
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS boss_spawn_times (
+        guild_id TEXT,
+        boss_type TEXT,
+        last_spawn TIMESTAMP,
+        PRIMARY KEY (guild_id, boss_type)
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS event_channels (
+        guild_id TEXT,
+        channel_id TEXT,
+        PRIMARY KEY (guild_id, channel_id)
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS daily_missions (
+        user_id TEXT,
+        fecha TEXT,
+        tipo TEXT,
+        objetivo INTEGER,
+        progreso INTEGER DEFAULT 0,
+        recompensa INTEGER,
+        completado BOOLEAN DEFAULT 0,
+        PRIMARY KEY (user_id, fecha)
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        remitente TEXT,
+        receptor TEXT,
+        item_remitente INTEGER,
+        item_receptor INTEGER,
+        estado TEXT DEFAULT 'pendiente',
+        creado_en INTEGER
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS market (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vendedor TEXT,
+        item_id INTEGER,
+        precio INTEGER,
+        fecha_lista TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS mascotas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        nombre TEXT NOT NULL,
+        xp INTEGER DEFAULT 0,
+        rareza TEXT DEFAULT 'común',
+        activa BOOLEAN DEFAULT 1
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS pet_xp (
+        user_id TEXT PRIMARY KEY,
+        xp INTEGER DEFAULT 0
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS duels (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        retador TEXT,
+        oponente TEXT,
+        cantidad INTEGER,
+        estado TEXT DEFAULT 'pendiente',
+        creado_en INTEGER
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS upgrades (
+        user_id TEXT,
+        nombre TEXT,
+        PRIMARY KEY (user_id, nombre)
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS clubs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT UNIQUE NOT NULL,
+        lider TEXT NOT NULL,
+        dinero INTEGER DEFAULT 0,
+        miembros_max INTEGER DEFAULT 10,
+        fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS club_members (
+        club_id INTEGER,
+        user_id TEXT,
+        rango TEXT DEFAULT 'miembro',
+        fecha_union TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (club_id, user_id),
+        FOREIGN KEY (club_id) REFERENCES clubs(id)
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS club_upgrades (
+        club_id INTEGER,
+        upgrade TEXT,
+        PRIMARY KEY (club_id, upgrade),
+        FOREIGN KEY (club_id) REFERENCES clubs(id)
+    )
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS clan_wars (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        club1_id INTEGER NOT NULL,
+        club2_id INTEGER NOT NULL,
+        estado TEXT DEFAULT 'pendiente',
+        ganador INTEGER,
+        fecha_inicio TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (club1_id) REFERENCES clubs(id),
+        FOREIGN KEY (club2_id) REFERENCES clubs(id)
+    )
+    """)
+    # columnas añadidas después de crear las tablas en bases antiguas
+    await add_column(db, "inventory", "categoria", "TEXT DEFAULT 'desconocido'")
+    await add_column(db, "inventory", "poder", "INTEGER DEFAULT 0")
+    await add_column(db, "users", "vidas", "INTEGER DEFAULT 3")
+    # epoch de creación, para que el janitor caduque los pendientes
+    await add_column(db, "trades", "creado_en", "INTEGER")
+    await add_column(db, "duels", "creado_en", "INTEGER")
+
+# ---------- 2: cooldowns unificados ----------
+
+async def _legacy_cooldowns(db):
+    """Pasar los cooldowns aún vigentes de las tablas antiguas y borrarlas"""
+    legacy = {
+        "work_cooldowns": ("work", "user_id, job_name, last_work"),
+        "rob_cooldowns": ("rob", "user_id, '', last_rob"),
+        "explore_cooldowns": ("explore", "user_id, '', last_explore"),
+        "duel_cooldowns": ("duel", "user_id, '', last_duel"),
+        "mining_cooldowns": ("mining", "user_id, '', last_mine"),
+        "fishing_cooldowns": ("fishing", "user_id, '', last_fish"),
+        "boss_cooldowns": ("fight", "user_id, guild_id, last_fight"),
+    }
+    existing = await _tables(db)
+    now = time.time()
+    for table, (action, columns) in legacy.items():
+        if table not in existing:
+            continue
+        cur = await db.execute(f"SELECT {columns} FROM {table}")
+        rows = []
+        for user_id, scope, value in await cur.fetchall():
+            try:
+                expires_at = int(datetime.fromisoformat(value).timestamp())
+            except (TypeError, ValueError):
+                continue
+            if expires_at > now:
+                rows.append((user_id, action, scope or "", expires_at))
+        await db.executemany(
+            "INSERT OR REPLACE INTO cooldowns(user_id, action, scope, expires_at) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        await db.execute(f"DROP TABLE {table}")
+
+# ---------- 3: active_buffs con expira_en ----------
+
+async def _active_buffs_expira_en(db):
+    """Bases antiguas tienen active_buffs(user_id, buff, uses, expires_at)"""
+    columns = await _columns(db, "active_buffs")
+    if "expira_en" in columns:
+        return
+    await db.execute("ALTER TABLE active_buffs RENAME TO active_buffs_old")
+    await db.execute("""
+    CREATE TABLE active_buffs (
+        user_id TEXT,
+        buff TEXT,
+        expira_en TIMESTAMP
+    )
+    """)
+    if "expires_at" in columns:
+        await db.execute(
+            "INSERT INTO active_buffs(user_id, buff, expira_en) "
+            "SELECT user_id, buff, expires_at FROM active_buffs_old"
+        )
+    await db.execute("DROP TABLE active_buffs_old")
+
+# ---------- 4: índices ----------
+
+INDEXES = {
+    "idx_inventory_user": "CREATE INDEX IF NOT EXISTS idx_inventory_user ON inventory(user_id)",
+    "idx_market_vendedor": "CREATE INDEX IF NOT EXISTS idx_market_vendedor ON market(vendedor)",
+    "idx_trades_receptor": "CREATE INDEX IF NOT EXISTS idx_trades_receptor ON trades(receptor, estado)",
+    "idx_duels_oponente": "CREATE INDEX IF NOT EXISTS idx_duels_oponente ON duels(oponente, estado)",
+    "idx_club_members_user": "CREATE INDEX IF NOT EXISTS idx_club_members_user ON club_members(user_id)",
+    "idx_mascotas_user_activa": "CREATE INDEX IF NOT EXISTS idx_mascotas_user_activa ON mascotas(user_id, activa)",
+    "idx_active_buffs_user": "CREATE INDEX IF NOT EXISTS idx_active_buffs_user ON active_buffs(user_id, buff)",
+    "idx_users_dinero": "CREATE INDEX IF NOT EXISTS idx_users_dinero ON users(dinero DESC)",
+    "idx_users_experiencia": "CREATE INDEX IF NOT EXISTS idx_users_experiencia ON users(experiencia DESC)",
+    "idx_cooldowns_expires": "CREATE INDEX IF NOT EXISTS idx_cooldowns_expires ON cooldowns(expires_at)",
+    "idx_daily_missions_fecha": "CREATE INDEX IF NOT EXISTS idx_daily_missions_fecha ON daily_missions(fecha)",
+    "idx_trades_estado_creado": "CREATE INDEX IF NOT EXISTS idx_trades_estado_creado ON trades(estado, creado_en)",
+    "idx_duels_estado_creado": "CREATE INDEX IF NOT EXISTS idx_duels_estado_creado ON duels(estado, creado_en)",
+}
+
+async def _indexes(db):
+    for sql in INDEXES.values():
+        await db.execute(sql)
+    # La versión de índices ahora la lleva user_version
+    await db.execute("DROP TABLE IF EXISTS db_meta")
+
+# ---------- 5: creado_en de trades/duelos antiguos ----------
+
+async def _backfill_creado_en(db, batch):
+    """Los pendientes de antes de la columna caducan a partir de ahora"""
+    now = int(time.time())
+    changed = 0
+    for table in ("trades", "duels"):
+        cur = await db.execute(
+            f"UPDATE {table} SET creado_en = ? WHERE rowid IN "
+            f"(SELECT rowid FROM {table} WHERE creado_en IS NULL AND estado = 'pendiente' LIMIT ?)",
+            (now, batch)
+        )
+        changed += cur.rowcount
+    return changed
+
+# ---------- 6: ids INTEGER y fechas en epoch ----------
+
+# Las fechas escritas por Python (isoformat, con "T") están en hora local;
+# las de CURRENT_TIMESTAMP ("AAAA-MM-DD HH:MM:SS") en UTC.
+def _iso_to_epoch(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if "T" not in value and dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+_NOW = "(CAST(strftime('%s', 'now') AS INTEGER))"
+
+# tabla -> (CREATE con tipos nuevos, columnas, expresiones sobre la vieja)
+_TYPED_TABLES = {
+    "users": ("""
+    CREATE TABLE users_new (
+        user_id INTEGER PRIMARY KEY,
+        dinero INTEGER DEFAULT 0,
+        experiencia INTEGER DEFAULT 0,
+        rango TEXT DEFAULT 'Novato',
+        trabajo TEXT DEFAULT 'Desempleado',
+        vidas INTEGER DEFAULT 3
+    )""", "user_id, dinero, experiencia, rango, trabajo, vidas",
+        "CAST(user_id AS INTEGER), dinero, experiencia, rango, trabajo, vidas"),
+    "inventory": ("""
+    CREATE TABLE inventory_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        item TEXT,
+        rareza TEXT,
+        usos INTEGER DEFAULT 1,
+        durabilidad INTEGER DEFAULT 100,
+        categoria TEXT DEFAULT 'desconocido',
+        poder INTEGER DEFAULT 0
+    )""", "id, user_id, item, rareza, usos, durabilidad, categoria, poder",
+        "id, CAST(user_id AS INTEGER), item, rareza, usos, durabilidad, categoria, poder"),
+    "cooldowns": ("""
+    CREATE TABLE cooldowns_new (
+        user_id INTEGER,
+        action TEXT,
+        scope TEXT DEFAULT '',
+        expires_at INTEGER,
+        PRIMARY KEY(user_id, action, scope)
+    )""", "user_id, action, scope, expires_at",
+        "CAST(user_id AS INTEGER), action, scope, expires_at"),
+    "active_buffs": ("""
+    CREATE TABLE active_buffs_new (
+        user_id INTEGER,
+        buff TEXT,
+        expira_en INTEGER
+    )""", "user_id, buff, expira_en",
+        "CAST(user_id AS INTEGER), buff, iso_to_epoch(expira_en)"),
+    "boss_tables": ("""
+    CREATE TABLE boss_tables_new (
+        guild_id INTEGER,
+        boss_name TEXT,
+        current_hp INTEGER,
+        max_hp INTEGER,
+        active BOOLEAN DEFAULT 1,
+        PRIMARY KEY (guild_id, boss_name)
+    )""", "guild_id, boss_name, current_hp, max_hp, active",
+        "CAST(guild_id AS INTEGER), boss_name, current_hp, max_hp, active"),
+    "equipment": ("""
+    CREATE TABLE equipment_new (
+        user_id INTEGER PRIMARY KEY,
+        item_id INTEGER,
+        item_name TEXT
+    )""", "user_id, item_id, item_name",
+        "CAST(user_id AS INTEGER), item_id, item_name"),
+    "boss_spawn_times": ("""
+    CREATE TABLE boss_spawn_times_new (
+        guild_id INTEGER,
+        boss_type TEXT,
+        last_spawn INTEGER,
+        PRIMARY KEY (guild_id, boss_type)
+    )""", "guild_id, boss_type, last_spawn",
+        "CAST(guild_id AS INTEGER), boss_type, iso_to_epoch(last_spawn)"),
+    "event_channels": ("""
+    CREATE TABLE event_channels_new (
+        guild_id INTEGER,
+        channel_id INTEGER,
+        PRIMARY KEY (guild_id, channel_id)
+    )""", "guild_id, channel_id",
+        "CAST(guild_id AS INTEGER), CAST(channel_id AS INTEGER)"),
+    "daily_missions": ("""
+    CREATE TABLE daily_missions_new (
+        user_id INTEGER,
+        fecha TEXT,
+        tipo TEXT,
+        objetivo INTEGER,
+        progreso INTEGER DEFAULT 0,
+        recompensa INTEGER,
+        completado BOOLEAN DEFAULT 0,
+        PRIMARY KEY (user_id, fecha)
+    )""", "user_id, fecha, tipo, objetivo, progreso, recompensa, completado",
+        "CAST(user_id AS INTEGER), fecha, tipo, objetivo, progreso, recompensa, completado"),
+    "trades": ("""
+    CREATE TABLE trades_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        remitente INTEGER,
+        receptor INTEGER,
+        item_remitente INTEGER,
+        item_receptor INTEGER,
+        estado TEXT DEFAULT 'pendiente',
+        creado_en INTEGER
+    )""", "id, remitente, receptor, item_remitente, item_receptor, estado, creado_en",
+        "id, CAST(remitente AS INTEGER), CAST(receptor AS INTEGER), item_remitente, item_receptor, estado, creado_en"),
+    "market": (f"""
+    CREATE TABLE market_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vendedor INTEGER,
+        item_id INTEGER,
+        precio INTEGER,
+        fecha_lista INTEGER DEFAULT {_NOW}
+    )""", "id, vendedor, item_id, precio, fecha_lista",
+        "id, CAST(vendedor AS INTEGER), item_id, precio, iso_to_epoch(fecha_lista)"),
+    "mascotas": ("""
+    CREATE TABLE mascotas_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        nombre TEXT NOT NULL,
+        xp INTEGER DEFAULT 0,
+        rareza TEXT DEFAULT 'común',
+        activa BOOLEAN DEFAULT 1
+    )""", "id, user_id, nombre, xp, rareza, activa",
+        "id, CAST(user_id AS INTEGER), nombre, xp, rareza, activa"),
+    "pet_xp": ("""
+    CREATE TABLE pet_xp_new (
+        user_id INTEGER PRIMARY KEY,
+        xp INTEGER DEFAULT 0
+    )""", "user_id, xp", "CAST(user_id AS INTEGER), xp"),
+    "duels": ("""
+    CREATE TABLE duels_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        retador INTEGER,
+        oponente INTEGER,
+        cantidad INTEGER,
+        estado TEXT DEFAULT 'pendiente',
+        creado_en INTEGER
+    )""", "id, retador, oponente, cantidad, estado, creado_en",
+        "id, CAST(retador AS INTEGER), CAST(oponente AS INTEGER), cantidad, estado, creado_en"),
+    "upgrades": ("""
+    CREATE TABLE upgrades_new (
+        user_id INTEGER,
+        nombre TEXT,
+        PRIMARY KEY (user_id, nombre)
+    )""", "user_id, nombre", "CAST(user_id AS INTEGER), nombre"),
+    "clubs": (f"""
+    CREATE TABLE clubs_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT UNIQUE NOT NULL,
+        lider INTEGER NOT NULL,
+        dinero INTEGER DEFAULT 0,
+        miembros_max INTEGER DEFAULT 10,
+        fecha_creacion INTEGER DEFAULT {_NOW}
+    )""", "id, nombre, lider, dinero, miembros_max, fecha_creacion",
+        "id, nombre, CAST(lider AS INTEGER), dinero, miembros_max, iso_to_epoch(fecha_creacion)"),
+    "club_members": (f"""
+    CREATE TABLE club_members_new (
+        club_id INTEGER,
+        user_id INTEGER,
+        rango TEXT DEFAULT 'miembro',
+        fecha_union INTEGER DEFAULT {_NOW},
+        PRIMARY KEY (club_id, user_id),
+        FOREIGN KEY (club_id) REFERENCES clubs(id)
+    )""", "club_id, user_id, rango, fecha_union",
+        "club_id, CAST(user_id AS INTEGER), rango, iso_to_epoch(fecha_union)"),
+    "clan_wars": (f"""
+    CREATE TABLE clan_wars_new (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        club1_id INTEGER NOT NULL,
+        club2_id INTEGER NOT NULL,
+        estado TEXT DEFAULT 'pendiente',
+        ganador INTEGER,
+        fecha_inicio INTEGER DEFAULT {_NOW},
+        FOREIGN KEY (club1_id) REFERENCES clubs(id),
+        FOREIGN KEY (club2_id) REFERENCES clubs(id)
+    )""", "id, club1_id, club2_id, estado, ganador, fecha_inicio",
+        "id, club1_id, club2_id, estado, ganador, iso_to_epoch(fecha_inicio)"),
+}
+
+async def _integer_ids(db):
+    """Snowflakes como INTEGER y fechas como epoch.
+
+    Cada tabla se copia a una nueva y se intercambia (crear, copiar, borrar
+    la vieja, renombrar), que es la forma de cambiar el tipo de una columna
+    en SQLite sin romper las FOREIGN KEY que apuntan a ella.
+    """
+    await db.create_function("iso_to_epoch", 1, _iso_to_epoch, deterministic=True)
+    for table, (create, columns, select) in _TYPED_TABLES.items():
+        await db.execute(create)
+        await db.execute(f"INSERT INTO {table}_new({columns}) SELECT {select} FROM {table}")
+        await db.execute(f"DROP TABLE {table}")
+        await db.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    # DROP TABLE se llevó los índices
+    await _indexes(db)
+
+# ---------- 7: miembros por servidor ----------
+
+async def _guild_members(db):
+    """Quién juega en cada servidor, con copia de dinero/experiencia.
+
+    La copia permite que el top por servidor salga de un índice cubriente
+    (guild_id, stat) sin tocar `users`; los triggers la mantienen al día en
+    la misma transacción que cualquier escritura sobre users.
+    """
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS guild_members (
+        guild_id INTEGER,
+        user_id INTEGER,
+        dinero INTEGER DEFAULT 0,
+        experiencia INTEGER DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id)
+    )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_guild_members_dinero ON guild_members(guild_id, dinero DESC, user_id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_guild_members_experiencia ON guild_members(guild_id, experiencia DESC, user_id)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_guild_members_user ON guild_members(user_id)")
+    await db.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_users_insert_guild_members AFTER INSERT ON users
+    BEGIN
+        UPDATE guild_members SET dinero = NEW.dinero, experiencia = NEW.experiencia
+        WHERE user_id = NEW.user_id;
+    END
+    """)
+    await db.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_users_update_guild_members AFTER UPDATE OF dinero, experiencia ON users
+    BEGIN
+        UPDATE guild_members SET dinero = NEW.dinero, experiencia = NEW.experiencia
+        WHERE user_id = NEW.user_id;
+    END
+    """)
+
+async def _display_names(db):
+    """Nombres visibles de Discord ya resueltos (ver names.py)"""
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS display_names (
+        user_id INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        actualizado_en INTEGER NOT NULL
+    )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_display_names_actualizado ON display_names(actualizado_en)")
+
+# ---------- 9: mercado como libro de órdenes ----------
+
+def plain_text(value):
+    """Minúsculas y sin tildes: "Épico" y "epico" filtran igual"""
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+MARKET_INDEXES = {
+    # búsqueda por nombre, de más barato a más caro (y cursor (precio, id))
+    "idx_market_item_precio": "CREATE INDEX IF NOT EXISTS idx_market_item_precio ON market(item, precio, id)",
+    "idx_market_precio": "CREATE INDEX IF NOT EXISTS idx_market_precio ON market(precio, id)",
+    "idx_market_rareza_precio": "CREATE INDEX IF NOT EXISTS idx_market_rareza_precio ON market(rareza, precio, id)",
+    "idx_market_categoria_precio": "CREATE INDEX IF NOT EXISTS idx_market_categoria_precio ON market(categoria, precio, id)",
+    "idx_market_fecha": "CREATE INDEX IF NOT EXISTS idx_market_fecha ON market(fecha_lista, id)",
+}
+
+async def _market_book(db):
+    """Copiar nombre, rareza y categoría del item a cada publicación.
+
+    Así se puede indexar por (item, precio) y filtrar sin join a inventory.
+    Las publicaciones cuyo item ya no existe no se pueden comprar: se borran.
+    """
+    await add_column(db, "market", "item", "TEXT")
+    await add_column(db, "market", "rareza", "TEXT")
+    await add_column(db, "market", "categoria", "TEXT")
+    await db.create_function("plain_text", 1, plain_text, deterministic=True)
+    await db.execute(
+        "UPDATE market SET item = i.item, rareza = plain_text(i.rareza), categoria = plain_text(i.categoria) "
+        "FROM inventory i WHERE i.id = market.item_id"
+    )
+    await db.execute("DELETE FROM market WHERE item IS NULL")
+    for sql in MARKET_INDEXES.values():
+        await db.execute(sql)
+    await db.execute("ANALYZE market")
+
+# ---------- 10: custodia del mercado ----------
+
+# Dueño de los items publicados: ningún snowflake de Discord es 0
+ESCROW_USER_ID = 0
+
+async def _market_escrow(db):
+    """Pasar a custodia los items ya publicados.
+
+    Antes el item seguía en el inventario del vendedor mientras estaba en
+    venta. Se descartan las publicaciones que ya no se podrían cumplir (el
+    item cambió de dueño) y las repetidas del mismo item.
+    """
+    await db.execute(
+        "DELETE FROM market WHERE NOT EXISTS "
+        "(SELECT 1 FROM inventory i WHERE i.id = market.item_id AND i.user_id = market.vendedor)"
+    )
+    await db.execute("DELETE FROM market WHERE id NOT IN (SELECT MIN(id) FROM market GROUP BY item_id)")
+    await db.execute(
+        "UPDATE inventory SET user_id = ? WHERE id IN (SELECT item_id FROM market)",
+        (ESCROW_USER_ID,)
+    )
+    await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_market_item_id ON market(item_id)")
+
+# ---------- 11: historial de precios ----------
+
+async def _market_history(db):
+    """Ventas del mercado y agregados de precio por item.
+
+    market_trades solo recibe INSERTs (historial). market_price_buckets
+    suma las ventas por minuto (resolucion 60); el janitor pliega los
+    minutos de horas cerradas en cubos de una hora (resolucion 3600).
+    """
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS market_trades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item TEXT NOT NULL,
+        precio INTEGER NOT NULL,
+        vendedor INTEGER,
+        comprador INTEGER,
+        fecha INTEGER NOT NULL
+    )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_market_trades_fecha ON market_trades(fecha)")
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS market_price_buckets (
+        item TEXT NOT NULL,
+        inicio INTEGER NOT NULL,
+        resolucion INTEGER NOT NULL,
+        volumen INTEGER NOT NULL,
+        suma INTEGER NOT NULL,
+        minimo INTEGER NOT NULL,
+        maximo INTEGER NOT NULL,
+        PRIMARY KEY (item, inicio, resolucion)
+    ) WITHOUT ROWID
+    """)
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS market_prices (
+        item TEXT PRIMARY KEY,
+        ultimo INTEGER NOT NULL,
+        ultimo_en INTEGER NOT NULL
+    ) WITHOUT ROWID
+    """)
+
+# ---------- 12: liquidación de trades ----------
+
+async def _trade_items(db):
+    """Índices (item, estado) para anular en bloque los trades pendientes de
+    un item, y anular ya los que no se podrían liquidar"""
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_trades_item_remitente ON trades(item_remitente, estado)")
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_trades_item_receptor ON trades(item_receptor, estado)")
+    await db.execute("""
+    UPDATE trades SET estado = 'invalido'
+    WHERE estado = 'pendiente'
+      AND (NOT EXISTS (SELECT 1 FROM inventory WHERE id = item_remitente AND user_id = remitente)
+           OR NOT EXISTS (SELECT 1 FROM inventory WHERE id = item_receptor AND user_id = receptor))
+    """)
+
+# ---------- 13: raids ----------
+
+async def _boss_damage(db):
+    """Daño acumulado por jugador contra el boss activo de cada servidor.
+    Se vacía al spawnear otro boss y al matarlo (tras repartir recompensas)."""
+    await db.execute("""
+    CREATE TABLE IF NOT EXISTS boss_damage (
+        guild_id INTEGER NOT NULL,
+        boss_name TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        damage INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, boss_name, user_id)
+    ) WITHOUT ROWID
+    """)
+
+# ---------- 14: guild_members sin copia de stats ----------
+
+async def _guild_members_slim(db):
+    """guild_members pasa a ser solo (guild_id, user_id).
+
+    Los rankings por servidor salen de ranking.py, así que la copia de
+    dinero/experiencia ya no la lee nadie: los triggers costaban un UPDATE
+    extra por cada servidor del jugador en cada escritura sobre users, y
+    los dos índices otra escritura por fila copiada.
+    """
+    await db.execute("DROP TRIGGER IF EXISTS trg_users_insert_guild_members")
+    await db.execute("DROP TRIGGER IF EXISTS trg_users_update_guild_members")
+    await db.execute("DROP INDEX IF EXISTS idx_guild_members_dinero")
+    await db.execute("DROP INDEX IF EXISTS idx_guild_members_experiencia")
+    await db.execute("ALTER TABLE guild_members DROP COLUMN dinero")
+    await db.execute("ALTER TABLE guild_members DROP COLUMN experiencia")
+
+# Nuevos cambios de esquema: añadir al final con el siguiente número,
+# nunca editar una migración ya publicada.
+MIGRATIONS = [
+    Migration(1, "esquema base", schema=_base_schema),
+    Migration(2, "cooldowns unificados", schema=_legacy_cooldowns),
+    Migration(3, "active_buffs con expira_en", schema=_active_buffs_expira_en),
+    Migration(4, "índices secundarios", schema=_indexes),
+    Migration(5, "creado_en en trades/duelos pendientes", backfill=_backfill_creado_en),
+    Migration(6, "ids INTEGER y fechas en epoch", schema=_integer_ids),
+    Migration(7, "miembros por servidor", schema=_guild_members),
+    Migration(8, "caché de nombres visibles", schema=_display_names),
+    Migration(9, "mercado con datos del item e índices de búsqueda", schema=_market_book),
+    Migration(10, "items en venta bajo custodia", schema=_market_escrow),
+    Migration(11, "historial y agregados de precios del mercado", schema=_market_history),
+    Migration(12, "trades con índices por item", schema=_trade_items),
+    Migration(13, "daño por jugador en raids", schema=_boss_damage),
+    Migration(14, "guild_members sin copia de stats", schema=_guild_members_slim),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+# PRAGMA auto_vacuum: 0 = NONE, 1 = FULL, 2 = INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+async def enable_incremental_vacuum(pool):
+    """Pasar la base a auto_vacuum=INCREMENTAL; True si hubo que convertirla.
+
+    El janitor solo puede devolver páginas con incremental_vacuum, y cambiar
+    el modo exige reescribir el archivo con un VACUUM completo. Se hace una
+    sola vez al arrancar, antes de conectar con Discord: nunca con el bot
+    atendiendo comandos, porque el VACUUM retiene al único escritor.
+    """
+    async with pool.write() as db:
+        cur = await db.execute("PRAGMA auto_vacuum")
+        if (await cur.fetchone())[0] == AUTO_VACUUM_INCREMENTAL:
+            return False
+        print("🗄️ Convirtiendo la base a auto_vacuum incremental (VACUUM completo, solo esta vez)...")
+        await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        await db.execute("VACUUM")
+    return True
+
+async def migrate(pool, batch: int = None):
+    """Aplicar las migraciones pendientes; devuelve las versiones aplicadas"""
+    batch = batch or BACKFILL_BATCH
+    async with pool.read() as db:
+        version = await get_version(db)
+    if version >= LATEST_VERSION:
+        return []
+    applied = []
+    for m in MIGRATIONS:
+        if m.version <= version:
+            continue
+        async with pool.write() as db:
+            # Otro init_db pudo aplicarla mientras esperábamos el escritor
+            if await get_version(db) >= m.version:
+                continue
+            await db.execute("BEGIN")
+            if m.schema:
+                await m.schema(db)
+            if not m.backfill:
+                # user_version es parte de la cabecera: entra en el mismo commit
+                await db.execute(f"PRAGMA user_version = {int(m.version)}")
+            await db.commit()
+        if m.backfill:
+            while True:
+                async with pool.write() as db:
+                    changed = await m.backfill(db, batch)
+                    await db.commit()
+                if changed < batch:
+                    break
+                # Dejar pasar a los comandos entre lote y lote
+                await asyncio.sleep(0)
+            async with pool.write() as db:
+                await db.execute(f"PRAGMA user_version = {int(m.version)}")
+                await db.commit()
+        applied.append(m.version)
+        print(f"🗄️ Migración {m.version} aplicada: {m.description}")
+    return applied
@@ -0,0 +1,64 @@
+"""
+Tipos de fila que devuelve db.py.
+- Tuplas con nombre: sin dict por fila y con los nombres de campo compartidos por la clase
+- Se siguen leyendo como antes: fila["dinero"], fila.get("trabajo", "Desempleado")
+- Inmutables: se pueden cachear y compartir sin copiarlas; para cambiar un campo, fila._replace(...)
+"""
+from collections import namedtuple
+
+class _DictAccess:
+    """Acceso estilo dict sobre una namedtuple"""
+
+    __slots__ = ()
+
+    # tuple.__new__ directo: más rápido que _make y que armar un dict. No
+    # comprueba la longitud: el SELECT tiene que traer los campos en orden.
+    @classmethod
+    def from_row(cls, row):
+        return tuple.__new__(cls, row)
+
+    @classmethod
+    def from_rows(cls, rows):
+        new = tuple.__new__
+        return [new(cls, row) for row in rows]
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._index[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+    def __contains__(self, key):
+        # Como en un dict: "campo" in fila
+        return key in self._index
+
+def _row_type(name, fields):
+    base = namedtuple(name, fields)
+    return type(name, (_DictAccess, base), {
+        "__slots__": (),
+        "_index": {field: i for i, field in enumerate(base._fields)},
+    })
+
+User = _row_type("User", "user_id dinero experiencia rango trabajo vidas")
+InventoryItem = _row_type("InventoryItem", "id item rareza usos durabilidad categoria poder")
+Pet = _row_type("Pet", "id nombre xp rareza activa")
+Listing = _row_type("Listing", "id vendedor item_id precio item rareza categoria fecha_lista")
+Trade = _row_type("Trade", "id remitente item_remitente item_receptor")
+Duel = _row_type("Duel", "id retador cantidad")
+PriceStats = _row_type("PriceStats", "item ultimo ultimo_en media_24h volumen_24h")
+RaidHit = _row_type("RaidHit", "damage current_hp max_hp killed contributions")
@@ -0,0 +1,83 @@
+"""
+Nombres visibles de usuarios para embeds (leaderboard, mercado, duelos, trades).
+- Primero la caché de discord.py (miembros del servidor, bot.get_user): sin red
+- Luego display_names en SQLite, si el nombre tiene menos de NAME_TTL
+- Lo que falte: una sola petición query_members por servidor (hasta 100 ids),
+  y fetch_user en paralelo con tope NAME_FETCH_CONCURRENCY para el resto
+- Si todo falla: el último nombre guardado aunque esté viejo, o "Usuario <id>"
+"""
+import asyncio
+import os
+import time
+import discord
+from db import get_display_names, save_display_names
+
+# Segundos que un nombre guardado se da por bueno sin volver a pedirlo
+NAME_TTL = int(os.environ.get("NAME_TTL_SECONDS", 24 * 3600))
+# Peticiones fetch_user simultáneas como máximo (entre todas las llamadas)
+NAME_FETCH_CONCURRENCY = int(os.environ.get("NAME_FETCH_CONCURRENCY", 4))
+# query_members acepta como mucho 100 ids
+QUERY_MEMBERS_LIMIT = 100
+
+_fetch_slots = asyncio.Semaphore(NAME_FETCH_CONCURRENCY)
+
+def _cached_name(bot, guild, uid):
+    member = guild.get_member(uid) if guild else None
+    if member is not None:
+        return member.display_name
+    user = bot.get_user(uid)
+    return user.display_name if user else None
+
+async def _fetch_name(bot, uid):
+    async with _fetch_slots:
+        try:
+            user = await bot.fetch_user(uid)
+        except discord.HTTPException:
+            return None
+    return user.display_name
+
+async def resolve_names(bot, user_ids, guild=None):
+    """{user_id: nombre visible} para todos los ids, con el mínimo de red"""
+    names = {}
+    misses = []
+    for uid in dict.fromkeys(int(uid) for uid in user_ids):
+        name = _cached_name(bot, guild, uid)
+        if name is None:
+            misses.append(uid)
+        else:
+            names[uid] = name
+    if not misses:
+        return names
+
+    stored = await get_display_names(misses)
+    fresh_after = time.time() - NAME_TTL
+    for uid, (name, ts) in stored.items():
+        if ts > fresh_after:
+            names[uid] = name
+    misses = [uid for uid in misses if uid not in names]
+
+    fetched = {}
+    if misses and guild is not None:
+        try:
+            members = await guild.query_members(user_ids=misses[:QUERY_MEMBERS_LIMIT], limit=QUERY_MEMBERS_LIMIT)
+        except (asyncio.TimeoutError, discord.ClientException):
+            members = []
+        for member in members:
+            fetched[member.id] = member.display_name
+        misses = [uid for uid in misses if uid not in fetched]
+    if misses:
+        results = await asyncio.gather(*(_fetch_name(bot, uid) for uid in misses))
+        for uid, name in zip(misses, results):
+            if name is not None:
+                fetched[uid] = name
+
+    if fetched:
+        names.update(fetched)
+        try:
+            await save_display_names(fetched)
+        except Exception as e:
+            print(f"Error guardando nombres: {e}")
+    for uid in misses:
+        if uid not in names:
+            names[uid] = stored[uid][0] if uid in stored else f"Usuario {uid}"
+    return names
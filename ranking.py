@@ -0,0 +1,170 @@
+"""
+Rankings en memoria por servidor y por stat (dinero, experiencia).
+- Se cargan una vez desde SQLite (users + guild_members) al arrancar
+- db.py les aplica cada cambio justo después del commit, con el escritor
+  tomado: siempre reflejan lo confirmado en la base, en el mismo orden
+- Top N y "puesto #k de N" con bisect, sin consultar la base
+"""
+from bisect import bisect_left, insort
+
+class Ranking:
+    """Claves (-valor, user_id) ordenadas: mismo orden que
+    ORDER BY stat DESC, user_id"""
+
+    __slots__ = ("_keys",)
+
+    def __init__(self, keys=()):
+        self._keys = sorted(keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def insert(self, user_id, value):
+        insort(self._keys, (-value, user_id))
+
+    def remove(self, user_id, value):
+        key = (-value, user_id)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def move(self, user_id, old, new):
+        self.remove(user_id, old)
+        self.insert(user_id, new)
+
+    def top(self, limit):
+        return [(uid, -neg) for neg, uid in self._keys[:limit]]
+
+    def position(self, user_id, value):
+        """Puesto (desde 1) de un usuario que está en el ranking"""
+        return bisect_left(self._keys, (-value, user_id)) + 1
+
+class Leaderboards:
+    """Un Ranking por (guild_id, stat); guild_id None es el global (toda la
+    tabla users). Los valores son los de users; quien está en un servidor
+    sin fila en users cuenta con 0."""
+
+    def __init__(self, stats):
+        self.stats = tuple(stats)
+        self.loaded = False
+        self._values = {}   # user_id -> [valor por stat] (solo filas de users)
+        self._guilds = {}   # user_id -> {guild_id}
+        self._boards = {}   # (guild_id, stat) -> Ranking
+
+    def load(self, users, members):
+        """users: [(user_id, *stats)], members: [(guild_id, user_id)]"""
+        self._values = {row[0]: list(row[1:]) for row in users}
+        self._guilds = {}
+        keys = {}
+        for gid, uid in members:
+            self._guilds.setdefault(uid, set()).add(gid)
+            keys.setdefault(gid, []).append(uid)
+        keys[None] = list(self._values)
+        zero = [0] * len(self.stats)
+        self._boards = {}
+        for gid, uids in keys.items():
+            for i, stat in enumerate(self.stats):
+                self._boards[(gid, stat)] = Ranking(
+                    (-self._values.get(uid, zero)[i], uid) for uid in uids
+                )
+        self.loaded = True
+
+    # --- consultas ---
+
+    def is_member(self, guild_id, user_id):
+        return guild_id in self._guilds.get(user_id, ())
+
+    def has_user(self, user_id):
+        return user_id in self._values
+
+    def top(self, guild_id, stat, limit):
+        board = self._boards.get((guild_id, stat))
+        return board.top(limit) if board else []
+
+    def rank(self, guild_id, user_id, stat):
+        """(puesto, valor, total) o None si el usuario no figura"""
+        if guild_id is None:
+            if user_id not in self._values:
+                return None
+        elif not self.is_member(guild_id, user_id):
+            return None
+        board = self._boards[(guild_id, stat)]
+        value = self._value(user_id, self.stats.index(stat))
+        return board.position(user_id, value), value, len(board)
+
+    def _value(self, user_id, i):
+        values = self._values.get(user_id)
+        return values[i] if values else 0
+
+    # --- cambios (ya confirmados en la base) ---
+
+    def apply(self, deltas):
+        """deltas: {user_id: (delta por stat)}; crea la fila si no existía"""
+        for uid, delta in deltas.items():
+            old = self._values.get(uid)
+            if old is None:
+                old = [0] * len(self.stats)
+                new = self._values[uid] = list(delta)
+                for i, stat in enumerate(self.stats):
+                    self._board(None, stat).insert(uid, new[i])
+            else:
+                new = [o + d for o, d in zip(old, delta)]
+                self._values[uid] = new
+                for i, stat in enumerate(self.stats):
+                    if delta[i]:
+                        self._board(None, stat).move(uid, old[i], new[i])
+            self._move_in_guilds(uid, old, new)
+
+    def set(self, user_id, values):
+        """Valores absolutos (p.ej. un reset); no hace nada si no hay fila"""
+        old = self._values.get(user_id)
+        if old is None:
+            return
+        new = list(values)
+        self._values[user_id] = new
+        for i, stat in enumerate(self.stats):
+            if old[i] != new[i]:
+                self._board(None, stat).move(user_id, old[i], new[i])
+        self._move_in_guilds(user_id, old, new)
+
+    def _move_in_guilds(self, user_id, old, new):
+        for gid in self._guilds.get(user_id, ()):
+            for i, stat in enumerate(self.stats):
+                if old[i] != new[i]:
+                    self._boards[(gid, stat)].move(user_id, old[i], new[i])
+
+    def join(self, guild_id, user_id):
+        guilds = self._guilds.setdefault(user_id, set())
+        if guild_id in guilds:
+            return
+        guilds.add(guild_id)
+        for i, stat in enumerate(self.stats):
+            self._board(guild_id, stat).insert(user_id, self._value(user_id, i))
+
+    def leave(self, guild_id, user_id):
+        guilds = self._guilds.get(user_id)
+        if not guilds or guild_id not in guilds:
+            return
+        guilds.discard(guild_id)
+        if not guilds:
+            del self._guilds[user_id]
+        for i, stat in enumerate(self.stats):
+            self._boards[(guild_id, stat)].remove(user_id, self._value(user_id, i))
+
+    def drop_guild(self, guild_id):
+        for stat in self.stats:
+            board = self._boards.pop((guild_id, stat), None)
+            if board is None:
+                continue
+            for uid, _ in board.top(len(board)):
+                guilds = self._guilds.get(uid)
+                if guilds:
+                    guilds.discard(guild_id)
+                    if not guilds:
+                        del self._guilds[uid]
+
+    def _board(self, guild_id, stat):
+        board = self._boards.get((guild_id, stat))
+        if board is None:
+            board = self._boards[(guild_id, stat)] = Ranking()
+        return board
@@ -0,0 +1,129 @@
+"""
+Benchmark de contención del mercado (list_item_for_sale / buy_from_market).
+
+- Base nueva en un directorio temporal: economy.db no se toca
+- 2000 publicaciones de 50 vendedores y 4000 compradores que intentan a la
+  vez comprar una publicación al azar (≈2 compradores por publicación);
+  parte de los compradores no tiene saldo suficiente
+- Al final comprueba que ninguna publicación se vendió dos veces, que el
+  dinero total se conserva y que cada item está o en custodia con su
+  publicación o en el inventario de quien lo compró
+
+Uso: python scripts/bench_market.py  (sale con código 1 si algo no cuadra)
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import sqlite3
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+LISTINGS = 2000
+SELLERS = 50
+BUYERS = 4000
+PRICE_RANGE = (10, 100)
+BUDGET_RANGE = (0, 150)
+SELLER_BASE = 10_000
+BUYER_BASE = 20_000
+
+async def setup(rng):
+    """Vendedores con items y compradores con saldo; devuelve [(vendedor, item_id, precio)]"""
+    offers = []
+    async with db.transaction() as tx:
+        for i in range(LISTINGS):
+            seller = SELLER_BASE + i % SELLERS
+            item_id = await tx.add_item_to_user(seller, f"Item {i % 40}", "comun", categoria="herramientas")
+            offers.append((seller, item_id, rng.randint(*PRICE_RANGE)))
+        await tx.apply_user_deltas([(SELLER_BASE + i, 0, 0, 3) for i in range(SELLERS)])
+        await tx.apply_user_deltas(
+            [(BUYER_BASE + i, rng.randint(*BUDGET_RANGE), 0, 3) for i in range(BUYERS)]
+        )
+    return offers
+
+def total_money(conn):
+    return conn.execute("SELECT COALESCE(SUM(dinero), 0) FROM users").fetchone()[0]
+
+async def run(path):
+    await db.init_db()
+    try:
+        return await bench(path)
+    finally:
+        await db.close_db()
+
+async def bench(path):
+    rng = random.Random(1234)
+    offers = await setup(rng)
+    await db.write_behind.flush()
+
+    start = time.perf_counter()
+    listing_ids = await asyncio.gather(*(db.list_item_for_sale(s, item, price) for s, item, price in offers))
+    list_secs = time.perf_counter() - start
+    listed = {lid: offer for lid, offer in zip(listing_ids, offers) if lid is not None}
+
+    with sqlite3.connect(path) as conn:
+        money_before = total_money(conn)
+
+    attempts = [(rng.choice(listing_ids), BUYER_BASE + i) for i in range(BUYERS)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(db.buy_from_market(lid, buyer) for lid, buyer in attempts))
+    buy_secs = time.perf_counter() - start
+    await db.write_behind.flush()
+
+    outcome = Counter(result for result, _ in results)
+    sold = Counter(lid for (lid, _), (result, _) in zip(attempts, results) if result == db.MARKET_BOUGHT)
+    winners = {lid: buyer for (lid, buyer), (result, _) in zip(attempts, results) if result == db.MARKET_BOUGHT}
+
+    errors = []
+    if len(listed) != LISTINGS:
+        errors.append(f"{LISTINGS - len(listed)} publicaciones fallaron")
+    double = [lid for lid, n in sold.items() if n > 1]
+    if double:
+        errors.append(f"{len(double)} publicaciones vendidas más de una vez")
+
+    with sqlite3.connect(path) as conn:
+        money_after = total_money(conn)
+        if money_after != money_before:
+            errors.append(f"dinero total {money_before} -> {money_after}")
+        remaining = {row[0]: row[1] for row in conn.execute("SELECT id, item_id FROM market")}
+        escrow = {row[0] for row in conn.execute(
+            "SELECT id FROM inventory WHERE user_id = ?", (db.ESCROW_USER_ID,))}
+        if set(remaining.values()) != escrow:
+            errors.append(f"custodia {len(escrow)} items vs {len(remaining)} publicaciones")
+        if set(remaining) & set(sold):
+            errors.append("publicaciones vendidas siguen en el mercado")
+        if len(remaining) + len(sold) != LISTINGS:
+            errors.append(f"{LISTINGS - len(remaining) - len(sold)} publicaciones desaparecieron sin venta")
+        owners = dict(conn.execute("SELECT id, user_id FROM inventory"))
+        lost = [lid for lid, buyer in winners.items() if owners.get(listed[lid][1]) != buyer]
+        if lost:
+            errors.append(f"{len(lost)} items comprados no están en el inventario del comprador")
+        history = conn.execute("SELECT COUNT(*) FROM market_trades").fetchone()[0]
+        if history != len(sold):
+            errors.append(f"market_trades tiene {history} ventas, se compraron {len(sold)}")
+
+    print(f"Publicar: {LISTINGS} en {list_secs:.2f}s ({LISTINGS / list_secs:.0f}/s)")
+    print(f"Comprar:  {BUYERS} intentos en {buy_secs:.2f}s ({BUYERS / buy_secs:.0f}/s)")
+    for result, n in outcome.most_common():
+        print(f"   {result}: {n}")
+    print(f"Dinero total: {money_before} -> {money_after}")
+    return errors
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db.pool = db.ConnectionPool(path)
+        errors = asyncio.run(run(path))
+    if errors:
+        for error in errors:
+            print(f"❌ {error}")
+        sys.exit(1)
+    print("✅ Sin ventas dobles, dinero conservado, custodia consistente")
+
+if __name__ == "__main__":
+    main()
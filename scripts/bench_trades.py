@@ -0,0 +1,174 @@
+"""
+Benchmark de liquidación de trades (accept_trade / invalidate_trades).
+
+- Base nueva en un directorio temporal: economy.db no se toca
+- 1000 jugadores con 10 items cada uno y 50000 trades pendientes entre
+  ellos (cada item aparece en ~10 trades); ANALYZE se hace con la tabla
+  casi vacía, como en una base recién migrada
+- 2000 accept_trade concurrentes sobre trades pendientes al azar
+- Al final comprueba que ningún item se duplicó ni se perdió, que cada
+  trade aceptado movió sus dos items, que ningún pendiente usa un item que
+  ya cambió de dueño, y que los UPDATE con INDEXED BY de invalidate_trades
+  siguen planificando sobre su índice
+
+Uso: python scripts/bench_trades.py  (sale con código 1 si algo no cuadra)
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import sqlite3
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+PLAYERS = 1000
+ITEMS_PER_PLAYER = 10
+PENDING = 50_000
+ACCEPTS = 2000
+BULK_INVALIDATE = 1000
+USER_BASE = 10_000
+# trades insertados antes del ANALYZE: estadísticas de tabla casi vacía
+STALE_STATS_AT = 10
+
+async def setup(rng):
+    """Items y trades pendientes; devuelve {item_id: dueño}"""
+    owners = {}
+    async with db.transaction() as tx:
+        for p in range(PLAYERS):
+            user = USER_BASE + p
+            for i in range(ITEMS_PER_PLAYER):
+                item_id = await tx.add_item_to_user(user, f"Item {i}", "comun")
+                owners[item_id] = user
+    by_user = {}
+    for item_id, user in owners.items():
+        by_user.setdefault(user, []).append(item_id)
+    users = list(by_user)
+    now = int(time.time())
+    trades = []
+    while len(trades) < PENDING:
+        sender, receiver = rng.sample(users, 2)
+        trades.append((sender, receiver, rng.choice(by_user[sender]), rng.choice(by_user[receiver]), now))
+    sql = ("INSERT INTO trades(remitente, receptor, item_remitente, item_receptor, estado, creado_en) "
+           "VALUES (?, ?, ?, ?, 'pendiente', ?)")
+    async with db.pool.write() as conn:
+        await conn.executemany(sql, trades[:STALE_STATS_AT])
+        await conn.execute("ANALYZE")
+        await conn.executemany(sql, trades[STALE_STATS_AT:])
+        await conn.commit()
+    return owners
+
+def invalidate_plans(conn):
+    """{columna: (plan con INDEXED BY, plan sin él)} del UPDATE de invalidate_trades"""
+    marks = ",".join("?" * 50)
+    plans = {}
+    for column in ("item_remitente", "item_receptor"):
+        where = f"SET estado = 'invalido' WHERE {column} IN ({marks}) AND estado = 'pendiente'"
+        pinned, free = (
+            " | ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN UPDATE trades {hint}{where}", range(50)))
+            for hint in (f"INDEXED BY idx_trades_{column} ", "")
+        )
+        plans[column] = (pinned, free)
+    return plans
+
+def check(conn, owners, accepted):
+    errors = []
+    after = dict(conn.execute("SELECT id, user_id FROM inventory"))
+    if set(after) != set(owners):
+        errors.append(f"items: {len(owners)} -> {len(after)} (perdidos {len(set(owners) - set(after))}, "
+                      f"nuevos {len(set(after) - set(owners))})")
+    moved = Counter()
+    expected = dict(owners)
+    for receiver, trade in accepted:
+        moved[trade.item_remitente] += 1
+        moved[trade.item_receptor] += 1
+        expected[trade.item_remitente] = receiver
+        expected[trade.item_receptor] = trade.remitente
+    twice = [item for item, n in moved.items() if n > 1]
+    if twice:
+        errors.append(f"{len(twice)} items cambiaron de dueño en más de un trade")
+    wrong = [item for item, user in expected.items() if after.get(item) != user]
+    if wrong:
+        errors.append(f"{len(wrong)} items con dueño distinto del esperado")
+    stale = conn.execute(
+        "SELECT COUNT(*) FROM trades t WHERE estado = 'pendiente' AND ("
+        "NOT EXISTS (SELECT 1 FROM inventory WHERE id = t.item_remitente AND user_id = t.remitente) OR "
+        "NOT EXISTS (SELECT 1 FROM inventory WHERE id = t.item_receptor AND user_id = t.receptor))"
+    ).fetchone()[0]
+    if stale:
+        errors.append(f"{stale} trades pendientes con items que ya no son de quien los ofrece")
+    return errors
+
+async def run(path):
+    await db.init_db()
+    try:
+        return await bench(path)
+    finally:
+        await db.close_db()
+
+async def bench(path):
+    rng = random.Random(1234)
+    owners = await setup(rng)
+
+    with sqlite3.connect(path) as conn:
+        pending = [row for row in conn.execute("SELECT id, receptor FROM trades WHERE estado = 'pendiente'")]
+    picks = rng.sample(pending, ACCEPTS)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(db.accept_trade(trade_id, receiver) for trade_id, receiver in picks))
+    accept_secs = time.perf_counter() - start
+    accepted = [(receiver, trade) for (_, receiver), (result, trade) in zip(picks, results)
+                if result == db.TRADE_DONE]
+
+    with sqlite3.connect(path) as conn:
+        counts = dict(conn.execute("SELECT estado, COUNT(*) FROM trades GROUP BY estado"))
+        errors = check(conn, owners, accepted)
+
+    # Anulación en bloque directa: BULK_INVALIDATE items en una transacción
+    items = rng.sample(list(owners), BULK_INVALIDATE)
+    start = time.perf_counter()
+    async with db.transaction() as tx:
+        invalidated = await tx.invalidate_trades(items)
+    bulk_secs = time.perf_counter() - start
+    await db.write_behind.flush()
+
+    with sqlite3.connect(path) as conn:
+        marks = ",".join("?" * len(items))
+        left = conn.execute(
+            f"SELECT COUNT(*) FROM trades WHERE estado = 'pendiente' "
+            f"AND (item_remitente IN ({marks}) OR item_receptor IN ({marks}))", items * 2
+        ).fetchone()[0]
+        if left:
+            errors.append(f"{left} trades pendientes siguen usando items anulados")
+        plans = invalidate_plans(conn)
+
+    print(f"Aceptar: {ACCEPTS} concurrentes sobre {PENDING} pendientes en {accept_secs:.2f}s "
+          f"({ACCEPTS / accept_secs:.0f}/s)")
+    for result, n in Counter(result for result, _ in results).most_common():
+        print(f"   {result}: {n}")
+    print(f"Trades por estado: {counts}")
+    print(f"invalidate_trades de {BULK_INVALIDATE} items: {invalidated} trades en {bulk_secs * 1000:.1f} ms")
+    print("Planes de invalidate_trades (estadísticas viejas):")
+    for column, (pinned, free) in plans.items():
+        print(f"   INDEXED BY idx_trades_{column}: {pinned}")
+        print(f"   sin INDEXED BY: {free}")
+        if f"idx_trades_{column}" not in pinned:
+            errors.append(f"el UPDATE con INDEXED BY idx_trades_{column} no usa el índice")
+    return errors
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db.pool = db.ConnectionPool(path)
+        errors = asyncio.run(run(path))
+    if errors:
+        for error in errors:
+            print(f"❌ {error}")
+        sys.exit(1)
+    print("✅ Ningún item duplicado ni perdido, pendientes consistentes, INDEXED BY planifica")
+
+if __name__ == "__main__":
+    main()